@@ -1,38 +1,43 @@
 import numpy as np
-import re
-import matplotlib.pyplot as plt
 
 from Constants import *
+from Metrics import *
+from Instrumentation import instrumentation
 
 """
 BAYES CLASS :
-Giving 2 dictionaries (one positive, the other negative) and a testing set, the
-Naïve Bayes algorithm will predict sentiments for each tweet of this testing set.
-For this purpose, probabilities must be calculated :
-- with Laplace Smoothing:
+Giving a trained model (counts of the words of the tweets of each class) and a testing set,
+the Naïve Bayes algorithm will predict sentiments (or any classes) for each tweet of this testing set.
+For this purpose, probabilities must be calculated (multinomial event model, cf. Scorer class for the Bernoulli one) :
+- with additive smoothing:
 
                       CARD(WORD) + alpha
     p = ________________________________________________
-        sum(CARD(WORD i)) + alpha*[length(dictionary)+1]
-    * alpha = 1
+          sum(CARD(WORD i)) + alpha*length(dictionary)
+    * alpha = 1 : Laplace Smoothing, 0 < alpha < 1 : Lidstone smoothing
 
-- or without Laplace Smoothing:
+- or without smoothing (alpha = 0):
 
             CARD(WORD)
     p = _________________
         sum(CARD(WORD i))
-    * alpha = 1
 
+With two classes, the metrics are the ones of the positive class (1). With more classes, the confusion matrix
+has one row for each real class and one column for each predicted class, and the metrics are macro-averages
+(cf. Metrics module).
 """
 
 
 class Bayes:
     """
-    @attr   _pos_dictionary     dictionary containing words of positive samples
-    @attr   _neg_dictionary     dictionary containing words of negative samples
+    @attr   _model              model containing the words of the samples of each class
     @attr   _test_set           testing set containing tweets for which we want to predict corresponding sentiment
     @attr   _predictions        array of predicted sentiments for each tweet of the testing set
+    @attr   _log_odds           array of log-odds of each tweet (cf. Scorer.log_odds)
+    @attr   _nb_undetermined    number of tweets with undetermined sentiments
     @attr   _metrics            list containing the evaluation metrics
+    @attr   _cache              prediction cache placed in front of the scoring (None : every tweet is scored)
+    @attr   _class_metrics      array with the metrics of each class (more than two classes only)
     @attr   _conf_matrix        array representing the confusion matrix :
                                  _________________
                                 |        |        |
@@ -41,148 +46,113 @@ class Bayes:
                                 |        |        |
                                 |   FN   |   TP   |
                                 |________|________|
-
+                                (matrix REAL CLASS x PREDICTED CLASS with more than two classes)
     """
-    __slots__ = ["_pos_dictionary", "_neg_dictionary", "_test_set", "_predictions", "_metrics", "_conf_matrix"]
+    __slots__ = ["_model", "_test_set", "_predictions", "_log_odds", "_nb_undetermined", "_metrics", "_cache",
+                 "_class_metrics", "_conf_matrix"]
 
-    def __init__(self, pos_dictionary, neg_dictionary, test_set):
+    def __init__(self, model, test_set, cache=None):
         """
         Initializes a new Bayes class.
-        @param  pos_dictionary      dictionary with positive samples of the training set
-        @param  neg_dictionary      dictionary with negative samples of the training set
+        @param  model               model trained with the training set (cf. Trainer and Model classes)
         @param  test_set            testing set
+        @param  cache               prediction cache (cf. PredictionCache class), None : every tweet is scored
         """
-        self._pos_dictionary = pos_dictionary
-        self._neg_dictionary = neg_dictionary
+        self._model = model
         self._test_set = test_set
         self._predictions = []
+        self._log_odds = None
+        self._nb_undetermined = 0
         self._metrics = None
+        self._cache = cache
+        self._class_metrics = None
         self._conf_matrix = [0, 0, 0, 0]
 
-    def predict_sentiments(self, laplace_smoothing, pos_spl_nb, neg_spl_nb):
+    def predict_sentiments(self):
         """
-        Determine if a tweet is rather positive, negative or undetermined.   
-        @param  laplace_smoothing   boolean that gives the information if we want to use L. Smoothing for probabilities
-        @param  pos_spl_nb          number of positive tweets in the training set
-        @param  neg_spl_nb          number of negative tweets in the training set
+        Determine if a tweet is rather positive, negative (or of another class) or undetermined.
+        Tweets are scored in log-space by batches (cf. Scorer class), with the number of tweets of each
+        class of the training set and the smoothing chosen for the model.
+        With a cache, tweets already predicted with this model are not scored again.
         """
-        nb_undetermined = 0
-        # initialize dictionary characteristics
-        total_spl_nb = pos_spl_nb + neg_spl_nb
-        pos_probability = pos_spl_nb / total_spl_nb  # P(positive)
-        neg_probability = neg_spl_nb / total_spl_nb  # P(negative)
-        pos_dct_len = self._pos_dictionary.get_dictionary_length()  # number of words in positive_dictionary
-        neg_dct_len = self._neg_dictionary.get_dictionary_length()  # number of words in negative_dictionary
-        pos_dct_card = self._pos_dictionary.get_dictionary_card()  # sum of CARD(word) for every word of the dictionary
-        neg_dct_card = self._neg_dictionary.get_dictionary_card()  # sum of CARD(word) for every word of the dictionary
-        pos_dct = dict(self._pos_dictionary.get_dictionary())
-        neg_dct = dict(self._neg_dictionary.get_dictionary())
-
-        # ---------------- LAPLACE SMOOTHING TRUE ---------------
-        if laplace_smoothing is True:
-            for tweet in self._test_set[:, 0]:
-                probability1 = pos_probability
-                probability0 = neg_probability
-                if type(tweet) == str:
-                    for word in re.compile(r'\w+').findall(tweet):
-                        probability1 *= (pos_dct.setdefault(word, 0) + 1) / (pos_dct_len + pos_dct_card)  # P(tweet = pos)
-                        probability0 *= (neg_dct.setdefault(word, 0) + 1) / (neg_dct_len + neg_dct_card)  # P(tweet = neg)
-
-                # decision : positive or negative tweet ?
-                if probability0 < probability1:
-                    sentiment = 1
-                elif probability1 < probability0:
-                    sentiment = 0
-                else:
-                    sentiment = 2
-                    nb_undetermined += 1
-                self._predictions.append(sentiment)
-
-        # ---------------- LAPLACE SMOOTHING FALSE ---------------
-        else:
-            for tweet in self._test_set[:, 0]:
-                probability1 = pos_probability
-                probability0 = neg_probability
-                if type(tweet) == str:
-                    for word in re.compile(r'\w+').findall(tweet):
-                        probability1 *= pos_dct.setdefault(word, 0) / pos_dct_card  # P(tweet = pos)
-                        probability0 *= neg_dct.setdefault(word, 0) / neg_dct_card  # P(tweet = neg)
-
-                # decision : positive or negative tweet ?
-                if probability0 < probability1:
-                    sentiment = 1
-                elif probability1 < probability0:
-                    sentiment = 0
-                else:
-                    sentiment = 2
-                    nb_undetermined += 1
-                self._predictions.append(sentiment)
+        with instrumentation.stage("score", tweets=len(self._test_set)):
+            if self._cache is None:
+                self._predictions, self._log_odds = self._model.get_scorer().predict(self._test_set[:, 0],
+                                                                                     return_log_odds=True)
+            else:
+                self._predictions, self._log_odds = self._cache.predict(self._model, self._test_set[:, 0])
+        nb_undetermined = int(np.count_nonzero(self._predictions == UNDETERMINED))
         return nb_undetermined
 
     def compare_sentiments(self):
         """
-        Compares the ground truth values of the training set to the predicted values for the target feature
+        Compares the ground truth values of the training set to the predicted values for the target feature.
+        Tweets with undetermined sentiments are not in the confusion matrix, they are counted apart.
         """
-        test_y = [raw[-1] for raw in self._test_set]
-        predicted_y = self._predictions
-
-        if len(test_y) != len(predicted_y):
-            print(
-                f'predicted_y : length = {len(predicted_y)} and test_y : length = {len(test_y)} have not the same length ')
-            exit()
-
-        metrics = [None] * 4
-        conf_matrix = [0, 0, 0, 0]
-
-        for t, p in zip(test_y, predicted_y):
-            if t == 1 and p:
-                conf_matrix[TP] += 1
-            elif t == 1 and not p:
-                conf_matrix[FN] += 1
-            elif t == 0 and p:
-                conf_matrix[FP] += 1
-            elif t == 0 and not p:
-                conf_matrix[TN] += 1
-
-        tp = conf_matrix[TP]
-        fn = conf_matrix[FN]
-        fp = conf_matrix[FP]
-        tn = conf_matrix[TN]
-
-        metrics[ACCURACY] = (tp + tn) / (tp + tn + fp + fn)
-        metrics[PRECISION] = tp / (tp + fp)
-        metrics[RECALL] = tp / (tp + fn)
-        metrics[SPECIFICITY] = tn / (tn + fp)
+        nb_classes = len(self._model.get_spl_nbs())
+        with instrumentation.stage("evaluate", tweets=len(self._test_set)):
+            if nb_classes == 2:
+                conf_matrix, self._nb_undetermined = confusion_matrix(self._test_set[:, -1], self._predictions)
+                metrics = compute_metrics(conf_matrix)
+            else:
+                conf_matrix, self._nb_undetermined = class_confusion_matrix(self._test_set[:, -1], self._predictions,
+                                                                            nb_classes)
+                metrics, self._class_metrics = class_metrics(conf_matrix)
 
         self._metrics = metrics
         self._conf_matrix = conf_matrix
         return metrics, conf_matrix
 
+    def compare_thresholds(self, thresholds):
+        """
+        Compares the ground truth values to the decisions "positive if log-odds > threshold" for many thresholds.
+        Raises ValueError with more than two classes.
+        @param  thresholds      array of decision thresholds on the log-odds
+        @return array of metrics and array of confusion matrices, one row for each threshold
+        """
+        if len(self._model.get_spl_nbs()) != 2:
+            raise ValueError("Decision thresholds need two classes")
+        conf_matrices, nb_undetermined = threshold_confusion_matrices(self._test_set[:, -1], self._log_odds, thresholds)
+        return compute_metrics(conf_matrices), conf_matrices
+
     def print_confusion_matrix(self):
         """
         displays the confusion matrix for this model
         """
         print("--- CONFUSION MATRIX ------------------------------------------")
-        print(f'TP:{self._conf_matrix[TP]} | FN:{self._conf_matrix[FN]}')
-        print(f'FP:{self._conf_matrix[FP]} | TN:{self._conf_matrix[TN]}')
+        if len(self._model.get_spl_nbs()) == 2:
+            print(f'TP:{self._conf_matrix[TP]} | FN:{self._conf_matrix[FN]}')
+            print(f'FP:{self._conf_matrix[FP]} | TN:{self._conf_matrix[TN]}')
+        else:
+            print("REAL \\ PREDICTED  " + " | ".join(f'{label:>8}' for label in range(len(self._conf_matrix))))
+            for label, row in enumerate(self._conf_matrix):
+                print(f'{label:>16}  ' + " | ".join(f'{count:>8}' for count in row))
+        print(f'Undetermined:{self._nb_undetermined}')
 
     def plot_confusion_matrix(self):
         """
         displays the confusion matrix for this model
         """
-        grid = np.array(self._conf_matrix).reshape(2, 2)
+        import matplotlib.pyplot as plt  # imported on the first plot, so that scoring never loads matplotlib
+
+        binary = len(self._model.get_spl_nbs()) == 2
+        grid = np.array(self._conf_matrix).reshape(2, 2) if binary else np.asarray(self._conf_matrix)
         fig = plt.figure()
         ax = fig.add_subplot(111)
         ax.set_xlabel("Prediction")
         ax.set_ylabel("Reality")
-        ax.axes.xaxis.set_ticklabels([])
-        ax.axes.yaxis.set_ticklabels([])
+        if binary:
+            ax.axes.xaxis.set_ticklabels([])
+            ax.axes.yaxis.set_ticklabels([])
+        else:
+            ax.set_xticks(range(len(grid)))
+            ax.set_yticks(range(len(grid)))
         im = ax.imshow(grid, interpolation='none', aspect='auto')
 
         labels = ["TP", "FN", "FP", "TN"]
 
         for (j, i), label in np.ndenumerate(grid):
-            ax.text(i, j, f'{labels[i + j]}:{label}', ha='center', va='center')
+            ax.text(i, j, f'{labels[i + j]}:{label}' if binary else f'{label}', ha='center', va='center')
 
         fig.colorbar(im)
         plt.plot()
@@ -196,3 +166,8 @@ class Bayes:
         print(f'Precision: {self._metrics[PRECISION]}')
         print(f'Recall: {self._metrics[RECALL]}')
         print(f'Specificity: {self._metrics[SPECIFICITY]}')
+        print(f'F1: {self._metrics[F1]}')
+        if self._class_metrics is not None:
+            for label, metrics in enumerate(self._class_metrics):
+                print(f'Class {label}: Precision: {metrics[PRECISION]} | Recall: {metrics[RECALL]} | '
+                      f'Specificity: {metrics[SPECIFICITY]} | F1: {metrics[F1]}')
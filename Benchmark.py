@@ -0,0 +1,286 @@
+#!/usr/bin/python
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from Constants import *
+from Reader import Reader
+from Data import Data
+from Trainer import Trainer
+from Bayes import Bayes
+
+"""
+BENCHMARK CLASS :
+Measures the performance of each stage of the pipeline on a synthetic corpus, without the real dataset :
+ ____________________________________________________________________
+|   STAGE    |                       MEASURED CALLS                   |
+|____________|________________________________________________________|
+|   read     |  Reader.read_data                                      |
+|   split    |  Data, Data.holdout_indices                            |
+|   train    |  Trainer.train (tweets of each class)                  |
+|   score    |  Bayes.predict_sentiments                              |
+|   evaluate |  Bayes.compare_sentiments                              |
+|____________|________________________________________________________|
+
+The synthetic corpus follows a Zipf law : the word of rank r appears with a probability proportional to
+1 / r ** zipf, each word being slightly more frequent in one class than in the other. It is written in a
+csv file with the layout of the real dataset, so that the reading is measured too.
+
+For each stage, the best time of several runs gives the throughput (tweets per second), and a separate
+run with tracemalloc gives the peak memory allocated by the stage (tracemalloc slows down the code, so it
+is not used for the timings). Results can be saved as a baseline, and compared with a saved baseline :
+a stage that is slower or uses more memory than the baseline (beyond a tolerance) is a regression.
+
+Usage : python Benchmark.py --tweets 200000 --save baseline.json
+        python Benchmark.py --tweets 200000 --baseline baseline.json --tolerance 0.2
+"""
+
+STAGES = ["read", "split", "train", "score", "evaluate"]
+NOISE = {"seconds": 0.002, "peak_memory_mb": 1}  # differences below these values are not regressions
+
+
+class Benchmark:
+    """
+    @attr   _nb_tweets          number of tweets of the synthetic corpus
+    @attr   _vocabulary_size    number of distinct words of the synthetic corpus
+    @attr   _zipf               exponent of the Zipf law of the word frequencies
+    @attr   _length             mean number of words of a tweet
+    @attr   _seed               seed of the synthetic corpus and of the splits
+    @attr   _repeat             number of timed runs of each stage
+    @attr   _results            dict() STAGE -> {tweets, seconds, tweets_per_second, peak_memory_mb}
+    """
+    __slots__ = ["_nb_tweets", "_vocabulary_size", "_zipf", "_length", "_seed", "_repeat", "_results"]
+
+    def __init__(self, nb_tweets=200000, vocabulary_size=100000, zipf=1.1, length=12, seed=0, repeat=3):
+        """
+        Initializes a new benchmark.
+        @param  nb_tweets           number of tweets of the synthetic corpus
+        @param  vocabulary_size     number of distinct words of the synthetic corpus
+        @param  zipf                exponent of the Zipf law of the word frequencies
+        @param  length              mean number of words of a tweet
+        @param  seed                seed of the synthetic corpus and of the splits
+        @param  repeat              number of timed runs of each stage
+        """
+        self._nb_tweets = nb_tweets
+        self._vocabulary_size = vocabulary_size
+        self._zipf = zipf
+        self._length = length
+        self._seed = seed
+        self._repeat = repeat
+        self._results = dict()
+
+    def get_config(self):
+        """
+        Returns the settings of the benchmark as a dict().
+        """
+        return {"nb_tweets": self._nb_tweets, "vocabulary_size": self._vocabulary_size, "zipf": self._zipf,
+                "length": self._length, "seed": self._seed, "repeat": self._repeat}
+
+    def get_results(self):
+        """
+        Returns the results of each stage : dict() STAGE -> {tweets, seconds, tweets_per_second, peak_memory_mb}
+        """
+        return self._results
+
+    def generate(self):
+        """
+        Generates the synthetic corpus.
+        @return array of tweets (str, or nan for empty tweets) and array of labels
+        """
+        rng = np.random.default_rng(self._seed)
+        vocabulary_size = self._vocabulary_size
+
+        # word of rank r : r written in base 26 with the letters a-z (frequent words are short)
+        ranks = np.arange(1, vocabulary_size + 1)
+        words = []
+        for rank in ranks.tolist():
+            word = ''
+            while rank:
+                rank, letter = divmod(rank - 1, 26)
+                word = chr(97 + letter) + word
+            words.append(word)
+        words = np.array(words, dtype=object)
+
+        labels = rng.integers(0, 2, self._nb_tweets)
+        lengths = rng.poisson(self._length - 1, self._nb_tweets) + 1
+        frequencies = ranks ** -float(self._zipf)
+        polarity = np.exp(rng.normal(0, 0.5, vocabulary_size))
+        ids = np.empty(int(lengths.sum()), dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(lengths)))
+        for label, weights in enumerate((frequencies / polarity, frequencies * polarity)):
+            rows = np.flatnonzero(labels == label)
+            positions = np.concatenate([np.arange(starts[row], starts[row + 1]) for row in rows]) if len(rows) else \
+                np.empty(0, dtype=np.int64)
+            ids[positions] = rng.choice(vocabulary_size, len(positions), p=weights / weights.sum())
+
+        tokens = words[ids].tolist()
+        tweets = np.empty(self._nb_tweets, dtype=object)
+        tweets[:] = [' '.join(tokens[start:stop]) for start, stop in zip(starts[:-1].tolist(), starts[1:].tolist())]
+        tweets[rng.random(self._nb_tweets) < 0.001] = np.nan  # like the empty tweets of the real dataset
+        return tweets, labels
+
+    def run(self):
+        """
+        Generates the corpus, then measures each stage.
+        @return dict() STAGE -> {tweets, seconds, tweets_per_second, peak_memory_mb}
+        """
+        tweets, labels = self.generate()
+        folder = tempfile.mkdtemp()
+        try:
+            filename = "benchmark.csv"
+            pd.DataFrame({"tweetId": np.arange(len(tweets)), "tweetText": tweets, "tweetDate": "",
+                          "sentimentLabel": labels}).to_csv(os.path.join(folder, filename), sep=';', index=False)
+            seconds = {stage: float('inf') for stage in STAGES}
+            for i in range(self._repeat):
+                for stage, elapsed in self._run_stages(folder, filename, memory=False)[1].items():
+                    seconds[stage] = min(seconds[stage], elapsed)
+            nb_tweets, memory = self._run_stages(folder, filename, memory=True)
+        finally:
+            shutil.rmtree(folder)
+
+        self._results = {stage: {"tweets": nb_tweets[stage], "seconds": seconds[stage],
+                                 "tweets_per_second": nb_tweets[stage] / max(seconds[stage], 1e-9),
+                                 "peak_memory_mb": memory[stage]} for stage in STAGES}
+        return self._results
+
+    def _run_stages(self, folder, filename, memory):
+        """
+        Runs every stage once, in the order of the pipeline.
+        @param  folder      folder of the csv file of the corpus
+        @param  filename    csv file of the corpus
+        @param  memory      boolean that gives the information if the peak memory (MB) of each stage is measured
+                            instead of its time (s)
+        @return number of tweets processed by each stage and measure of each stage
+        """
+        measures = dict()
+        if memory:
+            tracemalloc.start()
+
+        def measure(stage, function):
+            if memory:
+                tracemalloc.reset_peak()
+                current = tracemalloc.get_traced_memory()[0]
+                result = function()
+                measures[stage] = (tracemalloc.get_traced_memory()[1] - current) / 2 ** 20
+            else:
+                start = perf_counter()
+                result = function()
+                measures[stage] = perf_counter() - start
+            return result
+
+        try:
+            raw_dataset = measure("read", lambda: Reader(folder + os.sep).read_data(filename))
+            dataset, (train_indices, test_index) = measure("split", lambda: self._split(raw_dataset))
+            model = measure("train", lambda: self._train(dataset, train_indices))
+            bayes = Bayes(model, dataset.get_data()[test_index])
+            measure("score", bayes.predict_sentiments)
+            measure("evaluate", bayes.compare_sentiments)
+        finally:
+            if memory:
+                tracemalloc.stop()
+        nb_tweets = {"read": len(raw_dataset), "split": len(raw_dataset), "train": sum(map(len, train_indices)),
+                     "score": len(test_index), "evaluate": len(test_index)}
+        return nb_tweets, measures
+
+    def _split(self, raw_dataset):
+        """
+        Creates the dataset and its holdout split (stage "split").
+        @param  raw_dataset     samples read from the csv file (cf. Reader.read_data)
+        """
+        dataset = Data(raw_dataset, self._seed)
+        return dataset, dataset.holdout_indices(HOLDOUT_PERCENT)
+
+    def _train(self, dataset, train_indices):
+        """
+        Counts the words of the training set (stage "train").
+        @param  dataset         dataset (cf. Data class)
+        @param  train_indices   list of the indices of the tweets of each class of the training set
+        """
+        trainer = Trainer(dataset.get_nb_classes())
+        for train_index in train_indices:
+            trainer.train(dataset.get_tweets(), dataset.get_labels(), train_index)
+        return trainer.get_model(ALPHA)
+
+    def save(self, filename):
+        """
+        Saves the settings and the results as a json baseline.
+        @param  filename    path of the file
+        """
+        with open(filename, 'w') as file:
+            json.dump({"config": self.get_config(), "results": self._results}, file, indent=2)
+
+    def compare(self, filename, tolerance=0.2):
+        """
+        Compares the results with a saved baseline.
+        @param  filename    path of the baseline file (cf. save)
+        @param  tolerance   relative increase of time or memory tolerated before a regression (increases
+                            smaller than NOISE are always tolerated)
+        @return list of (stage, measure, baseline value, value) of the regressions
+        """
+        with open(filename) as file:
+            baseline = json.load(file)
+        if baseline["config"] != self.get_config():
+            print(f"Warning: the baseline was measured with other settings : {baseline['config']}", file=sys.stderr)
+        regressions = []
+        for stage in STAGES:
+            for name in ["seconds", "peak_memory_mb"]:
+                before, after = baseline["results"][stage][name], self._results[stage][name]
+                if after > before * (1 + tolerance) and after - before > NOISE[name]:
+                    regressions.append((stage, name, before, after))
+        return regressions
+
+    def print_results(self, baseline=None):
+        """
+        displays the results of each stage (and their ratio with a baseline)
+        @param  baseline    results of a baseline (cf. save), None : no comparison
+        """
+        print(f"--- BENCHMARK : {self._nb_tweets} tweets, {self._vocabulary_size} words, zipf {self._zipf} ---")
+        header = f"{'stage':<10}{'seconds':>10}{'tweets/s':>14}{'peak MB':>10}"
+        print(header + (f"{'time ratio':>12}{'mem ratio':>11}" if baseline else ''))
+        for stage in STAGES:
+            result = self._results[stage]
+            line = f"{stage:<10}{result['seconds']:>10.3f}{result['tweets_per_second']:>14.0f}" \
+                   f"{result['peak_memory_mb']:>10.1f}"
+            if baseline:
+                before = baseline[stage]
+                line += f"{result['seconds'] / before['seconds']:>12.2f}" \
+                        f"{result['peak_memory_mb'] / max(before['peak_memory_mb'], 1e-9):>11.2f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures each stage of the pipeline on a synthetic corpus")
+    parser.add_argument("--tweets", type=int, default=200000, help="number of tweets of the corpus")
+    parser.add_argument("--vocabulary", type=int, default=100000, help="number of distinct words of the corpus")
+    parser.add_argument("--zipf", type=float, default=1.1, help="exponent of the Zipf law of the word frequencies")
+    parser.add_argument("--length", type=float, default=12, help="mean number of words of a tweet")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the corpus and of the splits")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs of each stage")
+    parser.add_argument("--save", help="file where the results are saved as a baseline")
+    parser.add_argument("--baseline", help="baseline file compared with the results")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative increase tolerated by the comparison")
+    args = parser.parse_args()
+
+    benchmark = Benchmark(args.tweets, args.vocabulary, args.zipf, args.length, args.seed, args.repeat)
+    benchmark.run()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+    benchmark.print_results(baseline)
+    if args.save:
+        benchmark.save(args.save)
+    if args.baseline:
+        regressions = benchmark.compare(args.baseline, args.tolerance)
+        for stage, name, before, after in regressions:
+            print(f"REGRESSION {stage} {name}: {before:.3f} -> {after:.3f}")
+        sys.exit(1 if regressions else 0)
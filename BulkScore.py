@@ -0,0 +1,199 @@
+#!/usr/bin/python
+
+import argparse
+import json
+import sys
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from time import perf_counter
+
+import numpy as np
+
+from Constants import *
+from Cache import PredictionCache
+from Model import Model
+
+"""
+BULKSCORER CLASS :
+Scores a file of tweets of any size with a trained model (cf. Model.save), without labels :
+- the input file (csv or jsonl) is read by chunks of fixed size,
+- each chunk is scored by the vectorized scoring engine (cf. Scorer class), on several processes if needed,
+- the label and the log-odds of each tweet are written in the output file (csv or jsonl) as soon as its chunk
+  is scored, in the order of the input file.
+With a prediction cache, repeated tweets (e.g. retweets) are scored once by each process (cf. PredictionCache class).
+At most a few chunks are in memory at a time, so the memory does not depend on the size of the file.
+
+Usage : python BulkScore.py model.nbm tweets.csv scores.csv --text-column tweetText --processes 4
+"""
+
+
+class BulkScorer:
+    """
+    @attr   _model_filename     file of the trained model
+    @attr   _chunk_size         number of tweets of each chunk
+    @attr   _processes          number of processes
+    @attr   _cache_size         maximal number of predictions kept by the cache of each process (0 : no cache)
+    """
+    __slots__ = ["_model_filename", "_chunk_size", "_processes", "_cache_size"]
+
+    def __init__(self, model_filename, chunk_size=CHUNK_SIZE, processes=PROCESSES, cache_size=CACHE_SIZE):
+        """
+        Initializes a new bulk scorer.
+        @param  model_filename  file of the trained model (memory-mapped, so that every process shares it)
+        @param  chunk_size      number of tweets of each chunk
+        @param  processes       number of processes
+        @param  cache_size      maximal number of predictions kept by the cache of each process (0 : no cache)
+        """
+        self._model_filename = model_filename
+        self._chunk_size = chunk_size
+        self._processes = processes
+        self._cache_size = cache_size
+
+    def score_file(self, input_filename, output_filename, text_column, id_column=None, sep=';'):
+        """
+        Scores every tweet of a file and writes the results in another file.
+        The format of each file (csv or jsonl) is given by its extension.
+        @param  input_filename  file of tweets
+        @param  output_filename file where the results are written
+        @param  text_column     column (csv) or key (jsonl) of the tweets
+        @param  id_column       column or key copied to the output file (None : line number)
+        @param  sep             separator of the csv files
+        @return number of tweets scored
+        """
+        if input_filename.endswith('.jsonl'):
+            chunks = self._read_jsonl(input_filename, text_column, id_column)
+        else:
+            chunks = self._read_csv(input_filename, text_column, id_column, sep)
+        jsonl = output_filename.endswith('.jsonl')
+        if not jsonl:
+            import pandas as pd  # only csv files need pandas
+
+        nb_tweets = 0
+        with open(output_filename, 'w', newline='') as output:
+            for ids, labels, log_odds in self._score_chunks(chunks):
+                ids = np.arange(nb_tweets, nb_tweets + len(labels)) if ids is None else ids
+                if jsonl:
+                    self._write_jsonl(output, ids, labels, log_odds)
+                else:
+                    pd.DataFrame({"id": ids, "label": labels, "log_odds": log_odds}).to_csv(
+                        output, sep=sep, header=nb_tweets == 0, index=False)
+                nb_tweets += len(labels)
+        return nb_tweets
+
+    def _score_chunks(self, chunks):
+        """
+        Scores every chunk, keeping the order of the chunks.
+        With several processes, at most 2 chunks for each process are waiting to be scored.
+        @param  chunks      iterable of (ids, tweets)
+        """
+        if self._processes <= 1:
+            _init_worker(self._model_filename, self._cache_size)
+            for ids, tweets in chunks:
+                yield (ids,) + _score_chunk(tweets)
+            return
+        with Pool(self._processes, _init_worker, (self._model_filename, self._cache_size)) as pool:
+            pending = deque()
+            for ids, tweets in chunks:
+                pending.append((ids, pool.apply_async(_score_chunk, (tweets,))))
+                if len(pending) >= 2 * self._processes:
+                    ids, result = pending.popleft()
+                    yield (ids,) + result.get()
+            while pending:
+                ids, result = pending.popleft()
+                yield (ids,) + result.get()
+
+    def _read_csv(self, filename, text_column, id_column, sep):
+        """
+        Reads a csv file by chunks.
+        @param  filename    csv file with a header
+        @param  text_column column of the tweets
+        @param  id_column   column copied to the output file (None : line number)
+        @param  sep         separator of the columns
+        """
+        import pandas as pd
+
+        columns = [text_column] if id_column is None else [text_column, id_column]
+        for chunk in pd.read_csv(filename, sep=sep, usecols=columns, dtype=object, chunksize=self._chunk_size):
+            ids = None if id_column is None else chunk[id_column].to_numpy(dtype=object)
+            yield ids, chunk[text_column].to_numpy(dtype=object)
+
+    def _read_jsonl(self, filename, text_column, id_column):
+        """
+        Reads a jsonl file (one json object for each line) by chunks.
+        @param  filename    jsonl file
+        @param  text_column key of the tweets
+        @param  id_column   key copied to the output file (None : line number)
+        """
+        with open(filename, encoding='utf-8') as file:
+            while True:
+                lines = list(islice(file, self._chunk_size))
+                if not lines:
+                    break
+                records = [json.loads(line) for line in lines if line.strip()]
+                tweets = np.empty(len(records), dtype=object)
+                tweets[:] = [record.get(text_column) for record in records]
+                ids = None if id_column is None else [record.get(id_column) for record in records]
+                yield ids, tweets
+
+    def _write_jsonl(self, output, ids, labels, log_odds):
+        """
+        Writes the results of a chunk in a jsonl file (log-odds are null when undefined or infinite).
+        @param  output      output file
+        @param  ids         id of each tweet
+        @param  labels      array of labels
+        @param  log_odds    array of log-odds
+        """
+        ids = ids.tolist() if isinstance(ids, np.ndarray) else ids
+        output.writelines(json.dumps({"id": i, "label": label, "log_odds": value if np.isfinite(value) else None})
+                          + '\n' for i, label, value in zip(ids, labels.tolist(), log_odds.tolist()))
+
+
+_model = None  # model of each process, loaded once by _init_worker
+_scorer = None  # scoring engine of this model
+_cache = None  # prediction cache of each process (None : every tweet is scored)
+
+
+def _init_worker(model_filename, cache_size):
+    """
+    Loads the scoring engine of the model in a process (run once by each process of BulkScorer).
+    @param  model_filename  file of the trained model
+    @param  cache_size      maximal number of predictions kept by the cache (0 : no cache)
+    """
+    global _model, _scorer, _cache
+    _model = Model.load(model_filename)
+    _scorer = _model.get_scorer()
+    _cache = PredictionCache(cache_size) if cache_size > 0 else None
+
+
+def _score_chunk(tweets):
+    """
+    Scores one chunk of tweets (run by each process of BulkScorer).
+    @param  tweets      array of tweets
+    @return array of labels and array of log-odds
+    """
+    if _cache is None:
+        return _scorer.predict(tweets, return_log_odds=True)
+    return _cache.predict(_model, tweets)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scores a csv or jsonl file of tweets with a trained model")
+    parser.add_argument("model", help="file of the trained model (cf. Model.save)")
+    parser.add_argument("input", help="file of tweets (.csv or .jsonl)")
+    parser.add_argument("output", help="file where the labels and log-odds are written (.csv or .jsonl)")
+    parser.add_argument("--text-column", default="tweetText", help="column or key of the tweets")
+    parser.add_argument("--id-column", default=None, help="column or key copied to the output (default: line number)")
+    parser.add_argument("--sep", default=";", help="separator of the csv files")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="number of tweets of each chunk")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE,
+                        help="maximal number of predictions kept by the cache of each process (0: no cache)")
+    parser.add_argument("--processes", type=int, default=PROCESSES, help="number of processes")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    nb_tweets = BulkScorer(args.model, args.chunk_size, args.processes, args.cache_size).score_file(
+        args.input, args.output, args.text_column, args.id_column, args.sep)
+    elapsed = perf_counter() - start
+    print(f"{nb_tweets} tweets scored in {elapsed:.2f} s ({nb_tweets / max(elapsed, 1e-9):.0f} tweets/s)",
+          file=sys.stderr)
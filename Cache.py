@@ -0,0 +1,157 @@
+from itertools import repeat
+
+import numpy as np
+
+from Constants import *
+
+"""
+PREDICTIONCACHE CLASS :
+Bounded cache of predictions placed in front of the scoring engine (cf. Scorer class), for traffic
+with many identical tweets (retweets, copies, spam) :
+- the key of a tweet is its text without leading and trailing white spaces (the words found by the
+  tokenizer, and so the scores, do not depend on them),
+- each distinct key of a batch is looked up once, and the keys that are not in the cache are scored with
+  one vectorized call,
+- predictions are kept in two generations of dict() : new predictions go to the recent generation, and a
+  prediction found in the old generation is moved back to the recent one. When the recent generation holds
+  half of the capacity, it becomes the old one and the previous old generation is removed : predictions that
+  were not used during the last two generations are removed (an approximate LRU, without any work for the
+  predictions found in the recent generation),
+- the cache is bound to a model : predictions of another model (retrained or reloaded) clear it.
+It saves scoring time when about a third of the tweets are repeated, or more (cf. README) : it is disabled by
+default (CACHE_SIZE = 0).
+"""
+
+
+class PredictionCache:
+    """
+    @attr   _capacity           maximal number of predictions kept
+    @attr   _recent             dict() KEY -> row of the predictions of the recent generation
+    @attr   _recent_values      matrix of the label and the log-odds of each row of the recent generation
+    @attr   _old                dict() KEY -> row of the predictions of the old generation
+    @attr   _old_values         matrix of the label and the log-odds of each row of the old generation
+    @attr   _model              model of the cached predictions
+    @attr   _scorer             scoring engine of this model
+    @attr   _hits               number of tweets whose prediction was found in the cache
+    @attr   _misses             number of tweets that were scored
+    """
+    __slots__ = ["_capacity", "_recent", "_recent_values", "_old", "_old_values", "_model", "_scorer", "_hits",
+                 "_misses"]
+
+    def __init__(self, capacity=CACHE_SIZE):
+        """
+        Initializes an empty cache.
+        @param  capacity    maximal number of predictions kept
+        """
+        self._capacity = capacity
+        self._model = None
+        self._scorer = None
+        self._hits = 0
+        self._misses = 0
+        self.clear()
+
+    def predict(self, model, tweets):
+        """
+        Predicts the class and the log-odds of each tweet (cf. Scorer.predict), scoring only the tweets
+        that are not in the cache.
+        @param  model       trained model (cf. Model class)
+        @param  tweets      array of tweets
+        @return array of labels and array of log-odds
+        """
+        if model is not self._model:
+            self.clear()
+            self._model = model
+            self._scorer = model.get_scorer()
+
+        # distinct keys of the batch, and position of the key of each tweet among them
+        keys = self._keys(tweets)
+        distinct = list(dict.fromkeys(keys))
+        positions = dict(zip(distinct, range(len(distinct))))
+        inverse = np.fromiter(map(positions.__getitem__, keys), dtype=np.int64, count=len(keys))
+
+        values = np.empty((len(distinct), 2), dtype=np.float64)
+        rows = np.fromiter(map(self._recent.get, distinct, repeat(-1)), dtype=np.int64, count=len(distinct))
+        missing = np.flatnonzero(rows < 0)
+        values[rows >= 0] = self._recent_values[rows[rows >= 0]]
+        if len(missing) and self._old:
+            rows = np.fromiter(map(self._old.get, [distinct[i] for i in missing.tolist()], repeat(-1)),
+                               dtype=np.int64, count=len(missing))
+            promoted = missing[rows >= 0]
+            values[promoted] = self._old_values[rows[rows >= 0]]
+            self._add([distinct[i] for i in promoted.tolist()], values[promoted])
+            missing = missing[rows < 0]
+        if len(missing):
+            # the keys are scored instead of the tweets : their words are the same
+            texts = np.empty(len(missing), dtype=object)
+            texts[:] = [distinct[i] for i in missing.tolist()]
+            values[missing, 0], values[missing, 1] = self._scorer.predict(texts, return_log_odds=True)
+            self._add(texts.tolist(), values[missing])
+        self._misses += len(missing)
+        self._hits += len(keys) - len(missing)
+        return values[inverse, 0].astype(np.int64), values[inverse, 1]
+
+    def _add(self, keys, values):
+        """
+        Adds predictions to the recent generation, which becomes the old one when it holds half of the capacity
+        (predictions that do not fit in the recent generation are not kept).
+        @param  keys        list of keys that are not in the recent generation
+        @param  values      matrix of the label and the log-odds of each key
+        """
+        size = len(self._recent)
+        keys = keys[:max(self._capacity // 2 - size, 0)]
+        if size + len(keys) > len(self._recent_values):
+            grown = np.empty((max(2 * len(self._recent_values), size + len(keys)), 2), dtype=np.float64)
+            grown[:size] = self._recent_values[:size]
+            self._recent_values = grown
+        self._recent_values[size:size + len(keys)] = values[:len(keys)]
+        self._recent.update(zip(keys, range(size, size + len(keys))))
+        if self._recent and len(self._recent) >= self._capacity // 2:
+            self._old, self._old_values = self._recent, self._recent_values
+            self._recent, self._recent_values = dict(), np.empty((0, 2), dtype=np.float64)
+
+    def clear(self):
+        """
+        Removes every prediction (the counters are kept).
+        """
+        self._recent, self._recent_values = dict(), np.empty((0, 2), dtype=np.float64)
+        self._old, self._old_values = dict(), np.empty((0, 2), dtype=np.float64)
+        self._model = None
+        self._scorer = None
+
+    def get_hits(self):
+        """
+        Returns the number of tweets whose prediction was found in the cache.
+        """
+        return self._hits
+
+    def get_misses(self):
+        """
+        Returns the number of tweets that were scored.
+        """
+        return self._misses
+
+    def get_hit_rate(self):
+        """
+        Returns the proportion of tweets whose prediction was found in the cache.
+        """
+        return self._hits / max(self._hits + self._misses, 1)
+
+    def to_string(self):
+        """
+        Represents the cache as a string
+        """
+        txt = "Class: cache.py\n"
+        txt += "  [X] Predictions in the cache:	 %d / %d\n" % (len(self._recent.keys() | self._old.keys()),
+                                                             self._capacity)
+        txt += "  [X] Hits:	 %d\n" % self._hits
+        txt += "  [X] Misses:	 %d\n" % self._misses
+        txt += "  [X] Hit rate:	 %.3f\n" % self.get_hit_rate()
+        return txt
+
+    def _keys(self, tweets):
+        """
+        Gives the key of each tweet : its text without leading and trailing white spaces (empty for empty tweets).
+        Normalizing every white space of the text (split and join) would cost about a quarter of its scoring.
+        @param  tweets      array of tweets
+        """
+        return [tweet.strip() if isinstance(tweet, str) else '' for tweet in tweets]
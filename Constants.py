@@ -4,6 +4,12 @@ FOLDER_PATH = "Database/"
 # Filename
 FILENAME = "FinalStemmedSentimentAnalysisDataset.csv"
 
+# Trained model file (None : the model is not saved)
+MODEL_FILENAME = None  # e.g. "model.nbm"
+
+# Seed of the random permutations of the dataset (None : different permutations at every run)
+SEED = None
+
 # Validation method
 VALIDATION = 'holdout'  # { 'holdout', 'crossvalidation' }
 
@@ -13,18 +19,76 @@ HOLDOUT_PERCENT = 0.9
 # K for cross-validation
 K = 8
 
-# Possibility to choose a size for the dictionary
-SIZED_DCT = True
-SIZE = 9000000
+# Possibility to choose a maximal size for the vocabulary : the best SIZE words are kept (cf. Trainer.prune)
+SIZED_DCT = False  # True : the default model keeps SIZE words only
+SIZE = 100000
+
+# Minimal number of occurrences of a word of a sized vocabulary
+MIN_COUNT = 1
+
+# Statistic used to choose the words of a sized vocabulary
+PRUNING_STATISTIC = 'frequency'  # { 'frequency', 'log_odds' }
+
+# Number of candidate words counted exactly for each word of a sized vocabulary (cf. CountMinSketch)
+CANDIDATES = 4
+
+# Number of buckets of the hashing tokenizer (None : words are kept in a vocabulary, without hashing)
+NB_BUCKETS = None  # e.g. 2 ** 20
+
+# Minimal and maximal number of words of a feature (e.g. (1, 2) : words and bigrams, cf. Tokenizer)
+NGRAM_RANGE = (1, 1)
+
+# Minimal number of occurrences of a kept n-gram (rare n-grams are pruned, without hashing)
+NGRAM_MIN_COUNT = 2
+
+# Additive smoothing of the probabilities (1 : Laplace Smoothing, between 0 and 1 : Lidstone smoothing, 0 : none)
+ALPHA = 0
+
+# Event model of the Naïve Bayes classifier (cf. Scorer) : occurrences of the words in a tweet, or presence
+# of each word of the vocabulary in a tweet (needs ALPHA > 0)
+EVENT_MODEL = 'multinomial'  # { 'multinomial', 'bernoulli' }
+
+# P(class) of each class (None : proportion of the training samples of each class)
+PRIORS = None  # e.g. [0.5, 0.5]
+
+# Number of processes used for the training (1 : serial training)
+PROCESSES = 1
+
+# Number of rows of each chunk when the file is read by chunks
+CHUNK_SIZE = 100000
+
+# Distributed training (cf. Distributed) : number of distinct words counted by a worker before its counts are
+# written to the shards of the vocabulary
+SPILL_WORDS = 1000000
+
+# Number of tweets scored by each vectorized product
+BATCH_SIZE = 65536
+
+# Maximal number of predictions kept by the prediction cache (0 : no cache)
+CACHE_SIZE = 0  # e.g. 1000000
+
+# Classification server : address, port, maximal number of tweets of a micro-batch and
+# maximal time (in seconds) a request waits for other requests before scoring
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+MAX_BATCH = 4096
+LATENCY_BUDGET = 0.001
+
+# Instrumentation of the pipeline (cf. Instrumentation class) : metrics of each stage written in
+# FOLDER_PATH + REPORT_PATH (.json and .prom), PROFILING also writes the reports of cProfile and tracemalloc
+INSTRUMENTATION = False
+PROFILING = False
+REPORT_PATH = "report"
 
-# Laplace Smoothing
-LAPLACE_SMOOTHING = False
+# Predicted class when the scores of several classes are equal
+UNDETERMINED = -1
 
 # Metrics indices
 ACCURACY = 0
 PRECISION = 1
 RECALL = 2
 SPECIFICITY = 3
+F1 = 4
 TP = 0
 TN = 3
 FP = 2
@@ -0,0 +1,126 @@
+from collections import Counter
+from itertools import chain
+
+import numpy as np
+
+from Constants import *
+from Tokenizer import Tokenizer
+
+"""
+COUNTMINSKETCH CLASS :
+Estimates the frequency of every word of a stream of tweets with a fixed amount of memory,
+to choose the candidates of a vocabulary of bounded size without keeping every word :
+ ________________________________________________
+|  ROW / COLUMN  |   0   |   1   |  ...  |  W-1  |
+|________________|_______|_______|_______|_______|
+|       0        |  sum of CARD(WORD) ...        |
+|________________|_______________________________|
+|      ...       |  ...                          |
+|________________|_______________________________|
+    * each cell is the sum of CARD(WORD) of the words that fall in this column
+    * in row d, the column of a word is (h1 + d * h2) modulo W, h1 and h2 being the two halves of its hash
+    * the estimated frequency of a word is the minimum of its cells : it is never lower than the real one
+
+The words with the highest estimated frequencies are kept as candidates (at most `capacity` words after
+each batch). A second pass counts the candidates exactly (cf. Trainer class with a fixed vocabulary),
+then Trainer.prune() keeps the best words of the vocabulary.
+"""
+
+
+class CountMinSketch:
+    """
+    @attr   _table              matrix of shape (depth, width) with the counts of each cell
+    @attr   _capacity           maximal number of candidates kept after each batch
+    @attr   _candidates         dict() giving the hash of each candidate word
+    @attr   _tokenizer          tokenizer of the tweets (cf. Tokenizer class)
+    """
+    __slots__ = ["_table", "_capacity", "_candidates", "_tokenizer"]
+
+    def __init__(self, capacity, width=2 ** 20, depth=4, tokenizer=None):
+        """
+        Initializes an empty sketch.
+        @param  capacity    maximal number of candidate words
+        @param  width       number of columns of each row (the error of the estimations decreases with the width)
+        @param  depth       number of rows (the probability of a large error decreases with the depth)
+        @param  tokenizer   tokenizer of the tweets (None : words are kept as strings, without hashing)
+        """
+        self._table = np.zeros((depth, width), dtype=np.int64)
+        self._capacity = capacity
+        self._candidates = dict()
+        self._tokenizer = Tokenizer() if tokenizer is None else tokenizer
+
+    def add(self, tweets, indices=None, batch_size=BATCH_SIZE):
+        """
+        Adds the words of tweets to the sketch. Can be called several times.
+        @param  tweets      array of tweets
+        @param  indices     indices of the tweets to add (None : every tweet), e.g. a training set of Data
+        @param  batch_size  number of tweets added at once
+        """
+        if indices is None:
+            for start in range(0, len(tweets), batch_size):
+                self._add(tweets[start:start + batch_size])
+        else:
+            for start in range(0, len(indices), batch_size):
+                self._add(tweets[indices[start:start + batch_size]])
+
+    def add_chunks(self, chunks):
+        """
+        Adds the words of the tweets of every chunk (cf. Reader.read_chunks).
+        @param  chunks      iterable of (tweets, labels)
+        """
+        for tweets, labels in chunks:
+            self.add(tweets)
+
+    def estimate(self, words):
+        """
+        Gives the estimated frequency of each word (never lower than the real one).
+        @param  words       list of words
+        """
+        return self._estimate(self._tokenizer.hash64(words))
+
+    def get_candidates(self):
+        """
+        Returns the candidate words, from the highest estimated frequency to the lowest.
+        """
+        candidates = list(self._candidates)
+        estimations = self._estimate(np.fromiter(self._candidates.values(), dtype=np.uint64, count=len(candidates)))
+        return [candidates[i] for i in np.argsort(-estimations, kind='stable')]
+
+    def _add(self, tweets):
+        """
+        Adds the words of a batch of tweets to the sketch, and keeps the best candidates.
+        @param  tweets      array of tweets
+        """
+        counts = Counter(chain.from_iterable(self._tokenizer.tokenize(tweets)))
+        words = list(counts)
+        hashes = self._tokenizer.hash64(words)
+        cards = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        for row, columns in enumerate(self._columns(hashes)):
+            np.add.at(self._table[row], columns, cards)
+
+        self._candidates.update(zip(words, hashes))
+        if len(self._candidates) > self._capacity:
+            candidates = list(self._candidates)
+            estimations = self._estimate(np.fromiter(self._candidates.values(), dtype=np.uint64,
+                                                     count=len(candidates)))
+            kept = np.sort(np.argpartition(-estimations, self._capacity - 1)[:self._capacity])
+            self._candidates = {candidates[i]: self._candidates[candidates[i]] for i in kept}
+
+    def _columns(self, hashes):
+        """
+        Gives the column of each hash in each row.
+        @param  hashes      array of uint64 hashes
+        """
+        width = np.uint64(self._table.shape[1])
+        low, high = hashes & np.uint64(0xffffffff), hashes >> np.uint64(32)
+        return [((low + np.uint64(row) * high) % width).astype(np.int64) for row in range(len(self._table))]
+
+    def _estimate(self, hashes):
+        """
+        Gives the estimated frequency of the words of some hashes.
+        @param  hashes      array of uint64 hashes
+        """
+        estimations = np.full(len(hashes), np.iinfo(np.int64).max)
+        for row, columns in enumerate(self._columns(hashes)):
+            np.minimum(estimations, self._table[row, columns], out=estimations)
+        return estimations
@@ -0,0 +1,192 @@
+from itertools import starmap
+from multiprocessing import Pool
+
+import numpy as np
+
+from Constants import *
+from Bayes import Bayes
+from Trainer import Trainer
+
+"""
+CROSSVALIDATION CLASS :
+Runs a k-fold cross-validation without training k models from scratch :
+- the words of each fold are counted once (in parallel),
+- the counts of the whole dataset are the sum of the counts of the folds,
+- the model of fold i is given by the counts of the whole dataset minus the counts of fold i, built only when
+  a process is free to evaluate it (at most one model waits for each process),
+- the k models are evaluated in parallel.
+Folds are the ones of Data.create_sets_cv, so the results are the same as k separate trainings.
+Every class of the dataset is counted (cf. Data class), so that the models are multi-class with more than two labels.
+With a maximal size (or a minimal count of the n-grams), the vocabulary of each model is pruned after the
+counts of its fold are removed.
+"""
+
+
+class CrossValidation:
+    """
+    @attr   _dataset            dataset divided into folds (cf. Data class)
+    @attr   _k                  number of parts into what we divide the dataset
+    @attr   _alpha              additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing)
+    @attr   _processes          number of processes
+    @attr   _tokenizer          tokenizer of the tweets (cf. Tokenizer class)
+    @attr   _max_words          maximal number of words of the vocabulary of each model (None : no maximum)
+    @attr   _min_count          minimal number of occurrences of a word of a sized vocabulary
+    @attr   _statistic          statistic used to choose the words of a sized vocabulary (cf. Trainer.prune)
+    @attr   _ngram_min_count    minimal number of occurrences of a kept n-gram (None : n-grams are not pruned)
+    @attr   _priors             P(class) of each class (None : proportion of the training samples of each class)
+    @attr   _metrics            list containing the evaluation metrics of each fold
+    @attr   _conf_matrices      list containing the confusion matrix of each fold
+    @attr   _undetermined       list containing the number of tweets with undetermined sentiments of each fold
+    """
+    __slots__ = ["_dataset", "_k", "_alpha", "_processes", "_tokenizer", "_max_words", "_min_count",
+                 "_statistic", "_ngram_min_count", "_priors", "_metrics", "_conf_matrices", "_undetermined"]
+
+    def __init__(self, dataset, k, alpha, processes=PROCESSES, tokenizer=None, max_words=None,
+                 min_count=1, statistic='frequency', ngram_min_count=None, priors=None):
+        """
+        Initializes a new cross-validation.
+        @param  dataset             dataset (cf. Data class)
+        @param  k                   number of parts into what we divide the dataset
+        @param  alpha               additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing)
+        @param  processes           number of processes
+        @param  tokenizer           tokenizer of the tweets (None : words are kept as strings, without hashing)
+        @param  max_words           maximal number of words of the vocabulary of each model (None : no maximum)
+        @param  min_count           minimal number of occurrences of a word of a sized vocabulary
+        @param  statistic           statistic used to choose the words of a sized vocabulary (cf. Trainer.prune)
+        @param  ngram_min_count     minimal number of occurrences of a kept n-gram (None : n-grams are not pruned)
+        @param  priors              P(class) of each class (None : proportion of the training samples of each class)
+        """
+        self._dataset = dataset
+        self._k = k
+        self._alpha = alpha
+        self._processes = processes
+        self._tokenizer = tokenizer
+        self._max_words = max_words
+        self._min_count = min_count
+        self._statistic = statistic
+        self._ngram_min_count = ngram_min_count
+        self._priors = priors
+        self._metrics = []
+        self._conf_matrices = []
+        self._undetermined = []
+
+    def run(self):
+        """
+        Trains and evaluates the model of each fold.
+        @return list of the metrics and list of the confusion matrices of each fold
+        """
+        data = self._dataset.get_data()
+        with Pool(self._processes) as pool:
+            evaluations = []
+            for fold, fold_total in count_folds(self._dataset, self._k, self._tokenizer, pool):
+                if len(evaluations) >= self._processes:
+                    evaluations[len(evaluations) - self._processes].wait()
+                if self._max_words is not None or self._ngram_min_count is not None:
+                    fold_total.prune(self._max_words, self._min_count, self._statistic, self._ngram_min_count)
+                model = fold_total.get_model(self._alpha, self._priors)
+                evaluations.append(pool.apply_async(_evaluate_fold, (model, data[fold])))
+            results = [evaluation.get() for evaluation in evaluations]
+
+        self._metrics = [metrics for metrics, conf_matrix, nb_undetermined in results]
+        self._conf_matrices = [conf_matrix for metrics, conf_matrix, nb_undetermined in results]
+        self._undetermined = [nb_undetermined for metrics, conf_matrix, nb_undetermined in results]
+        return self._metrics, self._conf_matrices
+
+    def get_mean_metrics(self):
+        """
+        Returns the arithmetic mean of the metrics and of the confusion matrices of every fold.
+        """
+        mean_metrics = [sum(metrics[i] for metrics in self._metrics) / self._k for i in range(len(self._metrics[0]))]
+        mean_conf_matrix = (sum(np.asarray(conf_matrix) for conf_matrix in self._conf_matrices) / self._k).tolist()
+        return mean_metrics, mean_conf_matrix
+
+    def print_results(self):
+        """
+        displays the metrics and the confusion matrix of each fold and their arithmetic mean
+        """
+        for set_number, (metrics, conf_matrix) in enumerate(zip(self._metrics, self._conf_matrices), 1):
+            print(f'--- SET NUMBER {set_number} ----------------------------------------------')
+            print(f'Number of tweets with undetermined sentiments : {self._undetermined[set_number - 1]}')
+            _print_confusion_matrix(conf_matrix)
+            print(f'Accuracy: {metrics[ACCURACY]} | Precision: {metrics[PRECISION]} | '
+                  f'Recall: {metrics[RECALL]} | Specificity: {metrics[SPECIFICITY]} | F1: {metrics[F1]}')
+
+        mean_metrics, mean_conf_matrix = self.get_mean_metrics()
+        print(f'\n \n Cross-validation with {self._k}-fold metrics\' arithmetic mean results: \n')
+
+        print("--- CONFUSION MATRIX ------------------------------------------")
+        _print_confusion_matrix(mean_conf_matrix)
+        print(" \n")
+
+        print("--- METRICS ---------------------------------------------------")
+        print(f'Accuracy: {mean_metrics[ACCURACY]}')
+        print(f'Precision: {mean_metrics[PRECISION]}')
+        print(f'Recall: {mean_metrics[RECALL]}')
+        print(f'Specificity: {mean_metrics[SPECIFICITY]}')
+        print(f'F1: {mean_metrics[F1]}')
+
+
+def _print_confusion_matrix(conf_matrix):
+    """
+    Displays a binary confusion matrix (cf. TP, TN, FP, FN indices), or a matrix REAL CLASS x PREDICTED CLASS.
+    @param  conf_matrix     confusion matrix of a fold, or mean of the confusion matrices
+    """
+    if np.ndim(conf_matrix) == 1:
+        print(f'TP:{conf_matrix[TP]} | FN:{conf_matrix[FN]}')
+        print(f'FP:{conf_matrix[FP]} | TN:{conf_matrix[TN]}')
+        return
+    for label, row in enumerate(conf_matrix):
+        print(f'Class {label}: ' + " | ".join(f'{count:>8g}' for count in row))
+
+
+def count_folds(dataset, k, tokenizer=None, pool=None):
+    """
+    Counts the words of each fold once, and gives the counts of the training set of each fold : the counts of the
+    whole dataset minus the counts of the fold. The counts of each training set are built one at a time, when the
+    next one is asked for : only the total and the counts of the folds not given yet are kept.
+    @param  dataset     dataset (cf. Data class)
+    @param  k           number of folds
+    @param  tokenizer   tokenizer of the tweets (None : words are kept as strings, without hashing)
+    @param  pool        pool of processes counting the folds (None : the folds are counted by this process)
+    @return generator of (indices of the fold, Trainer with the counts of every other fold), one for each fold
+    """
+    folds, rest = dataset.fold_indices(k)
+    data, labels = dataset.get_data(), dataset.get_labels()
+    nb_classes = dataset.get_nb_classes()
+    tasks = [(data[fold, 0], labels[fold], nb_classes, tokenizer) for fold in folds + [rest]]
+    fold_trainers = list(starmap(_count_fold, tasks)) if pool is None else pool.starmap(_count_fold, tasks)
+    total = Trainer(nb_classes, tokenizer=tokenizer)
+    for trainer in fold_trainers:
+        total.merge(trainer)
+    fold_trainers.pop()  # the samples in no fold are only counted in the total
+
+    fold_trainers.reverse()
+    for fold in folds:
+        fold_total = total.copy()
+        fold_total.remove(fold_trainers.pop())
+        yield fold, fold_total
+
+
+def _count_fold(tweets, labels, nb_classes, tokenizer):
+    """
+    Counts the words of one fold (run by each process of count_folds).
+    @param  tweets      tweets of the fold
+    @param  labels      labels of the fold
+    @param  nb_classes  number of classes
+    @param  tokenizer   tokenizer of the tweets
+    """
+    trainer = Trainer(nb_classes, tokenizer=tokenizer)
+    trainer.train(tweets, labels)
+    return trainer
+
+
+def _evaluate_fold(model, test_set):
+    """
+    Predicts and compares the sentiments of one fold (run by each process of CrossValidation.run).
+    @param  model       model trained without this fold
+    @param  test_set    samples of the fold
+    """
+    bayes = Bayes(model, test_set)
+    nb_undetermined = bayes.predict_sentiments()
+    metrics, conf_matrix = bayes.compare_sentiments()
+    return metrics, conf_matrix, nb_undetermined
@@ -1,109 +1,192 @@
 import numpy as np
 
+from Constants import *
+from Instrumentation import instrumentation
+
 """
 DATA CLASS :
 Create a dataset as a numpy array :
      ________________________
     |     0     |     1      | 
     |___________|____________|
-    |   TWEET   |   POS/NEG  | 
+    |   TWEET   |   LABEL    | 
     |___________|____________|
     |    ...    |    ...     |    
     |___________|____________|
-Allows to create training and testing set for our model.
+Allows to create training and testing set for our model, as arrays of indices of the samples.
+Labels are classes going from 0 to the number of classes - 1 (e.g. 0 : negative, 1 : positive), and every
+split keeps the proportion of each class. Samples with other labels are in no set, and samples without a label
+(e.g. NaN read from an empty cell) are dropped.
 """
 
 
 class Data:
     """
-    @attr   _data               matrix containing the data
-    @attr   _pos_data	  	    matrix of positive samples
-    @attr   _neg_data	  	    matrix of negative samples
-    @attr   _pos_spl_nb	  	    number of positive samples in the training set
-    @attr   _neg_spl_nb	  	    number of negative samples in the training set
+    @attr   _data               matrix containing the data (shared by every split, never copied)
+    @attr   _labels             array containing the label of each sample
+    @attr   _rng                random generator used to permute the samples
+    @attr   _class_indices      list with the indices of the samples of each class, in random order
+    @attr   _spl_nbs            number of samples of each class in the training set
+    @attr   _nb_dropped         number of samples dropped because they have no label
     """
-    __slots__ = ["_data", "_pos_data", "_neg_data", "_pos_spl_nb", "_neg_spl_nb"]
+    __slots__ = ["_data", "_labels", "_rng", "_class_indices", "_spl_nbs", "_nb_dropped"]
 
-    def __init__(self, data):
+    def __init__(self, data, seed=SEED, nb_classes=None):
         """
         Initializes a new data set with given data.
-        Calculates the number of positive and negative samples.
+        Samples are not copied : training and testing sets are given as arrays of indices of the samples.
         @param  data
+        @param  seed            seed of the random permutations (None : different permutations at every run)
+        @param  nb_classes      number of classes (None : given by the largest label, at least 2)
         """
         self._data = data[1:, :]
-        np.random.shuffle(self._data)
-        self._pos_data = self._data[self._data[:, 1] == 1]
-        self._neg_data = self._data[self._data[:, 1] == 0]
-        self._pos_spl_nb = 0
-        self._neg_spl_nb = 0
+        labels = np.asarray(self._data[:, 1], dtype=np.float64)
+        labelled = ~np.isnan(labels)
+        self._nb_dropped = len(labels) - int(np.count_nonzero(labelled))
+        if self._nb_dropped:  # copies the data only when some samples have no label
+            self._data = self._data[labelled]
+            labels = labels[labelled]
+        self._labels = labels.astype(np.int64)
+        self._rng = np.random.default_rng(seed)
+        if nb_classes is None:
+            nb_classes = max(int(self._labels.max(initial=0)) + 1, 2)
+        self._spl_nbs = np.zeros(nb_classes, dtype=np.int64)
+        self.permute()
 
-    def create_sets_holdout(self, percent=0.8):
+    def permute(self):
         """
-        Given a dataset, constructs the training and test sets with Holdout.
+        Draws a new random order of the samples (e.g. for repeated holdout). Only indices are permuted.
+        """
+        with instrumentation.stage("split", tweets=len(self._labels)):
+            order = self._rng.permutation(len(self._labels))
+            labels = self._labels[order]
+            self._class_indices = [order[labels == label] for label in range(len(self._spl_nbs))]
+
+    def holdout_indices(self, percent=0.8):
+        """
+        Given a dataset, gives the indices of the training and test sets with Holdout.
         @param  percent     proportion of the dataset that will become training set
+        @return list of the indices of the training samples of each class, and indices of testing samples
         """
         assert percent > 0.0, print("Holdout percent should be greater than 0%")
-        split_pos_nb = int(len(self._pos_data) * percent)
-        split_neg_nb = int(len(self._neg_data) * percent)
-        self._pos_spl_nb = split_pos_nb
-        self._neg_spl_nb = split_neg_nb
+        with instrumentation.stage("split", tweets=len(self._labels)):
+            self._spl_nbs = np.array([int(len(index) * percent) for index in self._class_indices], dtype=np.int64)
+
+            test_index = np.concatenate([index[split:] for index, split in zip(self._class_indices, self._spl_nbs)])
+            self._rng.shuffle(test_index)
+        return [index[:split] for index, split in zip(self._class_indices, self._spl_nbs)], test_index
+
+    def cv_indices(self, set_number, k=5):
+        """
+        Given a dataset, gives the indices of a training and a testing set from the cross validation.
+        @param  set_number      index of the k-fold that we use as testing set
+        @param  k               number of parts into what we divide the dataset
+        @return list of the indices of the training samples of each class, and indices of testing samples
+        """
+        with instrumentation.stage("split", tweets=len(self._labels)):
+            fold_sizes = [int(len(index) / k) for index in self._class_indices]
+            self._spl_nbs = np.array([len(index) - size for index, size in zip(self._class_indices, fold_sizes)],
+                                     dtype=np.int64)
 
-        # training set
-        train_pos = self._pos_data[:split_pos_nb]
-        train_neg = self._neg_data[:split_neg_nb]
+            # training set
+            train_indices = [np.concatenate((index[:(set_number - 1) * size], index[set_number * size:]))
+                             for index, size in zip(self._class_indices, fold_sizes)]
 
-        # testing set
-        test_pos = np.array(self._pos_data[split_pos_nb:])
-        test_neg = np.array(self._neg_data[split_neg_nb:])
-        test_set = np.concatenate((test_pos, test_neg), axis=0)
-        np.random.shuffle(test_set)
+            # testing set
+            test_index = np.concatenate([index[(set_number - 1) * size:set_number * size]
+                                         for index, size in zip(self._class_indices, fold_sizes)])
+            self._rng.shuffle(test_index)
+        return train_indices, test_index
 
-        return train_pos, train_neg, test_set
+    def fold_indices(self, k=5):
+        """
+        Gives the indices of the k parts used as testing sets by the cross validation.
+        @param  k               number of parts into what we divide the dataset
+        @return list of the indices of the k parts, and indices of the samples that are in the training set of every part
+        """
+        with instrumentation.stage("split", tweets=len(self._labels)):
+            fold_sizes = [int(len(index) / k) for index in self._class_indices]
+            self._spl_nbs = np.array([len(index) - size for index, size in zip(self._class_indices, fold_sizes)],
+                                     dtype=np.int64)
+
+            folds = [np.concatenate([index[i * size:(i + 1) * size]
+                                     for index, size in zip(self._class_indices, fold_sizes)]) for i in range(k)]
+            rest = np.concatenate([index[k * size:] for index, size in zip(self._class_indices, fold_sizes)])
+        return folds, rest
+
+    def create_sets_holdout(self, percent=0.8):
+        """
+        Given a dataset, constructs the training and test sets with Holdout.
+        @param  percent     proportion of the dataset that will become training set
+        @return list of the training samples of each class, and testing samples
+        """
+        train_indices, test_index = self.holdout_indices(percent)
+        return [self._data[index] for index in train_indices], self._data[test_index]
 
     def create_sets_cv(self, set_number, k=5):
         """
         Given a dataset, constructs a training and a testing set from the cross validation.
         @param  set_number      index of the k-fold that we use as testing set
         @param  k               number of parts into what we divide the dataset
+        @return list of the training samples of each class, and testing samples
         """
-        n_pos_data = int(len(self._pos_data) / k)
-        n_neg_data = int(len(self._neg_data) / k)
-        self._pos_spl_nb = len(self._pos_data) - n_pos_data
-        self._neg_spl_nb = len(self._neg_data) - n_neg_data
+        train_indices, test_index = self.cv_indices(set_number, k)
+        return [self._data[index] for index in train_indices], self._data[test_index]
 
-        # training set
-        train_pos = np.concatenate((np.array(self._pos_data[:(set_number - 1) * n_pos_data]),
-                                    np.array(self._pos_data[set_number * n_pos_data:])), axis=0)
-        train_neg = np.concatenate((np.array(self._neg_data[:(set_number - 1) * n_neg_data]),
-                                    np.array(self._neg_data[set_number * n_neg_data:])), axis=0)
+    def create_folds(self, k=5):
+        """
+        Divides the dataset into the k parts used as testing sets by create_sets_cv.
+        @param  k               number of parts into what we divide the dataset
+        @return list of the k parts, and the samples that are in the training set of every part
+        """
+        folds, rest = self.fold_indices(k)
+        return [self._data[index] for index in folds], self._data[rest]
 
-        # testing set
-        test_pos = np.array(self._pos_data[(set_number - 1) * n_pos_data:set_number * n_pos_data])
-        test_neg = np.array(self._neg_data[(set_number - 1) * n_neg_data:set_number * n_neg_data])
-        test_set = np.concatenate((test_pos, test_neg), axis=0)
-        np.random.shuffle(test_set)
+    def get_data(self):
+        """
+        Returns the matrix containing the data, to be read through the indices of the sets
+        """
+        return self._data
 
-        return train_pos, train_neg, test_set
+    def get_tweets(self):
+        """
+        Returns the tweets of every sample, to be read through the indices of the sets
+        """
+        return self._data[:, 0]
+
+    def get_labels(self):
+        """
+        Returns the labels of every sample, to be read through the indices of the sets
+        """
+        return self._labels
+
+    def get_nb_classes(self):
+        """
+        Returns the number of classes.
+        """
+        return len(self._spl_nbs)
 
-    def get_pos_spl_nb(self):
+    def get_nb_dropped(self):
         """
-        Once the training and testing sets are created, returns how many positive samples are in the training set
+        Returns the number of samples dropped because they have no label.
         """
-        return self._pos_spl_nb
+        return self._nb_dropped
 
-    def get_neg_spl_nb(self):
+    def get_spl_nbs(self):
         """
-        Once the training and testing sets are created, returns how many negative samples are in the training set
+        Once the training and testing sets are created, returns how many samples of each class are in the training set
         """
-        return self._neg_spl_nb
+        return self._spl_nbs
 
     def to_string(self):
         """
         Represents the database as a string
         """
         txt = "Class: database.py\n"
-        txt += "  [X] Positive samples in the database:	 %d samples\n" % len(self._pos_data)
-        txt += "  [X] Negative samples in the database:	 %d samples\n" % len(self._neg_data)
-        txt += "  [X] Positive samples in training set:	 %d samples\n" % self._pos_spl_nb
-        txt += "  [X] Negative samples in training set:	 %d samples\n" % self._neg_spl_nb
+        if self._nb_dropped:
+            txt += "  [X] Samples without a label (dropped):	 %d samples\n" % self._nb_dropped
+        for label, index in enumerate(self._class_indices):
+            txt += "  [X] Samples of class %d in the database:	 %d samples\n" % (label, len(index))
+        for label, spl_nb in enumerate(self._spl_nbs):
+            txt += "  [X] Samples of class %d in training set:	 %d samples\n" % (label, spl_nb)
         return txt
@@ -1,4 +1,8 @@
-import re
+from collections import Counter
+from itertools import chain
+
+from Instrumentation import instrumentation
+from Tokenizer import Tokenizer
 #import nltk
 #nltk.download('punkt')
 
@@ -35,29 +39,25 @@ class Dictionary:
         """
         Creates the positive or negative dictionary with words from training tweets.
         """
-        my_dict = dict()
-        for tweet in self._data[:, 0]:
-            if type(tweet) == str:
-                for word in re.compile(r'\w+').findall(tweet):
-                    my_dict[word] = my_dict.setdefault(word, 0) + 1
-        self._dictionary = my_dict
+        self._dictionary = dict(self._count(self._data))
 
     def create_sized_dictionary(self, size):
         """
-        Creates the dictionary with maximum size from words from training tweets.
+        Creates the dictionary with the most frequent words of the training tweets.
         @param  size    maximal length of the dictionary
         """
-        my_sized_dict = dict()
-        actual_size = 0
-        for tweet in self._data[:, 0]:
-            if actual_size <= size:
-                if type(tweet) == str:
-                    for word in re.compile(r'\w+').findall(tweet):
-                        my_sized_dict[word] = my_sized_dict.setdefault(word, 0) + 1
-                        actual_size += 1
-            else:
-                break
-        self._dictionary = my_sized_dict
+        self._dictionary = dict(self._count(self._data).most_common(size))
+
+    def _count(self, data):
+        """
+        Counts the words of the tweets of some samples.
+        @param  data    samples
+        """
+        with instrumentation.stage("dictionary", tweets=len(data)) as stage:
+            counts = Counter(chain.from_iterable(Tokenizer().tokenize(data[:, 0])))
+            if instrumentation.is_enabled():
+                stage.add(tokens=sum(counts.values()))
+        return counts
 
     def get_dictionary(self):
         """
@@ -69,13 +69,10 @@ class Dictionary:
         """
         Give the raw count of our dictionary.
         """
-        return len(list(self._dictionary))
+        return len(self._dictionary)
 
     def get_dictionary_card(self):
         """
         Give the sum of every word cardinal : total amount of word in the dictionary.
         """
-        somme = 0
-        for word in self._dictionary:
-            somme += self._dictionary[word]
-        return somme
+        return sum(self._dictionary.values())
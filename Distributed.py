@@ -0,0 +1,353 @@
+#!/usr/bin/python
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from glob import glob
+from itertools import chain, islice
+from multiprocessing import Pool
+
+import numpy as np
+
+from Constants import *
+from Reader import Reader
+from Tokenizer import Tokenizer
+from Trainer import Trainer
+from Model import Model
+
+"""
+DISTRIBUTEDTRAINER CLASS :
+Trains a model on more tweets than the memory of one machine can count : the vocabulary is split into shards
+(the shard of a word is its 64-bit hash modulo the number of workers, cf. Tokenizer.hash64), and each worker
+owns the counts of one shard. Workers only exchange files, in a work folder shared by every node :
+ ___________________________________________________________________________________________
+|  STAGE    |  RUN BY        |  READS                         |  WRITES                     |
+|___________|________________|________________________________|_____________________________|
+|  count    |  each worker   |  its part of the tweets        |  spill_SHARD_WORKER_N.npz   |
+|           |                |                                |  map_WORKER.json            |
+|  reduce   |  each worker   |  spill_SHARD_*.npz of its      |  shard_SHARD.npz            |
+|           |                |  shard                         |                             |
+|  merge    |  coordinator   |  map_*.json, shard_*.npz       |  model file (cf. Model)     |
+|___________|________________|________________________________|_____________________________|
+
+- count : the worker counts its chunks of tweets with a Trainer (each worker reads its own files, or every
+  W-th chunk of the files when there are fewer files than workers). Each time its vocabulary reaches
+  spill_words words, and at the end, its counts are split by shard and written in spill files, so that
+  the memory of a worker is bounded by spill_words. The number of tweets of each class is written at the end.
+- reduce : once every worker has counted, the worker of a shard sums the counts of its spill files (words are
+  grouped by their 64-bit hash, cf. Vocabulary class). With a maximal size of the vocabulary chosen by
+  frequency, a shard only keeps its best words : the best words of the whole vocabulary are among them.
+  Spill files are kept, so that a reduce can be run again until the merge has finished.
+  Each count gives its map file a new run id, and each shard keeps the digest of the run ids it was reduced
+  from : shards left in the work folder by an earlier run are reduced again, and rejected by the merge.
+- merge : the coordinator sums the number of tweets of each class, concatenates the shards and prunes the
+  vocabulary (cf. Trainer.prune), then removes the spill files and gives the merged model.
+Words of different shards are distinct, so the merged counts are the ones of a training on a single machine
+(only the ids of the words differ). Several local processes can stand in for the nodes (cf. run).
+Hashed vocabularies are not sharded : their counts already have a fixed size (cf. Trainer.train_parallel).
+
+Usage : python Distributed.py run tweets.csv --workers 4 --output model.nbm
+        python Distributed.py count part1.csv part2.csv --index 0 --workers 4 --work-dir /shared/nb  (each node)
+        python Distributed.py reduce --index 0 --workers 4 --work-dir /shared/nb                    (each node)
+        python Distributed.py merge --workers 4 --work-dir /shared/nb --output model.nbm
+"""
+
+
+class DistributedTrainer:
+    """
+    @attr   _filenames          csv files of the tweets (cf. Reader.read_chunks)
+    @attr   _work_dir           folder shared by every worker, where the counts are exchanged
+    @attr   _workers            number of workers, and of shards of the vocabulary
+    @attr   _nb_classes         number of classes, labels going from 0 to nb_classes - 1
+    @attr   _tokenizer          tokenizer of the tweets (cf. Tokenizer class)
+    @attr   _chunk_size         number of tweets of each chunk read by a worker
+    @attr   _spill_words        number of words counted by a worker before its counts are written to the shards
+    @attr   _max_words          maximal number of words of the vocabulary (None : no maximum)
+    @attr   _min_count          minimal number of occurrences of a word of a sized vocabulary
+    @attr   _statistic          statistic used to choose the words of a sized vocabulary (cf. Trainer.prune)
+    @attr   _ngram_min_count    minimal number of occurrences of a kept n-gram (None : n-grams are not pruned)
+    """
+    __slots__ = ["_filenames", "_work_dir", "_workers", "_nb_classes", "_tokenizer", "_chunk_size", "_spill_words",
+                 "_max_words", "_min_count", "_statistic", "_ngram_min_count"]
+
+    def __init__(self, filenames, work_dir, workers, nb_classes=2, tokenizer=None, chunk_size=CHUNK_SIZE,
+                 spill_words=SPILL_WORDS, max_words=None, min_count=1, statistic='frequency', ngram_min_count=None):
+        """
+        Initializes a new distributed training.
+        @param  filenames           list of csv files of the tweets (only read by the count stage)
+        @param  work_dir            folder shared by every worker, where the counts are exchanged
+        @param  workers             number of workers, and of shards of the vocabulary
+        @param  nb_classes          number of classes, labels going from 0 to nb_classes - 1
+        @param  tokenizer           tokenizer of the tweets (None : words are kept as strings, without hashing)
+        @param  chunk_size          number of tweets of each chunk read by a worker
+        @param  spill_words         number of words counted by a worker before its counts are written to the shards
+        @param  max_words           maximal number of words of the vocabulary (None : no maximum)
+        @param  min_count           minimal number of occurrences of a word of a sized vocabulary
+        @param  statistic           statistic used to choose the words of a sized vocabulary (cf. Trainer.prune)
+        @param  ngram_min_count     minimal number of occurrences of a kept n-gram (None : n-grams are not pruned)
+        """
+        tokenizer = Tokenizer() if tokenizer is None else tokenizer
+        if tokenizer.get_nb_buckets() is not None:
+            raise ValueError("Hashed vocabularies are not sharded : their size is the number of buckets")
+        self._filenames = list(filenames)
+        self._work_dir = work_dir
+        self._workers = workers
+        self._nb_classes = nb_classes
+        self._tokenizer = tokenizer
+        self._chunk_size = chunk_size
+        self._spill_words = spill_words
+        self._max_words = max_words
+        self._min_count = min_count
+        self._statistic = statistic
+        self._ngram_min_count = ngram_min_count
+
+    def run(self, alpha, priors=None, processes=None):
+        """
+        Runs every stage on local processes standing in for the nodes : the workers count, then reduce their
+        shard, then the counts are merged.
+        @param  alpha       additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing)
+        @param  priors      P(class) of each class (None : proportion of the training samples of each class)
+        @param  processes   number of processes (default : one for each worker)
+        @return merged model (cf. Model class)
+        """
+        with Pool(self._workers if processes is None else processes) as pool:
+            pool.map(self.count, range(self._workers))
+            pool.map(self.reduce, range(self._workers))
+        return self.merge(alpha, priors)
+
+    def count(self, worker):
+        """
+        Counts the words of the part of the tweets of a worker, and writes its counts in the spill files
+        of each shard (count stage).
+        @param  worker      index of the worker, from 0 to workers - 1
+        @return dict() {worker, run, tweets, spl_nbs, spills}, also written in map_WORKER.json
+        """
+        for filename in glob(self._path(f'spill_*_{worker:04d}_*.npz')) + glob(self._path(f'map_{worker:04d}.json')):
+            os.remove(filename)  # files of a previous run
+        spl_nbs = np.zeros(self._nb_classes, dtype=np.int64)
+        nb_tweets, nb_spills = 0, 0
+        trainer = Trainer(self._nb_classes, tokenizer=self._tokenizer)
+        for tweets, labels in self._chunks(worker):
+            trainer.train(tweets, labels)
+            nb_tweets += len(tweets)
+            if trainer.get_counts().shape[1] >= self._spill_words:
+                spl_nbs += trainer.get_spl_nbs()
+                self._spill(trainer, worker, nb_spills)
+                nb_spills += 1
+                trainer = Trainer(self._nb_classes, tokenizer=self._tokenizer)
+        spl_nbs += trainer.get_spl_nbs()
+        if trainer.get_counts().shape[1]:
+            self._spill(trainer, worker, nb_spills)
+            nb_spills += 1
+
+        result = {"worker": worker, "run": uuid.uuid4().hex, "tweets": nb_tweets, "spl_nbs": spl_nbs.tolist(), "spills": nb_spills}
+        with open(self._path(f'map_{worker:04d}.json.tmp'), 'w') as file:
+            json.dump(result, file)
+        os.replace(self._path(f'map_{worker:04d}.json.tmp'), self._path(f'map_{worker:04d}.json'))
+        return result
+
+    def reduce(self, shard):
+        """
+        Sums the counts of the spill files of a shard, and writes them in shard_SHARD.npz (reduce stage).
+        Once the spill files have been removed by the merge, a shard reduced from the same counts is not written
+        again.
+        Raises ValueError if a worker has not finished counting.
+        @param  shard       index of the shard, from 0 to workers - 1
+        @return number of words of the shard
+        """
+        digest = _digest(self._read_markers())
+        filenames = sorted(glob(self._path(f'spill_{shard:04d}_*.npz')))
+        if not filenames and os.path.exists(self._path(f'shard_{shard:04d}.npz')):
+            words, hashes, counts, shard_digest = _load_counts(self._path(f'shard_{shard:04d}.npz'))
+            if shard_digest == digest:
+                return len(words)  # already merged
+        words, hashes, counts = [], [np.empty(0, dtype=np.uint64)], [np.zeros((self._nb_classes, 0), dtype=np.int64)]
+        for filename in filenames:
+            spill_words, spill_hashes, spill_counts, spill_digest = _load_counts(filename)
+            words.extend(spill_words)
+            hashes.append(spill_hashes)
+            counts.append(spill_counts)
+        hashes, first, inverse = np.unique(np.concatenate(hashes), return_index=True, return_inverse=True)
+        shard_counts = np.zeros((len(hashes), self._nb_classes), dtype=np.int64)
+        np.add.at(shard_counts, inverse, np.hstack(counts).T)
+        words = [words[i] for i in first.tolist()]
+
+        kept = self._prune_shard(words, shard_counts.T)
+        _save_counts(self._path(f'shard_{shard:04d}.npz'), [words[i] for i in kept.tolist()], hashes[kept],
+                     shard_counts[kept].T, digest)
+        return len(kept)
+
+    def merge(self, alpha, priors=None):
+        """
+        Gathers the number of tweets of each class and the counts of every shard into one model, then removes the
+        spill files (merge stage).
+        Raises ValueError if a worker has not finished counting or reducing (or if a shard was reduced from the
+        counts of another run).
+        @param  alpha       additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing)
+        @param  priors      P(class) of each class (None : proportion of the training samples of each class)
+        @return merged model (cf. Model class)
+        """
+        markers = self._read_markers()
+        digest = _digest(markers)
+        spl_nbs = np.sum([marker["spl_nbs"] for marker in markers], axis=0, dtype=np.int64)
+        words, counts = [], []
+        for shard in range(self._workers):
+            filename = self._path(f'shard_{shard:04d}.npz')
+            if not os.path.exists(filename):
+                raise ValueError(f'Shard {shard} has not been reduced : {filename} is missing')
+            shard_words, shard_hashes, shard_counts, shard_digest = _load_counts(filename)
+            if shard_digest != digest:
+                raise ValueError(f'Shard {shard} has not been reduced since the last count : {filename} is stale')
+            words.extend(shard_words)
+            counts.append(shard_counts)
+        event_model = 'bernoulli' if self._tokenizer.is_binary() else 'multinomial'
+        model = Model(words, np.hstack(counts), spl_nbs, alpha, ngram_range=self._tokenizer.get_ngram_range(),
+                      event_model=event_model, priors=priors)
+        if self._max_words is not None or self._ngram_min_count is not None:
+            trainer = Trainer.from_model(model)
+            trainer.prune(self._max_words, self._min_count, self._statistic, self._ngram_min_count)
+            model = trainer.get_model(alpha, priors)
+        for filename in glob(self._path('spill_*.npz')):
+            os.remove(filename)
+        return model
+
+    def _chunks(self, worker):
+        """
+        Yields the chunks of tweets of a worker : its own files, or every W-th chunk of the files when there are
+        fewer files than workers (the other chunks are read, but not counted).
+        @param  worker      index of the worker
+        """
+        reader = Reader('')
+        if len(self._filenames) >= self._workers:
+            for filename in self._filenames[worker::self._workers]:
+                yield from reader.read_chunks(filename, self._chunk_size)
+        else:
+            chunks = chain.from_iterable(reader.read_chunks(filename, self._chunk_size) for filename in self._filenames)
+            yield from islice(chunks, worker, None, self._workers)
+
+    def _spill(self, trainer, worker, number):
+        """
+        Writes the counts of a trainer in the spill files of each shard.
+        @param  trainer     trainer with the counts of some chunks of the worker
+        @param  worker      index of the worker
+        @param  number      number of the spill of this worker
+        """
+        words = np.array(trainer.get_words(), dtype=object)
+        hashes = Tokenizer().hash64(words.tolist())
+        shards = (hashes % np.uint64(self._workers)).astype(np.int64)
+        for shard in range(self._workers):
+            columns = np.flatnonzero(shards == shard)
+            if len(columns):
+                _save_counts(self._path(f'spill_{shard:04d}_{worker:04d}_{number:04d}.npz'), words[columns].tolist(),
+                             hashes[columns], trainer.get_counts()[:, columns])
+
+    def _prune_shard(self, words, counts):
+        """
+        Gives the words of a shard that can belong to the pruned vocabulary : with the frequency statistic, the words
+        that are frequent enough and, with a maximal size, the best max_words words of the shard (cf.
+        Trainer.select_words). With the log-odds statistic, the words depend on the counts of the whole vocabulary :
+        every word is kept.
+        @param  words       list of the words of the shard
+        @param  counts      matrix with CARD(WORD) of each word of the shard for each class
+        @return sorted array of the indices of the kept words
+        """
+        if self._statistic != 'frequency' or (self._max_words is None and self._ngram_min_count is None):
+            return np.arange(len(words))
+        return Trainer.select_words(words, counts, self._max_words, self._min_count, 'frequency', self._ngram_min_count)
+
+    def _read_markers(self):
+        """
+        Reads the results of the count stage of every worker (map_WORKER.json).
+        Raises ValueError if a worker has not finished counting.
+        """
+        markers = []
+        for worker in range(self._workers):
+            filename = self._path(f'map_{worker:04d}.json')
+            if not os.path.exists(filename):
+                raise ValueError(f'Worker {worker} has not finished counting : {filename} is missing')
+            with open(filename) as file:
+                markers.append(json.load(file))
+        return markers
+
+    def _path(self, filename):
+        """
+        Gives the path of a file of the work folder.
+        """
+        return os.path.join(self._work_dir, filename)
+
+
+def _digest(markers):
+    """
+    Gives the digest of the run ids of the count stage of every worker.
+    @param  markers     results of the count stage of every worker (cf. DistributedTrainer.count)
+    """
+    return hashlib.sha1(' '.join(marker["run"] for marker in markers).encode('utf-8')).hexdigest()
+
+
+def _save_counts(filename, words, hashes, counts, digest=''):
+    """
+    Writes counts in a .npz file : utf-8 words separated by new lines, their 64-bit hashes and their counts.
+    The file is written under another name then renamed, so that other workers never read a partial file.
+    @param  filename    path of the file
+    @param  words       list of words
+    @param  hashes      array of the 64-bit hash of each word
+    @param  counts      matrix with CARD(WORD) of each word (columns) for each class (rows)
+    @param  digest      digest of the runs of the counts of a shard (cf. _digest)
+    """
+    with open(filename + '.tmp', 'wb') as file:
+        np.savez(file, words=np.frombuffer('\n'.join(words).encode('utf-8'), dtype=np.uint8), hashes=hashes,
+                 counts=counts, digest=np.array(digest))
+    os.replace(filename + '.tmp', filename)
+
+
+def _load_counts(filename):
+    """
+    Reads counts written by _save_counts.
+    @param  filename    path of the file
+    @return list of words, array of their hashes, matrix of their counts and digest of their runs
+    """
+    with np.load(filename) as arrays:
+        words = bytes(arrays["words"]).decode('utf-8')
+        return words.split('\n') if words else [], arrays["hashes"], arrays["counts"], str(arrays["digest"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trains a model with a vocabulary sharded between workers")
+    parser.add_argument("stage", choices=['run', 'count', 'reduce', 'merge'],
+                        help="run : every stage on local processes, or one stage of one worker (count, reduce) "
+                             "or of the coordinator (merge)")
+    parser.add_argument("filenames", nargs='*', help="csv files of the tweets (run and count stages)")
+    parser.add_argument("--workers", type=int, required=True, help="number of workers, and of shards")
+    parser.add_argument("--index", type=int, help="index of the worker (count) or of the shard (reduce)")
+    parser.add_argument("--work-dir", help="folder shared by every worker (default for run : temporary folder)")
+    parser.add_argument("--output", help="file of the merged model (run and merge stages)")
+    parser.add_argument("--classes", type=int, default=2, help="number of classes")
+    parser.add_argument("--spill-words", type=int, default=SPILL_WORDS,
+                        help="number of words counted by a worker before its counts are written to the shards")
+    args = parser.parse_args()
+
+    sized = SIZED_DCT and NB_BUCKETS is None
+    work_dir = tempfile.mkdtemp() if args.work_dir is None else args.work_dir
+    trainer = DistributedTrainer(args.filenames, work_dir, args.workers, args.classes,
+                                 Tokenizer(NB_BUCKETS, NGRAM_RANGE, EVENT_MODEL == 'bernoulli'), CHUNK_SIZE,
+                                 args.spill_words, SIZE if sized else None, MIN_COUNT, PRUNING_STATISTIC,
+                                 NGRAM_MIN_COUNT if NGRAM_RANGE[1] > 1 and NB_BUCKETS is None else None)
+    try:
+        if args.stage == 'count':
+            result = trainer.count(args.index)
+            print(f"Worker {args.index} : {result['tweets']} tweets counted, {result['spills']} spills")
+        elif args.stage == 'reduce':
+            print(f"Shard {args.index} : {trainer.reduce(args.index)} words")
+        else:
+            model = trainer.run(ALPHA, PRIORS) if args.stage == 'run' else trainer.merge(ALPHA, PRIORS)
+            print(f"Model created : {model.to_string()}")
+            if args.output:
+                model.save(args.output)
+                print(f"Model saved in {args.output}")
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir)
@@ -0,0 +1,339 @@
+import io
+import json
+import tracemalloc
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:  # not available on Windows : the high-water mark of the process is not measured
+    resource = None
+
+"""
+INSTRUMENTATION CLASS :
+Registry of the metrics of the pipeline, filled by hooks in Reader, Data, Dictionary, Trainer, Scorer and Bayes :
+ _______________________________________________________________________________________
+|   METRIC                  |   CONTENT                                                 |
+|___________________________|___________________________________________________________|
+|   stage                   |  calls, seconds, tweets and tokens of a stage of the      |
+|                           |  pipeline (read, split, dictionary, train, score, ...),   |
+|                           |  tweets and tokens per second, peak memory of a call      |
+|   gauge                   |  last value of a measure (e.g. number of words of the     |
+|                           |  vocabulary, high-water mark of the memory of the process)|
+|   series                  |  every value of a gauge with its time (e.g. growth of the |
+|                           |  vocabulary during the training)                          |
+|___________________________|___________________________________________________________|
+
+Hooks cost nothing while the registry is disabled (the default), and a few microseconds for each call
+of a stage otherwise. The metrics can be exported as json or in the Prometheus text format.
+
+The capture mode also runs cProfile and tracemalloc : the time of each function and the lines that
+allocated the most memory are written in the report of the run, and the peak memory of each stage is
+measured (tracemalloc slows down the code, so the timings of a captured run are larger).
+
+Usage : instrumentation.enable()
+        with instrumentation.stage("read") as stage :
+            ...
+            stage.add(tweets=len(tweets))
+        instrumentation.save_report("report")
+"""
+
+
+class Instrumentation:
+    """
+    @attr   _enabled            boolean that gives the information if the hooks record metrics
+    @attr   _stages             dict() STAGE -> [calls, seconds, tweets, tokens, peak memory (bytes)]
+    @attr   _gauges             dict() GAUGE -> last value
+    @attr   _series             dict() GAUGE -> list of (seconds since enable(), value)
+    @attr   _open_stages        stages being measured, from the outermost to the innermost
+    @attr   _profiler           profiler of the capture mode (None : no capture)
+    @attr   _start              time when the registry was enabled
+    """
+    __slots__ = ["_enabled", "_stages", "_gauges", "_series", "_open_stages", "_profiler", "_start"]
+
+    def __init__(self):
+        """
+        Initializes a new disabled registry.
+        """
+        self._enabled = False
+        self._profiler = None
+        self.reset()
+
+    def enable(self):
+        """
+        Starts recording the metrics.
+        """
+        self._enabled = True
+        self._start = perf_counter()
+
+    def disable(self):
+        """
+        Stops recording the metrics (the metrics recorded are kept).
+        """
+        self._enabled = False
+
+    def is_enabled(self):
+        """
+        Returns the boolean that gives the information if the hooks record metrics.
+        """
+        return self._enabled
+
+    def reset(self):
+        """
+        Removes every metric.
+        """
+        self._stages = dict()
+        self._gauges = dict()
+        self._series = dict()
+        self._open_stages = []
+        self._start = perf_counter()
+
+    def stage(self, name, tweets=0, tokens=0):
+        """
+        Measures a stage of the pipeline : with instrumentation.stage(name) as stage : ...
+        @param  name        name of the stage
+        @param  tweets      number of tweets processed by the stage (can be given later with add())
+        @param  tokens      number of tokens processed by the stage (can be given later with add())
+        """
+        if not self._enabled:
+            return _NO_STAGE
+        return _Stage(self, name, tweets, tokens)
+
+    def add(self, name, tweets=0, tokens=0):
+        """
+        Adds tweets and tokens to a stage, without measuring its time (e.g. from an inner function).
+        @param  name        name of the stage
+        @param  tweets      number of tweets processed
+        @param  tokens      number of tokens processed
+        """
+        if self._enabled:
+            self._record(name, 0, 0, tweets, tokens, 0)
+
+    def gauge(self, name, value):
+        """
+        Sets the value of a gauge, and adds it to its series.
+        @param  name        name of the gauge
+        @param  value       value of the gauge
+        """
+        if self._enabled:
+            self._gauges[name] = value
+            self._series.setdefault(name, []).append((perf_counter() - self._start, value))
+
+    def start_capture(self, profile=True, memory=True):
+        """
+        Starts the capture mode (and enables the registry).
+        @param  profile     boolean that gives the information if cProfile measures the time of each function
+        @param  memory      boolean that gives the information if tracemalloc measures the memory
+        """
+        self.enable()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if profile:
+            import cProfile  # profilers are only imported by the capture mode
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop_capture(self):
+        """
+        Stops the capture mode.
+        @return profiling statistics (None : no profiling) and memory snapshot (None : no tracing)
+        """
+        stats, snapshot = None, None
+        if self._profiler is not None:
+            import pstats
+
+            self._profiler.disable()
+            stats = pstats.Stats(self._profiler)
+            self._profiler = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        return stats, snapshot
+
+    def get_stages(self):
+        """
+        Returns the metrics of each stage : dict() STAGE -> {calls, seconds, tweets, tokens, tweets_per_second,
+        tokens_per_second, peak_memory_bytes}
+        """
+        stages = dict()
+        for name, (calls, seconds, tweets, tokens, peak) in self._stages.items():
+            stages[name] = {"calls": calls, "seconds": seconds, "tweets": tweets, "tokens": tokens,
+                            "tweets_per_second": tweets / seconds if seconds else None,
+                            "tokens_per_second": tokens / seconds if seconds else None,
+                            "peak_memory_bytes": peak}
+        return stages
+
+    def get_gauges(self):
+        """
+        Returns the last value of each gauge.
+        """
+        return self._gauges
+
+    def to_json(self):
+        """
+        Represents the metrics as a json string.
+        """
+        return json.dumps({"stages": self.get_stages(), "gauges": self._gauges, "series": self._series}, indent=2)
+
+    def to_prometheus(self, prefix="sentiment"):
+        """
+        Represents the metrics in the Prometheus text format.
+        @param  prefix      prefix of the name of each metric
+        """
+        lines = []
+        stages = self.get_stages()
+        for metric, kind, description in [("calls", "counter", "Number of calls of each stage of the pipeline"),
+                                          ("seconds", "counter", "Time spent in each stage of the pipeline"),
+                                          ("tweets", "counter", "Number of tweets processed by each stage"),
+                                          ("tokens", "counter", "Number of tokens processed by each stage"),
+                                          ("peak_memory_bytes", "gauge", "Peak memory allocated by a call of each "
+                                                                         "stage (capture mode only)")]:
+            name = f"{prefix}_stage_{metric}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f'{name}{{stage="{stage}"}} {values[metric]}' for stage, values in stages.items())
+        for gauge, value in self._gauges.items():
+            lines.append(f"# TYPE {prefix}_{gauge} gauge")
+            lines.append(f"{prefix}_{gauge} {value}")
+        return "\n".join(lines) + "\n"
+
+    def save_report(self, prefix):
+        """
+        Writes the report of the run : metrics as json (PREFIX.json) and in the Prometheus text format
+        (PREFIX.prom), and with the capture mode, statistics of cProfile (PREFIX.prof, and the most expensive
+        functions in PREFIX_profile.txt) and the lines that allocated the most memory (PREFIX_memory.txt).
+        The capture mode is stopped.
+        @param  prefix      path of the files of the report, without extension
+        """
+        stats, snapshot = self.stop_capture()
+        with open(prefix + ".json", 'w') as file:
+            file.write(self.to_json())
+        with open(prefix + ".prom", 'w') as file:
+            file.write(self.to_prometheus())
+        if stats is not None:
+            import pstats
+
+            stats.dump_stats(prefix + ".prof")
+            text = io.StringIO()
+            pstats.Stats(prefix + ".prof", stream=text).sort_stats("cumulative").print_stats(40)
+            with open(prefix + "_profile.txt", 'w') as file:
+                file.write(text.getvalue())
+        if snapshot is not None:
+            with open(prefix + "_memory.txt", 'w') as file:
+                for statistic in snapshot.statistics("lineno")[:40]:
+                    file.write(f"{statistic}\n")
+
+    def to_string(self):
+        """
+        Represents the metrics of each stage as a string
+        """
+        txt = "Class: Instrumentation.py\n"
+        for name, values in self.get_stages().items():
+            txt += "  [X] %s:	 %d calls, %.3f s, %d tweets, %d tokens" % (name, values["calls"], values["seconds"],
+                                                                         values["tweets"], values["tokens"])
+            if values["tweets_per_second"]:
+                txt += ", %.0f tweets/s" % values["tweets_per_second"]
+            if values["peak_memory_bytes"]:
+                txt += ", peak %.1f MB" % (values["peak_memory_bytes"] / 2 ** 20)
+            txt += "\n"
+        for name, value in self._gauges.items():
+            txt += "  [X] %s:	 %s\n" % (name, value)
+        return txt
+
+    def _record(self, name, calls, seconds, tweets, tokens, peak):
+        """
+        Adds the measures of a call to the metrics of a stage.
+        """
+        values = self._stages.get(name)
+        if values is None:
+            values = self._stages[name] = [0, 0.0, 0, 0, 0]
+        values[0] += calls
+        values[1] += seconds
+        values[2] += tweets
+        values[3] += tokens
+        values[4] = max(values[4], peak)
+
+    def _update_peaks(self):
+        """
+        Gives the peak memory traced since the last update to every open stage (nested stages reset the peak).
+        """
+        peak = tracemalloc.get_traced_memory()[1]
+        for stage in self._open_stages:
+            stage._peak = max(stage._peak, peak)
+
+
+class _Stage:
+    """
+    Measures one call of a stage (cf. Instrumentation.stage).
+    """
+    __slots__ = ["_instrumentation", "_name", "_tweets", "_tokens", "_start", "_memory", "_peak", "_cancelled"]
+
+    def __init__(self, instrumentation, name, tweets, tokens):
+        self._instrumentation = instrumentation
+        self._name = name
+        self._tweets = tweets
+        self._tokens = tokens
+        self._cancelled = False
+
+    def add(self, tweets=0, tokens=0):
+        """
+        Adds tweets and tokens processed by this call.
+        """
+        self._tweets += tweets
+        self._tokens += tokens
+
+    def cancel(self):
+        """
+        Does not record this call (e.g. a read that found no more data).
+        """
+        self._cancelled = True
+
+    def __enter__(self):
+        self._memory = 0
+        self._peak = 0
+        if tracemalloc.is_tracing():
+            self._instrumentation._update_peaks()
+            tracemalloc.reset_peak()
+            self._memory = tracemalloc.get_traced_memory()[0]
+        self._instrumentation._open_stages.append(self)
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        seconds = perf_counter() - self._start
+        instrumentation = self._instrumentation
+        peak = 0
+        if tracemalloc.is_tracing():
+            instrumentation._update_peaks()
+            peak = max(self._peak - self._memory, 0)
+        instrumentation._open_stages.remove(self)
+        if not self._cancelled:
+            instrumentation._record(self._name, 1, seconds, self._tweets, self._tokens, peak)
+        if resource is not None:
+            # ru_maxrss is given in kilobytes on Linux
+            instrumentation.gauge("max_rss_bytes", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+        return False
+
+
+class _NoStage:
+    """
+    Stage of a disabled registry : measures nothing.
+    """
+    __slots__ = []
+
+    def add(self, tweets=0, tokens=0):
+        pass
+
+    def cancel(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+instrumentation = Instrumentation()  # registry shared by every hook of the pipeline
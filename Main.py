@@ -2,13 +2,22 @@
 
 from Reader import *
 from Data import *
-from Dictionary import *
+from Trainer import *
+from Tokenizer import *
+from CountMinSketch import *
+from Cache import *
 from Bayes import *
+from CrossValidation import *
+from Instrumentation import *
 from Constants import *
 
 if __name__ == "__main__":
 
     print("BAYESIAN LEARNING \n")
+    if PROFILING:
+        instrumentation.start_capture()
+    elif INSTRUMENTATION:
+        instrumentation.enable()
 
     print("Creating READER class with data folder path...")
     reader = Reader(FOLDER_PATH)
@@ -22,39 +31,56 @@ if __name__ == "__main__":
     dataset = Data(raw_dataset)
     print(f'Dataset created')
 
+    # the Bernoulli model counts the tweets containing each word : each word is given once for each tweet
+    tokenizer = Tokenizer(NB_BUCKETS, NGRAM_RANGE, EVENT_MODEL == 'bernoulli')
+    # hashed vocabularies are bounded by their number of buckets : they are never pruned
+    sized = SIZED_DCT and NB_BUCKETS is None
+    ngram_min_count = NGRAM_MIN_COUNT if NGRAM_RANGE[1] > 1 and NB_BUCKETS is None else None
+
 
     # --------- VALIDATION METHOD = HOLDOUT ----------
 
     if VALIDATION == 'holdout':
         print("Creating training and testing sets...")
-        training_pos_set, training_neg_set, testing_set = dataset.create_sets_holdout(HOLDOUT_PERCENT)
-        pos_spl_nb = dataset.get_pos_spl_nb()
-        neg_spl_nb = dataset.get_neg_spl_nb()
+        training_indices, testing_index = dataset.holdout_indices(HOLDOUT_PERCENT)
+        tweets, labels = dataset.get_tweets(), dataset.get_labels()
         print(f'Dataset split between training and testing sets : {dataset.to_string()} \n \n')
 
-        print("Creating 2 DICTIONARY classes...")
-        dictionary1 = Dictionary(training_pos_set)
-        dictionary0 = Dictionary(training_neg_set)
-        print("Dictionary classes created")
-
-        print("Creating and completing positive and negative dictionaries...")
-        if SIZED_DCT is False:
-            dictionary1.create_dictionary()
-            print(f"Positive dictionary created")
-            dictionary0.create_dictionary()
-            print(f"Negative dictionary created \n \n")
-        else:
-            dictionary1.create_sized_dictionary(SIZE)
-            print("Positive dictionary created")
-            dictionary0.create_sized_dictionary(SIZE)
-            print("Negative dictionary created \n \n")
+        candidates = None
+        if sized:
+            print("Selecting candidate words of the vocabulary...")
+            sketch = CountMinSketch(CANDIDATES * SIZE, tokenizer=tokenizer)
+            for training_index in training_indices:
+                sketch.add(tweets, training_index)
+            candidates = sketch.get_candidates()
+            print(f"{len(candidates)} candidate words selected")
+
+        print("Creating TRAINER class...")
+        trainer = Trainer(dataset.get_nb_classes(), candidates, tokenizer)
+        print("Trainer class created")
+
+        print("Counting words of the tweets of each class...")
+        for training_index in training_indices:
+            if PROCESSES > 1:
+                trainer.train_parallel(tweets, labels, training_index, PROCESSES)
+            else:
+                trainer.train(tweets, labels, training_index)
+        if sized or ngram_min_count is not None:
+            trainer.prune(SIZE if sized else None, MIN_COUNT, PRUNING_STATISTIC, ngram_min_count)
+        model = trainer.get_model(ALPHA, PRIORS)
+        print(f"Model created : {model.to_string()} \n \n")
+
+        if MODEL_FILENAME is not None:
+            print("Saving model...")
+            model.save(FOLDER_PATH + MODEL_FILENAME)
+            print(f"Model saved in {FOLDER_PATH + MODEL_FILENAME}")
 
         print("Creating BAYES class...")
-        bayes = Bayes(dictionary1, dictionary0, testing_set)
+        bayes = Bayes(model, dataset.get_data()[testing_index], PredictionCache(CACHE_SIZE) if CACHE_SIZE else None)
         print("Bayes class created")
 
         print("Predicting sentiments for testing set...")
-        nb_undetermined = bayes.predict_sentiments(LAPLACE_SMOOTHING, pos_spl_nb, neg_spl_nb)
+        nb_undetermined = bayes.predict_sentiments()
         print("Prediction of sentiments for testing set done")
         print(f"Number of tweets with undetermined sentiments : {nb_undetermined}")
 
@@ -69,49 +95,12 @@ if __name__ == "__main__":
     # --------- VALIDATION METHOD = CROSSVALIDATION ----------
     else:
         print("Proceeding with cross-validation algorithm")
-
-        total_metrics = [0, 0, 0, 0]
-        total_conf_matrix = [0, 0, 0, 0]
-
-        for set_number in range(1, K+1):
-            training_pos_set, training_neg_set, testing_set = dataset.create_sets_cv(set_number, K)
-            pos_spl_nb = dataset.get_pos_spl_nb()
-            neg_spl_nb = dataset.get_neg_spl_nb()
-            print(f'Set number {set_number} created')
-
-            dictionary1 = Dictionary(training_pos_set)
-            dictionary0 = Dictionary(training_neg_set)
-            if SIZED_DCT is False:
-                dictionary1.create_dictionary()
-                dictionary0.create_dictionary()
-            else:
-                dictionary1.create_sized_dictionary(SIZE)
-                dictionary0.create_sized_dictionary(SIZE)
-            print("Dictionaries created")
-
-            bayes = Bayes(dictionary1, dictionary0, testing_set)
-            nb_undetermined = bayes.predict_sentiments(LAPLACE_SMOOTHING, pos_spl_nb, neg_spl_nb)
-            print(f'Prediction of sentiments for set {set_number} done')
-            print(f'Number of tweets with undetermined sentiments : {nb_undetermined}')
-
-            metrics, conf_matrix = bayes.compare_sentiments()
-
-            for i in range(0, 4):
-                total_metrics[i] += (metrics[i]/K)
-                total_conf_matrix[i] += (conf_matrix[i]/K)
-
-            bayes.print_metrics()
-            bayes.print_confusion_matrix()
-            bayes.plot_confusion_matrix()
-
-        print(f'\n \n Cross-validation with {K}-fold metrics\' arithmetic mean results: \n')
-
-        print("--- CONFUSION MATRIX ------------------------------------------")
-        print(f'TP:{total_conf_matrix[TP]} | FN:{total_conf_matrix[FN]}')
-        print(f'FP:{total_conf_matrix[FP]} | TN:{total_conf_matrix[TN]} \n \n')
-
-        print("--- METRICS ---------------------------------------------------")
-        print(f'Accuracy: {total_metrics[ACCURACY]}')
-        print(f'Precision: {total_metrics[PRECISION]}')
-        print(f'Recall: {total_metrics[RECALL]}')
-        print(f'Specificity: {total_metrics[SPECIFICITY]}')
\ No newline at end of file
+        cross_validation = CrossValidation(dataset, K, ALPHA, PROCESSES, tokenizer,
+                                           SIZE if sized else None, MIN_COUNT, PRUNING_STATISTIC, ngram_min_count,
+                                           PRIORS)
+        cross_validation.run()
+        cross_validation.print_results()
+
+    if INSTRUMENTATION or PROFILING:
+        instrumentation.save_report(FOLDER_PATH + REPORT_PATH)
+        print(f"Instrumentation report saved in {FOLDER_PATH + REPORT_PATH} : {instrumentation.to_string()}")
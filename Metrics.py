@@ -0,0 +1,147 @@
+import numpy as np
+
+from Constants import *
+
+"""
+METRICS :
+Evaluation of predictions from integer label arrays, computed with NumPy :
+- confusion matrix (cf. Bayes class), tweets predicted as UNDETERMINED being counted apart,
+- accuracy, precision, recall, specificity and F1 score,
+- confusion matrices of the decision "positive if log-odds > threshold" for many thresholds in one pass.
+With more than two classes, the confusion matrix has one row for each real class and one column for each
+predicted class : each class is evaluated against the others (one-vs-rest), and the precision, recall,
+specificity and F1 score of the classes are averaged (macro-average, nan if undefined for a class).
+Undefined metrics (e.g. precision without any positive prediction) are nan.
+"""
+
+
+def confusion_matrix(test_y, predicted_y):
+    """
+    Compares the ground truth values to the predicted values.
+    @param  test_y          array of labels (0 or 1)
+    @param  predicted_y     array of predictions (0, 1 or UNDETERMINED)
+    @return confusion matrix as a list (cf. TP, TN, FP, FN indices) and number of undetermined predictions
+    """
+    test_y = np.asarray(test_y, dtype=np.int64)
+    predicted_y = np.asarray(predicted_y, dtype=np.int64)
+    if len(test_y) != len(predicted_y):
+        raise ValueError(f'predicted_y : length = {len(predicted_y)} and test_y : length = {len(test_y)} '
+                         f'have not the same length')
+
+    determined = predicted_y != UNDETERMINED
+    counted = determined & ((test_y == 0) | (test_y == 1))
+    cells = np.bincount(test_y[counted] * 2 + predicted_y[counted], minlength=4)
+    conf_matrix = [0, 0, 0, 0]
+    conf_matrix[TN] = int(cells[0])
+    conf_matrix[FP] = int(cells[1])
+    conf_matrix[FN] = int(cells[2])
+    conf_matrix[TP] = int(cells[3])
+    return conf_matrix, int(len(predicted_y) - np.count_nonzero(determined))
+
+
+def compute_metrics(conf_matrix):
+    """
+    Computes the evaluation metrics of a confusion matrix, or of an array of confusion matrices.
+    @param  conf_matrix     confusion matrix (cf. TP, TN, FP, FN indices), or array of shape (n, 4)
+    @return metrics (cf. ACCURACY, PRECISION, RECALL, SPECIFICITY, F1 indices), as a list or an array of shape (n, 5)
+    """
+    conf = np.asarray(conf_matrix, dtype=np.float64)
+    tp = conf[..., TP]
+    fn = conf[..., FN]
+    fp = conf[..., FP]
+    tn = conf[..., TN]
+
+    metrics = np.empty(conf.shape[:-1] + (5,))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics[..., ACCURACY] = (tp + tn) / (tp + tn + fp + fn)
+        metrics[..., PRECISION] = tp / (tp + fp)
+        metrics[..., RECALL] = tp / (tp + fn)
+        metrics[..., SPECIFICITY] = tn / (tn + fp)
+        metrics[..., F1] = 2 * tp / (2 * tp + fp + fn)
+    return metrics.tolist() if conf.ndim == 1 else metrics
+
+
+def class_confusion_matrix(test_y, predicted_y, nb_classes):
+    """
+    Compares the ground truth values to the predicted values of any number of classes.
+    @param  test_y          array of labels (0 to nb_classes - 1)
+    @param  predicted_y     array of predictions (0 to nb_classes - 1, or UNDETERMINED)
+    @param  nb_classes      number of classes
+    @return matrix of shape (nb_classes, nb_classes) : number of tweets of each real class (rows) predicted as
+            each class (columns), and number of undetermined predictions
+    """
+    test_y = np.asarray(test_y, dtype=np.int64)
+    predicted_y = np.asarray(predicted_y, dtype=np.int64)
+    if len(test_y) != len(predicted_y):
+        raise ValueError(f'predicted_y : length = {len(predicted_y)} and test_y : length = {len(test_y)} '
+                         f'have not the same length')
+
+    determined = predicted_y != UNDETERMINED
+    counted = determined & (test_y >= 0) & (test_y < nb_classes)
+    cells = np.bincount(test_y[counted] * nb_classes + predicted_y[counted], minlength=nb_classes ** 2)
+    return cells.reshape(nb_classes, nb_classes), int(len(predicted_y) - np.count_nonzero(determined))
+
+
+def one_vs_rest(class_conf_matrix):
+    """
+    Gives the binary confusion matrix of each class against the others.
+    @param  class_conf_matrix   matrix given by class_confusion_matrix()
+    @return array of shape (number of classes, 4) (cf. TP, TN, FP, FN indices)
+    """
+    matrix = np.asarray(class_conf_matrix, dtype=np.int64)
+    tp = np.diag(matrix)
+    conf_matrices = np.empty((len(matrix), 4), dtype=np.int64)
+    conf_matrices[:, TP] = tp
+    conf_matrices[:, FN] = matrix.sum(axis=1) - tp
+    conf_matrices[:, FP] = matrix.sum(axis=0) - tp
+    conf_matrices[:, TN] = matrix.sum() - conf_matrices[:, [TP, FN, FP]].sum(axis=1)
+    return conf_matrices
+
+
+def class_metrics(class_conf_matrix):
+    """
+    Computes the evaluation metrics of a confusion matrix of any number of classes.
+    @param  class_conf_matrix   matrix given by class_confusion_matrix()
+    @return metrics as a list (cf. ACCURACY, PRECISION, RECALL, SPECIFICITY, F1 indices) : accuracy and macro-average
+            of the metrics of the classes, and array of shape (number of classes, 5) with the metrics of each class
+    """
+    matrix = np.asarray(class_conf_matrix, dtype=np.float64)
+    per_class = compute_metrics(one_vs_rest(class_conf_matrix))
+    metrics = per_class.mean(axis=0)  # nan if the metric of a class is undefined
+    with np.errstate(invalid='ignore'):
+        metrics[ACCURACY] = np.trace(matrix) / matrix.sum()
+    return metrics.tolist(), per_class
+
+
+def threshold_confusion_matrices(test_y, log_odds, thresholds):
+    """
+    Gives the confusion matrix of the decision "positive if log-odds > threshold" for each threshold.
+    Tweets are sorted once by log-odds, then each threshold is a binary search in the sorted log-odds.
+    Tweets with undefined log-odds (nan) are undetermined for every threshold.
+    @param  test_y          array of labels (0 or 1)
+    @param  log_odds        array of log P(positive | tweet) - log P(negative | tweet)
+    @param  thresholds      array of decision thresholds
+    @return array of shape (len(thresholds), 4) with a confusion matrix per threshold, and number of undetermined
+    """
+    test_y = np.asarray(test_y, dtype=np.int64)
+    log_odds = np.asarray(log_odds, dtype=np.float64)
+    if len(test_y) != len(log_odds):
+        raise ValueError(f'log_odds : length = {len(log_odds)} and test_y : length = {len(test_y)} '
+                         f'have not the same length')
+
+    determined = ~np.isnan(log_odds)
+    order = np.argsort(log_odds[determined], kind='stable')
+    sorted_log_odds = log_odds[determined][order]
+    positive = test_y[determined][order] == 1
+
+    # number of positive and negative tweets among the i lowest log-odds
+    pos_below = np.concatenate(([0], np.cumsum(positive)))
+    neg_below = np.concatenate(([0], np.cumsum(~positive)))
+    below = np.searchsorted(sorted_log_odds, np.asarray(thresholds, dtype=np.float64), side='right')
+
+    conf_matrices = np.empty((len(below), 4), dtype=np.int64)
+    conf_matrices[:, FN] = pos_below[below]
+    conf_matrices[:, TN] = neg_below[below]
+    conf_matrices[:, TP] = pos_below[-1] - pos_below[below]
+    conf_matrices[:, FP] = neg_below[-1] - neg_below[below]
+    return conf_matrices, int(len(log_odds) - np.count_nonzero(determined))
@@ -0,0 +1,312 @@
+import json
+
+import numpy as np
+
+from Scorer import Scorer
+from Tokenizer import Tokenizer
+from Vocabulary import Vocabulary
+
+"""
+MODEL CLASS :
+Trained Naïve Bayes model : a vocabulary shared by every class and the counts of each word
+in each class (any number of classes), stored in a single matrix :
+ ______________________________________________
+|  CLASS / ID  |   0   |   1   |  ...  |  V-1  |
+|______________|_______|_______|_______|_______|
+|      0       |  CARD(WORD | 0) ...           |
+|______________|_______________________________|
+|      1       |  CARD(WORD | 1) ...           |
+|______________|_______________________________|
+|     ...      |  ...                          |
+|______________|_______________________________|
+    * the id of a word is given by the vocabulary (cf. Vocabulary class)
+    * with a hashing tokenizer, there is no vocabulary and the id of a word is its bucket (cf. Tokenizer class)
+    * with n-grams, each n-gram is a column, like a word (cf. Tokenizer class)
+    * with the Bernoulli event model, CARD(WORD | C) is the number of tweets of class C containing the word
+      (binary tokenizer), otherwise the number of occurrences of the word (cf. Scorer class)
+
+A model can be saved in a binary file :
+ ________________________________________________________________
+| MAGIC | HEADER LENGTH | HEADER (json) | ARRAY | ARRAY | ...    |
+|_______|_______________|_______________|_______|_______|________|
+    * the header gives the settings of the model and the dtype, shape and offset of each array
+    * arrays are aligned on ALIGNMENT bytes so that they can be memory-mapped when the model is loaded
+    * words of the vocabulary are stored in a single buffer, separated by new lines and sorted by id
+      (empty with a hashing tokenizer), followed by the hashes and the hash table of the vocabulary :
+      a loaded vocabulary is memory-mapped, without building any dict()
+    * with n-grams, the index of the n-grams used by the scorer follows (cf. Scorer.index_ngrams) : a loaded
+      model is ready to score without going through its vocabulary
+    * the totals of each class and the weights of the scorer (cf. Scorer.weigh) are stored too : loading a model
+      and building its scorer never reads the counts, and processes that load the same model share the pages of
+      its log-probabilities instead of computing their own copy
+    * files of another VERSION are rejected
+"""
+
+MAGIC = b'NBMODEL\x00'
+VERSION = 1
+ALIGNMENT = 64
+
+
+class Model:
+    """
+    @attr   _vocabulary         compact read-only vocabulary giving the id of each word (None with a hashing
+                                tokenizer)
+    @attr   _counts             matrix with CARD(WORD) of each word (columns) for each class (rows)
+    @attr   _spl_nbs            number of training samples of each class
+    @attr   _alpha              additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing)
+    @attr   _size               maximal number of words of the vocabulary (None if not pruned, cf. Trainer.prune)
+    @attr   _dct_card           cached sum of CARD(WORD) of each class (None : not computed yet)
+    @attr   _dct_len            cached number of words of each class (None : not computed yet)
+    @attr   _nb_buckets         number of buckets of the hashing tokenizer (None : no hashing)
+    @attr   _ngram_range        minimal and maximal number of words of a feature of the tokenizer
+    @attr   _event_model        event model of the classifier : 'multinomial' or 'bernoulli'
+    @attr   _priors             P(class) of each class (None : proportion of the training samples of each class)
+    @attr   _ngram_index        index of the n-grams of the vocabulary used by the scorer (None : not built yet)
+    @attr   _weights            log-probabilities and log-priors used by the scorer (None : not computed yet)
+    """
+    __slots__ = ["_vocabulary", "_counts", "_spl_nbs", "_alpha", "_size", "_dct_card", "_dct_len", "_nb_buckets",
+                 "_ngram_range", "_event_model", "_priors", "_ngram_index", "_weights"]
+
+    def __init__(self, vocabulary, counts, spl_nbs, alpha, size=None, nb_buckets=None, ngram_range=(1, 1),
+                 event_model='multinomial', priors=None, ngram_index=None, totals=None, weights=None):
+        """
+        Initializes a new model.
+        @param  vocabulary          dict() giving the id of each word, ids going from 0 to len(vocabulary) - 1
+                                    (or buffer of words separated by new lines sorted by id, or Vocabulary)
+        @param  counts              matrix of shape (number of classes, len(vocabulary)) with CARD(WORD) for each class
+        @param  spl_nbs             number of training samples of each class
+        @param  alpha               additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing)
+        @param  size                maximal number of words of the vocabulary (None if not pruned)
+        @param  nb_buckets          number of buckets of the hashing tokenizer (None : no hashing, cf. Tokenizer class)
+        @param  ngram_range         minimal and maximal number of words of a feature of the tokenizer
+        @param  event_model         'multinomial' or 'bernoulli' (counts of tweets containing each word)
+        @param  priors              P(class) of each class (None : proportion of the training samples of each class)
+        @param  ngram_index         index of the n-grams of the vocabulary (cf. Scorer.index_ngrams), None : built
+                                    by the first scorer
+        @param  totals              sum of CARD(WORD) and number of words of each class, None : computed when needed
+        @param  weights             log-probabilities and log-priors of the scorer (cf. Scorer.weigh), None : computed
+                                    by the first scorer
+        """
+        if event_model not in ('multinomial', 'bernoulli'):
+            raise ValueError(f'Unknown event model : {event_model}')
+        if nb_buckets is not None:
+            self._vocabulary = None
+        elif isinstance(vocabulary, Vocabulary):
+            self._vocabulary = vocabulary
+        elif isinstance(vocabulary, dict):
+            self._vocabulary = Vocabulary.from_dict(vocabulary)
+        else:
+            self._vocabulary = Vocabulary.from_words(vocabulary)
+        self._counts = counts
+        self._spl_nbs = np.asarray(spl_nbs, dtype=np.int64)
+        self._alpha = float(alpha)
+        self._size = size
+        self._dct_card, self._dct_len = (None, None) if totals is None else totals
+        self._nb_buckets = nb_buckets
+        self._ngram_range = tuple(ngram_range)
+        self._event_model = event_model
+        self._priors = None if priors is None else [float(prior) for prior in priors]
+        self._ngram_index = ngram_index
+        self._weights = weights
+
+    def get_scorer(self):
+        """
+        Returns the vectorized scoring engine of this model.
+        """
+        return Scorer(self.get_vocabulary(), self._counts, self._spl_nbs, self._alpha, self.get_tokenizer(),
+                      self._event_model, self._priors, self.get_ngram_index(), self.get_weights())
+
+    def get_ngram_index(self):
+        """
+        Returns the index of the n-grams of the vocabulary used by the scorer (cf. Scorer.index_ngrams), built once.
+        """
+        if self._ngram_index is None:
+            self._ngram_index = Scorer.index_ngrams(self._vocabulary, self._ngram_range)
+        return self._ngram_index
+
+    def get_weights(self):
+        """
+        Returns the log-probabilities and the log-priors used by the scorer (cf. Scorer.weigh), computed once.
+        """
+        if self._weights is None:
+            self._weights = Scorer.weigh(self._counts, self._spl_nbs, self._alpha, self._event_model, self._priors)
+        return self._weights
+
+    def get_totals(self):
+        """
+        Returns the sum of CARD(WORD) and the number of words of each class, computed once.
+        """
+        if self._dct_card is None:
+            self._dct_card = self._counts.sum(axis=1)
+            self._dct_len = np.count_nonzero(self._counts, axis=1)
+        return self._dct_card, self._dct_len
+
+    def get_tokenizer(self):
+        """
+        Returns the tokenizer used for the training (binary with the Bernoulli model).
+        """
+        return Tokenizer(self._nb_buckets, self._ngram_range, self._event_model == 'bernoulli')
+
+    def get_vocabulary(self):
+        """
+        Returns the compact vocabulary (None with a hashing tokenizer). Vocabulary.to_dict() gives a dict() WORD -> ID.
+        """
+        return self._vocabulary
+
+    def get_counts(self):
+        """
+        Returns the matrix of CARD(WORD) for each class.
+        """
+        return self._counts
+
+    def get_spl_nbs(self):
+        """
+        Returns the number of training samples of each class.
+        """
+        return self._spl_nbs
+
+    def get_alpha(self):
+        """
+        Returns the additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing).
+        """
+        return self._alpha
+
+    def get_event_model(self):
+        """
+        Returns the event model of the classifier : 'multinomial' or 'bernoulli'.
+        """
+        return self._event_model
+
+    def get_priors(self):
+        """
+        Returns P(class) of each class (None : proportion of the training samples of each class).
+        """
+        return self._priors
+
+    def get_size(self):
+        """
+        Returns the maximal number of words of the vocabulary (None if not pruned).
+        """
+        return self._size
+
+    def get_dictionary_length(self, label):
+        """
+        Give the raw count of the dictionary of a class.
+        @param  label   class of the dictionary
+        """
+        return int(self.get_totals()[1][label])
+
+    def get_dictionary_card(self, label):
+        """
+        Give the sum of every word cardinal of a class : total amount of word in its dictionary.
+        @param  label   class of the dictionary
+        """
+        return int(self.get_totals()[0][label])
+
+    def to_string(self):
+        """
+        Represents the model as a string
+        """
+        txt = "Class: model.py\n"
+        if self._nb_buckets is None:
+            txt += "  [X] Words in the vocabulary:	 %d words\n" % self._counts.shape[1]
+        else:
+            txt += "  [X] Hashed vocabulary:	 %d buckets\n" % self._nb_buckets
+        if self._ngram_range != (1, 1):
+            txt += "  [X] Features:	 %d-grams to %d-grams\n" % self._ngram_range
+        txt += "  [X] Event model:	 %s, alpha = %g\n" % (self._event_model, self._alpha)
+        if self._priors is not None:
+            txt += "  [X] Priors:	 %s\n" % ", ".join("%g" % prior for prior in self._priors)
+        dct_card, dct_len = self.get_totals()
+        for label in range(len(self._counts)):
+            txt += "  [X] Class %d: %d samples, %d words, %d occurrences\n" % (
+                label, self._spl_nbs[label], dct_len[label], dct_card[label])
+        return txt
+
+    def save(self, filename):
+        """
+        Saves the model in a binary file (cf. format at the top of this file).
+        @param  filename    path of the file
+        """
+        vocabulary = Vocabulary.from_words([]) if self._vocabulary is None else self._vocabulary
+        arrays = {
+            "words": np.ascontiguousarray(vocabulary.get_buffer(), dtype=np.uint8),
+            "hashes": np.ascontiguousarray(vocabulary.get_hashes(), dtype=np.uint64),
+            "table": np.ascontiguousarray(vocabulary.get_table(), dtype=np.int32),
+            "counts": np.ascontiguousarray(self._counts, dtype=np.int64),
+            "spl_nbs": np.ascontiguousarray(self._spl_nbs, dtype=np.int64),
+            "dct_card": np.ascontiguousarray(self.get_totals()[0], dtype=np.int64),
+            "dct_len": np.ascontiguousarray(self.get_totals()[1], dtype=np.int64),
+        }
+        if self._event_model == 'multinomial' or self._alpha > 0:  # otherwise the model cannot score
+            log_probabilities, log_priors = self.get_weights()
+            arrays["log_probabilities"] = np.ascontiguousarray(log_probabilities, dtype=np.float64)
+            arrays["log_priors"] = np.ascontiguousarray(log_priors, dtype=np.float64)
+        word_index, word_ids, ngrams, base = self.get_ngram_index()
+        if word_index is not None:
+            arrays["ngram_words"] = np.ascontiguousarray(word_index.get_buffer(), dtype=np.uint8)
+            arrays["ngram_hashes"] = np.ascontiguousarray(word_index.get_hashes(), dtype=np.uint64)
+            arrays["ngram_table"] = np.ascontiguousarray(word_index.get_table(), dtype=np.int32)
+            arrays["ngram_word_ids"] = np.ascontiguousarray(word_ids, dtype=np.int64)
+            for n, (keys, ids) in ngrams.items():
+                arrays[f"ngram_keys_{n}"] = np.ascontiguousarray(keys, dtype=np.int64)
+                arrays[f"ngram_ids_{n}"] = np.ascontiguousarray(ids, dtype=np.int64)
+
+        specs = dict()
+        offset = 0
+        for name, array in arrays.items():
+            specs[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({"version": VERSION, "alpha": self._alpha, "event_model": self._event_model,
+                             "priors": self._priors, "size": self._size, "nb_buckets": self._nb_buckets,
+                             "ngram_range": self._ngram_range, "ngram_base": base, "arrays": specs}).encode('utf-8')
+        start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+        with open(filename, 'wb') as file:
+            file.write(MAGIC)
+            file.write(np.uint64(len(header)).tobytes())
+            file.write(header)
+            for name, array in arrays.items():
+                file.write(b'\x00' * (start + specs[name]["offset"] - file.tell()))
+                file.write(array.tobytes())
+            file.write(b'\x00' * (start + offset - file.tell()))
+
+    @classmethod
+    def load(cls, filename, mmap=True):
+        """
+        Loads a model saved with save().
+        With mmap, arrays are memory-mapped : the file is read only when needed, and its pages are
+        shared between every process that loads the same model.
+        @param  filename    path of the file
+        @param  mmap        boolean that gives the information if arrays are memory-mapped or read in memory
+        """
+        if mmap:
+            buffer = np.memmap(filename, dtype=np.uint8, mode='r')
+        else:
+            buffer = np.fromfile(filename, dtype=np.uint8)
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f'{filename} is not a model file')
+        header_length = int(buffer[len(MAGIC):len(MAGIC) + 8].view(np.uint64)[0])
+        header = json.loads(bytes(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_length]).decode('utf-8'))
+        if header["version"] != VERSION:
+            raise ValueError(f'{filename} has version {header["version"]}, expected version {VERSION}')
+        start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+        arrays = dict()
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            offset = start + spec["offset"]
+            nbytes = int(np.prod(spec["shape"])) * dtype.itemsize
+            arrays[name] = buffer[offset:offset + nbytes].view(dtype).reshape(spec["shape"])
+        vocabulary = Vocabulary(arrays["hashes"], arrays["table"], arrays["words"])
+        ngram_index = (None, None, None, None)  # no n-grams (or keys that do not fit in 63 bits)
+        if header["ngram_base"] is not None:
+            word_index = Vocabulary(arrays["ngram_hashes"], arrays["ngram_table"], arrays["ngram_words"])
+            ngrams = {int(name[len("ngram_keys_"):]): (array, arrays["ngram_ids_" + name[len("ngram_keys_"):]])
+                      for name, array in arrays.items() if name.startswith("ngram_keys_")}
+            ngram_index = (word_index, arrays["ngram_word_ids"], ngrams, header["ngram_base"])
+        # a Bernoulli model without smoothing cannot score : it is saved without weights
+        weights = (arrays["log_probabilities"], arrays["log_priors"]) if "log_probabilities" in arrays else None
+        return cls(vocabulary, arrays["counts"], arrays["spl_nbs"], header["alpha"], header["size"],
+                   header["nb_buckets"], header["ngram_range"], header["event_model"], header["priors"], ngram_index,
+                   (arrays["dct_card"], arrays["dct_len"]), weights)
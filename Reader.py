@@ -1,5 +1,7 @@
 import numpy as np
-import pandas as pd
+
+from Constants import *
+from Instrumentation import instrumentation
 
 '''
 READER CLASS :
@@ -31,5 +33,33 @@ class Reader(object):
 
         @param filename : file containing data (.csv for example)
         """
-        file = pd.read_csv(self._folder + filename, sep=';', usecols=[1, 3])
-        return np.array([data for data in file.values])
+        import pandas as pd  # imported on the first read, so that scoring-only processes never load it
+
+        with instrumentation.stage("read") as stage:
+            data = pd.read_csv(self._folder + filename, sep=';', usecols=[1, 3]).to_numpy(dtype=object)
+            stage.add(tweets=len(data))
+        return data
+
+    def read_chunks(self, filename, chunk_size=CHUNK_SIZE):
+        """
+        Reads the file where the data is by chunks of fixed size, so that only one chunk is in memory at a time.
+        Yields for each chunk :
+        - tweets = array of tweetText (str, or nan for empty tweets)
+        - labels = array of sentimentLabel (int8)
+
+        @param filename : file containing data (.csv for example)
+        @param chunk_size : number of rows of each chunk
+        """
+        import pandas as pd
+
+        columns = pd.read_csv(self._folder + filename, sep=';', nrows=0).columns
+        dtype = {columns[1]: object, columns[3]: np.int8}
+        chunks = pd.read_csv(self._folder + filename, sep=';', usecols=[1, 3], dtype=dtype, chunksize=chunk_size)
+        while True:
+            with instrumentation.stage("read") as stage:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    stage.cancel()  # end of the file : no chunk read
+                    break
+                stage.add(tweets=len(chunk))
+            yield chunk[columns[1]].to_numpy(dtype=object), chunk[columns[3]].to_numpy(dtype=np.int8)
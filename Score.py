@@ -0,0 +1,53 @@
+#!/usr/bin/python
+
+import argparse
+import sys
+from itertools import islice
+
+import numpy as np
+
+from Constants import *
+from Model import Model
+
+"""
+SCORE :
+Scoring-only entry point for short-lived processes (command line calls, serverless workers) : a saved model
+(cf. Model.save) classifies the tweets given as arguments, or the lines of the standard input.
+Only NumPy and the scoring classes are imported : pandas (Reader, BulkScore) and matplotlib (Bayes) are not
+loaded, and the model file is memory-mapped with its vocabulary and the index of its n-grams, so that nothing
+is built before the first tweet is scored.
+For each tweet, a line "label<TAB>log-odds" is written on the standard output (cf. Scorer.log_odds).
+
+Usage : python Score.py model.nbm "first tweet" "second tweet"
+        cat tweets.txt | python Score.py model.nbm
+"""
+
+
+def score_lines(scorer, lines, output, batch_size=BATCH_SIZE):
+    """
+    Scores tweets by batches and writes the label and the log-odds of each tweet.
+    @param  scorer      scoring engine of the model (cf. Model.get_scorer)
+    @param  lines       iterable of tweets
+    @param  output      text file where the results are written
+    @param  batch_size  number of tweets scored by each vectorized product
+    """
+    lines = iter(lines)
+    while True:
+        batch = list(islice(lines, batch_size))
+        if not batch:
+            break
+        tweets = np.empty(len(batch), dtype=object)
+        tweets[:] = batch
+        labels, log_odds = scorer.predict(tweets, batch_size, return_log_odds=True)
+        output.writelines(f'{label}\t{value:.6g}\n' for label, value in zip(labels.tolist(), log_odds.tolist()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classifies tweets with a trained model")
+    parser.add_argument("model", help="file of the trained model (cf. Model.save)")
+    parser.add_argument("tweets", nargs='*', help="tweets to classify (default : one tweet for each line of stdin)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="number of tweets of each batch")
+    args = parser.parse_args()
+
+    lines = args.tweets if args.tweets else (line.rstrip('\r\n') for line in sys.stdin)
+    score_lines(Model.load(args.model).get_scorer(), lines, sys.stdout, args.batch_size)
@@ -0,0 +1,312 @@
+import numpy as np
+
+from Constants import *
+from Instrumentation import instrumentation
+from Tokenizer import Tokenizer
+from Vocabulary import Vocabulary
+
+"""
+SCORER CLASS :
+Vectorized Naïve Bayes scoring engine working in log-space.
+Every word of the vocabulary gets an integer id, and the log-probabilities of each
+class (any number of classes) are stored in a matrix indexed by these ids :
+ _________________________________________________________________
+|     ID      |  log P(WORD | 0)  |  log P(WORD | 1)  |    ...    |
+|_____________|___________________|___________________|___________|
+|    ...      |        ...        |        ...        |    ...    |
+|_____________|___________________|___________________|___________|
+|  UNKNOWN    |  log P(? | 0)     |  log P(? | 1)     |    ...    |
+|_____________|___________________|___________________|___________|
+    * the last row is shared by every word that does not belong to the vocabulary.
+    * the ids of the words of a batch are found at once in the hash table of the vocabulary (cf. Vocabulary class).
+    * with a hashing tokenizer (cf. Tokenizer class), the id of a word is its bucket.
+    * with n-grams, each n-gram of the vocabulary has its own id, like a word. The n-grams of the tweets are not
+      built as strings : each word gets an integer id, the key of an n-gram is given by the ids of its words
+      (key = id(w1) * B ** (n - 1) + ... + id(wn), B being the number of word ids), and the keys of a whole
+      batch are found at once in the sorted keys of the n-grams of the vocabulary.
+
+A batch of tweets is turned into a sparse matrix of (tweet, id, count) entries, so that
+the scores of the whole batch are given by a single sparse matrix-vector product :
+
+    score(tweet, class) = log P(class) + sum(count(word) * log P(word | class))
+
+Working with sums of logarithms instead of products of probabilities avoids the underflow
+that made long tweets "undetermined".
+
+Both event models of Naïve Bayes share this product, with an additive (Lidstone) smoothing alpha
+(alpha = 1 : Laplace Smoothing, alpha = 0 : no smoothing) :
+- multinomial : counts are occurrences of the words, and
+    P(word | class) = (CARD(word) + alpha) / (sum(CARD(word i)) + alpha * number of words of the class)
+- bernoulli : counts are numbers of tweets containing each word (cf. binary option of Tokenizer), and
+    P(word | class) = (CARD(word) + alpha) / (number of tweets of the class + 2 * alpha)
+  a tweet is scored with log P(class) + sum(log(1 - P(word | class))) over the whole vocabulary (added to the
+  priors once), plus log(P / (1 - P)) for each word of the tweet (each word counted once, unknown words ignored).
+A class without any training sample has no probabilities : its prior is log 0 = -inf and its log-probabilities
+are 0, so that it is never predicted. A class without any word of the vocabulary (multinomial model) is only
+scored with its prior.
+"""
+
+
+class Scorer:
+    """
+    @attr   _vocabulary         compact vocabulary giving the id of each word (None with a hashing tokenizer)
+    @attr   _log_probabilities  matrix of log P(word | class), one row per id (+ one row for unknown words)
+    @attr   _log_priors         vector of log P(class) (plus the log-probability that no word appears, with the
+                                Bernoulli model)
+    @attr   _tokenizer          tokenizer shared with the training (cf. Tokenizer class)
+    @attr   _word_index         compact vocabulary of the words of the n-grams of the vocabulary (None : n-grams
+                                are looked up as strings)
+    @attr   _word_ids           id of each word of _word_index
+    @attr   _ngrams             dict() N -> sorted keys of the n-grams of N words of the vocabulary, and their ids
+    @attr   _base               number of word ids, base of the keys of the n-grams
+    """
+    __slots__ = ["_vocabulary", "_log_probabilities", "_log_priors", "_tokenizer", "_word_index", "_word_ids", "_ngrams",
+                 "_base"]
+
+    def __init__(self, vocabulary, counts, spl_nbs, alpha, tokenizer=None, event_model='multinomial', priors=None,
+                 ngram_index=None, weights=None):
+        """
+        Initializes a new scorer from the word counts of each class.
+        @param  vocabulary          Vocabulary (or dict()) giving the id of each word, ids going from 0 to
+                                    len(vocabulary) - 1 (None with a hashing tokenizer)
+        @param  counts              matrix of shape (number of classes, len(vocabulary)) with CARD(WORD) for each class
+        @param  spl_nbs             number of training samples of each class
+        @param  alpha               additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing)
+        @param  tokenizer           tokenizer used for the training (None : words are kept as strings, without hashing)
+        @param  event_model         'multinomial' or 'bernoulli' (counts of a binary tokenizer, needs alpha > 0)
+        @param  priors              P(class) of each class (None : proportion of the training samples of each class)
+        @param  ngram_index         index of the n-grams of this vocabulary given by index_ngrams() (e.g. stored in a
+                                    model file), None : the index is built from the vocabulary
+        @param  weights             log-probabilities and log-priors given by weigh() (e.g. stored in a model file),
+                                    None : they are computed from the counts
+        """
+        if weights is None:
+            weights = self.weigh(counts, spl_nbs, alpha, event_model, priors)
+        self._vocabulary = Vocabulary.from_dict(vocabulary) if isinstance(vocabulary, dict) else vocabulary
+        self._log_probabilities, self._log_priors = weights
+        self._tokenizer = Tokenizer() if tokenizer is None else tokenizer
+        if ngram_index is None:
+            ngram_index = self.index_ngrams(self._vocabulary, self._tokenizer.get_ngram_range())
+        self._word_index, self._word_ids, self._ngrams, self._base = ngram_index
+
+    @staticmethod
+    def weigh(counts, spl_nbs, alpha, event_model='multinomial', priors=None):
+        """
+        Gives the log-probabilities of each word for each class, and the log-priors of each class.
+        The weights only depend on the model : they are computed once for a model (cf. Model.get_weights).
+        @param  counts          matrix of shape (number of classes, number of ids) with CARD(WORD) for each class
+        @param  spl_nbs         number of training samples of each class
+        @param  alpha           additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing)
+        @param  event_model     'multinomial' or 'bernoulli' (needs alpha > 0)
+        @param  priors          P(class) of each class (None : proportion of the training samples of each class)
+        @return matrix of log P(word | class) with one row per id (+ one row for unknown words), vector of log-priors
+        """
+        counts = np.asarray(counts, dtype=np.float64)
+        spl_nbs = np.asarray(spl_nbs, dtype=np.float64)
+        empty = spl_nbs == 0  # classes without training samples
+        no_words = empty.copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_priors = np.log(spl_nbs / spl_nbs.sum() if priors is None else np.asarray(priors, dtype=np.float64))
+            if event_model == 'multinomial':
+                dct_card = counts.sum(axis=1)  # sum of CARD(word) for every word of each dictionary
+                dct_len = np.count_nonzero(counts, axis=1)  # number of words in each dictionary
+                no_words |= dct_card == 0
+                denominator = np.log(dct_card + alpha * dct_len)
+                known = np.log(counts + alpha) - denominator[:, None]
+                unknown = np.log(alpha) - denominator
+            elif event_model == 'bernoulli':
+                if alpha <= 0:
+                    raise ValueError("The Bernoulli model needs a smoothing alpha > 0")
+                probabilities = (counts + alpha) / (spl_nbs + 2 * alpha)[:, None]
+                known = np.log(probabilities) - np.log1p(-probabilities)
+                unknown = np.zeros(len(counts))
+                log_priors += np.log1p(-probabilities).sum(axis=1)
+            else:
+                raise ValueError(f'Unknown event model : {event_model}')
+        known[no_words] = 0
+        unknown[no_words] = 0
+        log_priors[empty] = -np.inf
+        return np.ascontiguousarray(np.vstack((known.T, unknown))), log_priors
+
+    @staticmethod
+    def index_ngrams(vocabulary, ngram_range):
+        """
+        Gives an integer id to each word of the vocabulary and of its n-grams (words that only appear in n-grams get
+        ids after the "unknown" id), and the sorted keys of the n-grams of each length with their ids.
+        The index only depends on the vocabulary : it is built once for a model (cf. Model.get_ngram_index).
+        @param  vocabulary      compact vocabulary (None with a hashing tokenizer)
+        @param  ngram_range     minimal and maximal number of words of a feature of the tokenizer
+        @return Vocabulary of the words, array of their ids, dict() N -> (keys, ids) and number of word ids, or None
+                without n-grams, with hashing or when the keys of the longest n-grams would not fit in 63 bits
+        """
+        min_n, max_n = ngram_range
+        if vocabulary is None or max_n == 1:
+            return None, None, None, None
+        base = len(vocabulary) + 1  # the next id after the "unknown" id
+        vocabulary = vocabulary.get_words()
+        word_ids = {word: i for i, word in enumerate(vocabulary) if ' ' not in word}
+        ngrams = [(word.split(' '), i) for i, word in enumerate(vocabulary) if ' ' in word]
+        for words, i in ngrams:
+            for word in words:
+                if word not in word_ids:
+                    word_ids[word] = base
+                    base += 1
+        if base ** max_n >= 2 ** 63:
+            return None, None, None, None
+
+        tables = dict()
+        for n in range(max(min_n, 2), max_n + 1):
+            keys, ids = [], []
+            for words, i in ngrams:
+                if len(words) == n:
+                    key = 0
+                    for word in words:
+                        key = key * base + word_ids[word]
+                    keys.append(key)
+                    ids.append(i)
+            keys, ids = np.array(keys, dtype=np.int64), np.array(ids, dtype=np.int64)
+            order = np.argsort(keys)
+            tables[n] = (keys[order], ids[order])
+        ids = np.fromiter(word_ids.values(), dtype=np.int64, count=len(word_ids))
+        return Vocabulary.from_words(list(word_ids)), ids, tables, base
+
+    def _ngram_ids(self, tweets):
+        """
+        Gives the id of every feature (word or n-gram) of a batch of tweets, without building n-grams as strings.
+        @param  tweets      array of tweets
+        @return array of ids ("unknown" id for features that do not belong to the vocabulary), and array with
+                the index of the tweet of each feature
+        """
+        unknown = len(self._log_probabilities) - 1
+        words, lengths = self._tokenizer.flatten(self._tokenizer.split(tweets))
+        if len(self._word_ids):
+            positions = self._word_index.lookup(words)
+            word_ids = np.where(positions >= 0, self._word_ids[positions], -1)
+        else:
+            word_ids = np.full(len(words), -1, dtype=np.int64)  # every word and n-gram was pruned
+        rows = np.repeat(np.arange(len(tweets), dtype=np.int64), lengths)
+        known_words = word_ids >= 0
+        min_n, max_n = self._tokenizer.get_ngram_range()
+        ids, feature_rows = [], []
+        if min_n == 1:
+            ids.append(np.where(known_words & (word_ids < unknown), word_ids, unknown))
+            feature_rows.append(rows)
+
+        base = self._base
+        keys, known = word_ids, known_words
+        for n in range(2, max_n + 1):
+            # keys[i] : key of the n words starting at word i, kept if these words belong to the same tweet
+            keys = keys[:-1] * base + word_ids[n - 1:]
+            known = known[:-1] & known_words[n - 1:]
+            if n >= min_n:
+                same = rows[:len(keys)] == rows[n - 1:]
+                table_keys, table_ids = self._ngrams[n]
+                found = known[same]
+                if len(table_keys):
+                    positions = np.minimum(np.searchsorted(table_keys, keys[same]), len(table_keys) - 1)
+                    found &= table_keys[positions] == keys[same]
+                    ids.append(np.where(found, table_ids[positions], unknown))
+                else:
+                    ids.append(np.full(len(found), unknown, dtype=np.int64))
+                feature_rows.append(rows[:len(keys)][same])
+        return np.concatenate(ids), np.concatenate(feature_rows)
+
+    def vectorize(self, tweets):
+        """
+        Turns a batch of tweets into a sparse matrix of word counts (CSR format).
+        Words that do not belong to the vocabulary get the "unknown" id.
+        @param  tweets      array of tweets
+        @return indptr, indices, counts : counts of the words of tweet i are counts[indptr[i]:indptr[i + 1]]
+        """
+        unknown = len(self._log_probabilities) - 1
+        if self._vocabulary is None:
+            ids, rows = self._tokenizer.hash_features(tweets)
+        elif self._word_index is not None:
+            ids, rows = self._ngram_ids(tweets)
+        else:
+            words, lengths = self._tokenizer.flatten(self._tokenizer.tokenize(tweets))
+            ids = self._vocabulary.lookup(words, unknown)
+            rows = np.repeat(np.arange(len(tweets), dtype=np.int64), lengths)
+        instrumentation.add("score", tokens=len(ids))
+
+        # merge the repeated words of each tweet into (id, count) entries (count 1 with a binary tokenizer)
+        keys, counts = np.unique(rows * (unknown + 1) + ids, return_counts=True)
+        if self._tokenizer.is_binary():
+            counts[:] = 1
+        indptr = np.zeros(len(tweets) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // (unknown + 1), minlength=len(tweets)), out=indptr[1:])
+        return indptr, keys % (unknown + 1), counts
+
+    def product(self, indptr, indices, counts):
+        """
+        Sparse matrix-vector product between the word counts of a batch and the log-probabilities.
+        @param  indptr, indices, counts     sparse matrix given by vectorize()
+        @return matrix of shape (number of tweets, number of classes) with the log-score of each class
+        """
+        nb_tweets = len(indptr) - 1
+        rows = np.repeat(np.arange(nb_tweets), np.diff(indptr))
+        weights = self._log_probabilities[indices] * counts[:, None]
+        scores = np.empty((nb_tweets, len(self._log_priors)))
+        for c in range(len(self._log_priors)):
+            scores[:, c] = np.bincount(rows, weights=weights[:, c], minlength=nb_tweets)
+        return scores + self._log_priors
+
+    def scores(self, tweets):
+        """
+        Gives the log-score of each class for a batch of tweets.
+        @param  tweets      array of tweets
+        """
+        return self.product(*self.vectorize(tweets))
+
+    def decide(self, scores):
+        """
+        Gives the class with the highest score, or UNDETERMINED in case of a tie.
+        @param  scores      matrix of log-scores given by scores()
+        """
+        best = scores.max(axis=1)
+        decisions = scores.argmax(axis=1)
+        decisions[(scores == best[:, None]).sum(axis=1) > 1] = UNDETERMINED
+        return decisions
+
+    def log_odds(self, scores):
+        """
+        Gives log P(1 | tweet) - log P(0 | tweet) with two classes, or the margin between the two best classes
+        log P(best | tweet) - log P(second | tweet) with more classes (nan when both are 0).
+        @param  scores      matrix of log-scores given by scores()
+        """
+        with np.errstate(invalid='ignore'):
+            if scores.shape[1] == 2:
+                return scores[:, 1] - scores[:, 0]
+            best = np.partition(scores, -2, axis=1)
+            return best[:, -1] - best[:, -2]
+
+    def predict(self, tweets, batch_size=BATCH_SIZE, indices=None, return_log_odds=False):
+        """
+        Predicts the class of each tweet : the class with the highest score, or UNDETERMINED in case of a tie.
+        @param  tweets          array of tweets
+        @param  batch_size      number of tweets scored by each matrix-vector product
+        @param  indices         indices of the tweets to predict (None : every tweet), e.g. a testing set of Data
+        @param  return_log_odds boolean that gives the information if the log-odds are also returned (cf. log_odds)
+        """
+        nb_tweets = len(tweets) if indices is None else len(indices)
+        predictions = np.empty(nb_tweets, dtype=np.int64)
+        log_odds = np.empty(nb_tweets) if return_log_odds else None
+        for start in range(0, nb_tweets, batch_size):
+            if indices is None:
+                scores = self.scores(tweets[start:start + batch_size])
+            else:
+                scores = self.scores(tweets[indices[start:start + batch_size]])
+            predictions[start:start + batch_size] = self.decide(scores)
+            if return_log_odds:
+                log_odds[start:start + batch_size] = self.log_odds(scores)
+        return (predictions, log_odds) if return_log_odds else predictions
+
+    def predict_chunks(self, chunks, batch_size=BATCH_SIZE):
+        """
+        Predicts the class of the tweets of every chunk (cf. Reader.read_chunks).
+        Yields the predictions and the labels of each chunk.
+        @param  chunks      iterable of (tweets, labels)
+        @param  batch_size  number of tweets scored by each matrix-vector product
+        """
+        for tweets, labels in chunks:
+            yield self.predict(tweets, batch_size), labels
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+
+import argparse
+import json
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import chain
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import monotonic
+
+import numpy as np
+
+from Constants import *
+from Cache import PredictionCache
+from Model import Model
+
+"""
+SERVER CLASS :
+Long-running classification service for a trained model (cf. Model.save).
+The model is loaded once, then tweets are classified over HTTP :
+
+    POST /classify   {"tweets": ["...", ...]}  ->  {"labels": [...], "log_odds": [...]}
+    GET  /health     ->  {"status": "ok"}
+
+Requests are not scored one by one : a single thread collects the requests that arrive within the
+latency budget (or until the batch is full) into a micro-batch, scores it with one vectorized call
+(cf. Scorer class), then gives each request its own labels and log-odds.
+With a prediction cache, tweets already classified are not scored again (cf. PredictionCache class).
+Log-odds are null when they are undefined or infinite (cf. Scorer.log_odds).
+
+Usage : python Server.py model.nbm --port 8000 --latency-ms 2
+"""
+
+
+class Server:
+    """
+    @attr   _model              trained model
+    @attr   _scorer             scoring engine of the model
+    @attr   _cache              prediction cache (None : every tweet is scored)
+    @attr   _max_batch          maximal number of tweets of a micro-batch
+    @attr   _latency_budget     maximal time (in seconds) a request waits for other requests before scoring
+    @attr   _queue              queue of (tweets, future) requests waiting to be scored
+    @attr   _thread             thread that scores the micro-batches
+    @attr   _stopping           True once stop() is called : new requests are rejected
+    @attr   _lock               lock that keeps new requests behind the stop of the scoring thread
+    """
+    __slots__ = ["_model", "_scorer", "_cache", "_max_batch", "_latency_budget", "_queue", "_thread", "_stopping",
+                 "_lock"]
+
+    def __init__(self, model, max_batch=MAX_BATCH, latency_budget=LATENCY_BUDGET, cache_size=CACHE_SIZE):
+        """
+        Initializes a new classification server.
+        @param  model           trained model (cf. Model class)
+        @param  max_batch       maximal number of tweets of a micro-batch
+        @param  latency_budget  maximal time (in seconds) a request waits for other requests before scoring
+        @param  cache_size      maximal number of predictions kept by the cache (0 : no cache)
+        """
+        self._model = model
+        self._scorer = model.get_scorer()
+        self._cache = PredictionCache(cache_size) if cache_size > 0 else None
+        self._max_batch = max_batch
+        self._latency_budget = latency_budget
+        self._queue = Queue()
+        self._thread = None
+        self._stopping = False
+        self._lock = Lock()
+
+    def start(self):
+        """
+        Starts the thread that scores the micro-batches.
+        """
+        self._stopping = False
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Scores the waiting requests, then stops the scoring thread (later requests are rejected).
+        """
+        with self._lock:
+            self._stopping = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def get_cache(self):
+        """
+        Returns the prediction cache (None : every tweet is scored).
+        """
+        return self._cache
+
+    def classify(self, tweets):
+        """
+        Classifies tweets with the next micro-batch (can be called by many threads at once).
+        @param  tweets      list of tweets
+        @return array of labels and array of log-odds
+        """
+        future = Future()
+        with self._lock:  # otherwise a request queued after the stop would never be scored
+            if self._stopping:
+                raise RuntimeError('The server is stopped')
+            self._queue.put((tweets, future))
+        return future.result()
+
+    def serve(self, host=SERVER_HOST, port=SERVER_PORT):
+        """
+        Classifies the tweets of HTTP requests until the process is interrupted.
+        @param  host        address of the server
+        @param  port        port of the server
+        """
+        httpd = ThreadingHTTPServer((host, port), _Handler)
+        httpd.daemon_threads = True
+        httpd.classifier = self
+        self.start()
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            self.stop()
+
+    def _run(self):
+        """
+        Collects the requests into micro-batches and scores them, until stop() is called.
+        """
+        running = True
+        while running:
+            request = self._queue.get()
+            if request is None:
+                break
+            batch = [request]
+            nb_tweets = len(request[0])
+            deadline = monotonic() + self._latency_budget
+            while nb_tweets < self._max_batch:
+                try:
+                    request = self._queue.get(timeout=max(deadline - monotonic(), 0))
+                except Empty:
+                    break
+                if request is None:
+                    running = False
+                    break
+                batch.append(request)
+                nb_tweets += len(request[0])
+            self._score(batch)
+
+    def _score(self, batch):
+        """
+        Scores the tweets of every request of a micro-batch with one vectorized call.
+        @param  batch       list of (tweets, future) requests
+        """
+        try:
+            tweets = np.empty(sum(len(request) for request, future in batch), dtype=object)
+            tweets[:] = list(chain.from_iterable(request for request, future in batch))
+            if self._cache is None:
+                scores = self._scorer.scores(tweets)
+                labels = self._scorer.decide(scores)
+                log_odds = self._scorer.log_odds(scores)
+            else:
+                labels, log_odds = self._cache.predict(self._model, tweets)
+        except Exception as error:
+            for request, future in batch:
+                future.set_exception(error)
+            return
+        start = 0
+        for request, future in batch:
+            future.set_result((labels[start:start + len(request)], log_odds[start:start + len(request)]))
+            start += len(request)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Handles the HTTP requests of a Server (one thread for each connection).
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # otherwise small responses wait for the delayed ACK of the client (~40 ms)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._reply(200, {"status": "ok"})
+        else:
+            self._reply(404, {"error": f'unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/classify':
+            self._reply(404, {"error": f'unknown path {self.path}'})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            tweets = body["tweets"]
+            if not isinstance(tweets, list) or not all(isinstance(tweet, str) for tweet in tweets):
+                raise ValueError('"tweets" must be a list of strings')
+        except (ValueError, KeyError, TypeError) as error:
+            self._reply(400, {"error": f'invalid request : {error}'})
+            return
+        try:
+            labels, log_odds = self.server.classifier.classify(tweets)
+        except Exception as error:
+            self._reply(500, {"error": f'classification failed : {error}'})
+            return
+        self._reply(200, {"labels": labels.tolist(),
+                          "log_odds": [value if np.isfinite(value) else None for value in log_odds.tolist()]})
+
+    def _reply(self, status, content):
+        """
+        Sends a json response.
+        @param  status      HTTP status code
+        @param  content     object sent as json
+        """
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line for each request would cost more than its scoring
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classifies tweets over HTTP with a trained model")
+    parser.add_argument("model", help="file of the trained model (cf. Model.save)")
+    parser.add_argument("--host", default=SERVER_HOST, help="address of the server")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="port of the server")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="maximal number of tweets of a micro-batch")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE,
+                        help="maximal number of predictions kept by the cache (0: no cache)")
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_BUDGET * 1000,
+                        help="maximal time a request waits for other requests before scoring")
+    args = parser.parse_args()
+
+    server = Server(Model.load(args.model), args.max_batch, args.latency_ms / 1000, args.cache_size)
+    print(f"Classifying tweets on http://{args.host}:{args.port}/classify")
+    server.serve(args.host, args.port)
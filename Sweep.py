@@ -0,0 +1,319 @@
+#!/usr/bin/python
+
+import argparse
+import csv
+from itertools import product, starmap
+from multiprocessing import Pool
+
+import numpy as np
+
+from Constants import *
+from Reader import Reader
+from Data import Data
+from CrossValidation import count_folds
+from Tokenizer import Tokenizer
+from Trainer import Trainer
+from Scorer import Scorer
+from Metrics import *
+
+"""
+SWEEP CLASS :
+Evaluates a grid of hyperparameters (smoothing alpha x maximal size of the vocabulary x priors) without
+counting the tweets again for each point of the grid :
+- the words of each split (holdout, or each fold of a cross-validation, cf. CrossValidation class) are counted once,
+- the testing tweets of each split are turned into a sparse matrix of word ids once (cf. Scorer.vectorize),
+- for each size, the counts are pruned (cf. Trainer.prune) and the ids of the testing matrix are mapped to the
+  ids of the pruned vocabulary (pruned words become unknown words),
+- for each alpha and priors, only the matrix of log-probabilities is computed again from the counts, and the
+  testing matrix is scored with one sparse product.
+Each (split, size) pair is evaluated by a process, and the metrics of a point are the arithmetic mean of its splits.
+
+Sized vocabularies are pruned from the exact counts of every word, not from the candidates of a CountMinSketch :
+results can differ slightly from Main for the words at the limit of the vocabulary.
+
+Usage : python Sweep.py --alphas 0.1 0.5 1 --sizes 10000 50000 all --priors empirical uniform --folds 5
+"""
+
+METRICS = {"accuracy": ACCURACY, "precision": PRECISION, "recall": RECALL, "specificity": SPECIFICITY, "f1": F1}
+
+
+class Sweep:
+    """
+    @attr   _dataset            dataset (cf. Data class)
+    @attr   _alphas             list of additive smoothings of the probabilities
+    @attr   _sizes              list of maximal numbers of words of the vocabulary (None : no maximum)
+    @attr   _priors             list of priors : 'empirical' (proportion of the training samples of each class),
+                                'uniform' or P(class) of each class
+    @attr   _k                  number of folds of the cross-validation (None : holdout)
+    @attr   _percent            percent of the training set of the holdout
+    @attr   _processes          number of processes
+    @attr   _tokenizer          tokenizer of the tweets (cf. Tokenizer class)
+    @attr   _min_count          minimal number of occurrences of a word of a sized vocabulary
+    @attr   _statistic          statistic used to choose the words of a sized vocabulary (cf. Trainer.prune)
+    @attr   _ngram_min_count    minimal number of occurrences of a kept n-gram (None : n-grams are not pruned)
+    @attr   _results            list of dict() {alpha, size, priors, words, accuracy, ..., f1, undetermined},
+                                one for each point of the grid
+    """
+    __slots__ = ["_dataset", "_alphas", "_sizes", "_priors", "_k", "_percent", "_processes", "_tokenizer",
+                 "_min_count", "_statistic", "_ngram_min_count", "_results"]
+
+    def __init__(self, dataset, alphas, sizes=(None,), priors=('empirical',), k=None, percent=HOLDOUT_PERCENT,
+                 processes=PROCESSES, tokenizer=None, min_count=1, statistic='frequency', ngram_min_count=None):
+        """
+        Initializes a new sweep.
+        @param  dataset             dataset (cf. Data class)
+        @param  alphas              list of additive smoothings of the probabilities (1 : Laplace Smoothing,
+                                    0 : no smoothing)
+        @param  sizes               list of maximal numbers of words of the vocabulary (None : no maximum)
+        @param  priors              list of priors : 'empirical' (proportion of the training samples of each class),
+                                    'uniform' or list of P(class) of each class
+        @param  k                   number of folds of the cross-validation (None : holdout)
+        @param  percent             percent of the training set of the holdout
+        @param  processes           number of processes
+        @param  tokenizer           tokenizer of the tweets (None : words are kept as strings, without hashing)
+        @param  min_count           minimal number of occurrences of a word of a sized vocabulary
+        @param  statistic           statistic used to choose the words of a sized vocabulary (cf. Trainer.prune)
+        @param  ngram_min_count     minimal number of occurrences of a kept n-gram (None : n-grams are not pruned)
+        """
+        tokenizer = Tokenizer() if tokenizer is None else tokenizer
+        if tokenizer.get_nb_buckets() is not None and (any(size is not None for size in sizes)
+                                                       or ngram_min_count is not None):
+            raise ValueError("Hashed vocabularies cannot be pruned : their size is the number of buckets")
+        if tokenizer.is_binary() and min(alphas) <= 0:
+            raise ValueError("The Bernoulli model needs a smoothing alpha > 0")
+        nb_classes = dataset.get_nb_classes()
+        for prior in priors:
+            if isinstance(prior, str):
+                if prior not in ('empirical', 'uniform'):
+                    raise ValueError(f'Unknown priors : {prior}')
+            elif len(prior) != nb_classes:
+                raise ValueError(f'Priors must give P(class) of each of the {nb_classes} classes : {prior}')
+        self._dataset = dataset
+        self._alphas = list(alphas)
+        self._sizes = list(sizes)
+        self._priors = list(priors)
+        self._k = k
+        self._percent = percent
+        self._processes = processes
+        self._tokenizer = tokenizer
+        self._min_count = min_count
+        self._statistic = statistic
+        self._ngram_min_count = ngram_min_count
+        self._results = []
+
+    def run(self):
+        """
+        Counts the words of each split, then evaluates every point of the grid.
+        @return list of dict() {alpha, size, priors, words, accuracy, ..., f1, undetermined}, one for each point
+        """
+        nb_classes = self._dataset.get_nb_classes()
+        priors = [None if prior == 'empirical' else np.full(nb_classes, 1 / nb_classes) if prior == 'uniform'
+                  else np.asarray(prior, dtype=np.float64) for prior in self._priors]
+        settings = (self._alphas, priors, self._min_count, self._statistic, self._ngram_min_count)
+        splits = self._count_splits()
+        tasks = list(product(range(len(splits)), self._sizes))
+        if self._processes <= 1:
+            _init_worker(splits, settings)
+            results = list(starmap(_evaluate, tasks))
+        else:
+            with Pool(self._processes, _init_worker, (splits, settings)) as pool:
+                results = pool.starmap(_evaluate, tasks)
+
+        # metrics of each point for every split : (size, alpha, priors) -> list of (metrics, undetermined, words)
+        points = dict()
+        for (split, size), result in zip(tasks, results):
+            for (alpha, prior), measures in zip(product(range(len(self._alphas)), range(len(priors))), result):
+                points.setdefault((size, alpha, prior), []).append(measures)
+
+        self._results = []
+        for size, alpha, prior in product(self._sizes, range(len(self._alphas)), range(len(priors))):
+            measures = points[(size, alpha, prior)]
+            metrics = np.mean([metrics for metrics, nb_undetermined, nb_words in measures], axis=0)
+            row = {"alpha": self._alphas[alpha], "size": size, "priors": _priors_name(self._priors[prior]),
+                   "words": round(np.mean([nb_words for metrics, nb_undetermined, nb_words in measures]))}
+            row.update({name: float(metrics[i]) for name, i in METRICS.items()})
+            row["undetermined"] = sum(nb_undetermined for metrics, nb_undetermined, nb_words in measures)
+            self._results.append(row)
+        return self._results
+
+    def _count_splits(self):
+        """
+        Counts the words of the training set and vectorizes the testing set of each split.
+        With a cross-validation, the words of each fold are counted once (in parallel), and the counts of the
+        training set of fold i are the counts of the whole dataset minus the counts of fold i (cf. count_folds).
+        @return list of (trainer, vocabulary, sparse testing matrix, testing labels), one for each split
+        """
+        tweets, labels = self._dataset.get_tweets(), self._dataset.get_labels()
+        nb_classes = self._dataset.get_nb_classes()
+        if self._k is None:
+            training_indices, testing_index = self._dataset.holdout_indices(self._percent)
+            trainer = Trainer(nb_classes, tokenizer=self._tokenizer)
+            for training_index in training_indices:
+                trainer.train(tweets, labels, training_index)
+            return [_vectorize(trainer, tweets[testing_index], labels[testing_index])]
+
+        if self._processes <= 1:
+            fold_totals = count_folds(self._dataset, self._k, self._tokenizer)
+            return [_vectorize(fold_total, tweets[fold], labels[fold]) for fold, fold_total in fold_totals]
+        with Pool(self._processes) as pool:  # the folds are counted when the first split is asked for
+            fold_totals = count_folds(self._dataset, self._k, self._tokenizer, pool)
+            return [_vectorize(fold_total, tweets[fold], labels[fold]) for fold, fold_total in fold_totals]
+
+    def get_results(self):
+        """
+        Returns the results of each point of the grid : list of dict() {alpha, size, priors, words, accuracy, ...,
+        f1, undetermined}
+        """
+        return self._results
+
+    def best(self, metric='f1'):
+        """
+        Returns the results of the point of the grid with the best metric (undefined metrics are the worst).
+        @param  metric      'accuracy', 'precision', 'recall', 'specificity' or 'f1'
+        """
+        return self.sorted_results(metric)[0]
+
+    def sorted_results(self, metric='f1'):
+        """
+        Returns the results of each point of the grid, from the best metric to the worst (undefined metrics last).
+        @param  metric      'accuracy', 'precision', 'recall', 'specificity' or 'f1'
+        """
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric : {metric}')
+        return sorted(self._results, key=lambda row: -row[metric] if np.isfinite(row[metric]) else np.inf)
+
+    def save(self, filename):
+        """
+        Saves the results of each point of the grid as a csv file.
+        @param  filename    path of the file
+        """
+        with open(filename, 'w', newline='') as file:
+            writer = csv.DictWriter(file, ["alpha", "size", "priors", "words"] + list(METRICS) + ["undetermined"])
+            writer.writeheader()
+            writer.writerows(self._results)
+
+    def print_results(self, metric='f1'):
+        """
+        displays the results of each point of the grid, from the best metric to the worst
+        @param  metric      metric used to sort the points of the grid
+        """
+        validation = "holdout" if self._k is None else f"{self._k}-fold cross-validation"
+        print(f"--- SWEEP : {len(self._results)} points, {validation}, sorted by {metric} ---")
+        print(f"{'alpha':>8}{'size':>10}{'priors':>14}{'words':>10}" +
+              "".join(f"{name:>13}" for name in METRICS) + f"{'undetermined':>14}")
+        for row in self.sorted_results(metric):
+            size = 'all' if row['size'] is None else row['size']
+            print(f"{row['alpha']:>8g}{size:>10}{row['priors']:>14}{row['words']:>10}" +
+                  "".join(f"{row[name]:>13.5f}" for name in METRICS) + f"{row['undetermined']:>14}")
+
+
+def _priors_name(prior):
+    """
+    Gives the name of priors in the results : 'empirical', 'uniform', or P(class) of each class separated by '/'.
+    @param  prior       'empirical', 'uniform' or list of P(class) of each class
+    """
+    return prior if isinstance(prior, str) else "/".join(f"{value:g}" for value in prior)
+
+
+def _vectorize(trainer, tweets, labels):
+    """
+    Turns the testing tweets of a split into a sparse matrix of the ids of the vocabulary of its training set.
+    @param  trainer     trainer with the counts of the training set of the split
+    @param  tweets      testing tweets
+    @param  labels      testing labels
+    @return (trainer, vocabulary, sparse testing matrix (cf. Scorer.vectorize), testing labels)
+    """
+    model = trainer.get_model(1)  # the ids of the words do not depend on the smoothing
+    return trainer, model.get_vocabulary(), model.get_scorer().vectorize(tweets), labels
+
+
+_splits = None  # list of the counted splits of each process, given once by _init_worker
+_settings = None  # alphas, priors, min_count, statistic and ngram_min_count of the grid
+
+
+def _init_worker(splits, settings):
+    """
+    Keeps the counted splits and the settings of the grid in a process (run once by each process of Sweep).
+    @param  splits      list of (trainer, vocabulary, sparse testing matrix, testing labels)
+    @param  settings    (alphas, priors, min_count, statistic, ngram_min_count)
+    """
+    global _splits, _settings
+    _splits = splits
+    _settings = settings
+
+
+def _evaluate(split, size):
+    """
+    Evaluates every alpha and priors of the grid for one split and one size (run by each process of Sweep).
+    @param  split       index of the split
+    @param  size        maximal number of words of the vocabulary (None : no maximum)
+    @return list of (metrics, number of undetermined tweets, number of words), for each (alpha, priors)
+    """
+    trainer, vocabulary, (indptr, indices, counts), labels = _splits[split]
+    alphas, priors, min_count, statistic, ngram_min_count = _settings
+    if size is not None or ngram_min_count is not None:
+        trainer = trainer.copy()
+        trainer.prune(size, min_count, statistic, ngram_min_count)
+        # ids of the pruned vocabulary for each id of the whole vocabulary (pruned words become unknown)
+        kept = vocabulary.lookup(trainer.get_model(1).get_vocabulary().get_words())
+        ids = np.full(len(vocabulary) + 1, len(kept), dtype=np.int64)
+        ids[kept] = np.arange(len(kept))
+        indices = ids[indices]
+    model = trainer.get_model(1)
+    nb_classes = len(model.get_spl_nbs())
+    nb_words = len(model.get_counts()[0])
+
+    results = []
+    for alpha, prior in product(alphas, priors):
+        scorer = Scorer(None, model.get_counts(), model.get_spl_nbs(), alpha, event_model=model.get_event_model(),
+                        priors=prior)
+        predictions = scorer.decide(scorer.product(indptr, indices, counts))
+        if nb_classes == 2:
+            conf_matrix, nb_undetermined = confusion_matrix(labels, predictions)
+            metrics = compute_metrics(conf_matrix)
+        else:
+            conf_matrix, nb_undetermined = class_confusion_matrix(labels, predictions, nb_classes)
+            metrics = class_metrics(conf_matrix)[0]
+        results.append((metrics, nb_undetermined, nb_words))
+    return results
+
+
+def _size(value):
+    """
+    Parses a maximal size of the vocabulary ('all' : no maximum).
+    """
+    return None if value == 'all' else int(value)
+
+
+def _prior(value):
+    """
+    Parses priors : 'empirical', 'uniform' or P(class) of each class separated by commas.
+    """
+    return value if value in ('empirical', 'uniform') else [float(part) for part in value.split(',')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluates a grid of hyperparameters, counting the tweets once")
+    parser.add_argument("--alphas", type=float, nargs='+', default=[ALPHA], help="additive smoothings")
+    parser.add_argument("--sizes", type=_size, nargs='+', default=[SIZE if SIZED_DCT and NB_BUCKETS is None else None],
+                        help="maximal sizes of the vocabulary ('all' : no maximum)")
+    parser.add_argument("--priors", type=_prior, nargs='+', default=['empirical'],
+                        help="'empirical', 'uniform' or P(class) of each class separated by commas (e.g. 0.3,0.7)")
+    parser.add_argument("--folds", type=int, help="number of folds of a cross-validation (default : holdout)")
+    parser.add_argument("--percent", type=float, default=HOLDOUT_PERCENT, help="percent of the training set")
+    parser.add_argument("--event-model", choices=['multinomial', 'bernoulli'], default=EVENT_MODEL,
+                        help="event model of the classifier")
+    parser.add_argument("--processes", type=int, default=PROCESSES, help="number of processes")
+    parser.add_argument("--seed", type=int, default=SEED, help="seed of the splits")
+    parser.add_argument("--metric", choices=list(METRICS), default='f1', help="metric used to sort the results")
+    parser.add_argument("--output", help="csv file where the results are saved")
+    args = parser.parse_args()
+
+    dataset = Data(Reader(FOLDER_PATH).read_data(FILENAME), args.seed)
+    sweep = Sweep(dataset, args.alphas, args.sizes, args.priors, args.folds, args.percent, args.processes,
+                  Tokenizer(NB_BUCKETS, NGRAM_RANGE, args.event_model == 'bernoulli'), MIN_COUNT, PRUNING_STATISTIC,
+                  NGRAM_MIN_COUNT if NGRAM_RANGE[1] > 1 and NB_BUCKETS is None else None)
+    sweep.run()
+    sweep.print_results(args.metric)
+    if args.output:
+        sweep.save(args.output)
@@ -0,0 +1,188 @@
+import re
+from itertools import chain
+
+import numpy as np
+
+from Constants import *
+
+"""
+TOKENIZER CLASS :
+Splits batches of tweets into words, the same way for the training and the scoring.
+With the hashing option, words are directly mapped to a fixed number of buckets (feature hashing),
+so that no vocabulary dict() is needed and the size of the model does not depend on the number of words :
+
+    id(word) = FNV-1a(utf-8 bytes of word) modulo number of buckets
+
+The hash is computed with NumPy for a whole batch of words (one step per character position), and does not
+depend on the process, so that a model trained with hashing can be saved and scored anywhere.
+
+With an n-gram range, the features of a tweet are its words and its n-grams (sequences of n consecutive words) :
+- without hashing, an n-gram is a single string (its words separated by a space, which never belongs to a word),
+  so that n-grams get ids in the vocabulary like words, and rare n-grams can be pruned (cf. Trainer.prune),
+- with hashing, no string is built : the hash of an n-gram is computed from the hashes of its words, for a whole
+  batch at once, then mapped to a bucket like the words :
+
+    hash(w1 ... wn) = (hash(w1 ... wn-1) * FNV_PRIME) XOR hash(wn)
+
+With the binary option, each feature (or bucket) is given once for each tweet, however many times it appears :
+the counts of the training are then numbers of tweets containing each feature (cf. Bernoulli model of Scorer).
+"""
+
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+# ASCII characters of the words (\w) and of the spaces (\s) of the regular expressions
+ASCII_WORDS_AND_SPACES = bytes(c for c in range(128) if re.match(r'[\w\s]', chr(c)))
+
+
+class Tokenizer:
+    """
+    @attr   _findall            findall() method of the compiled regular expression that gives the words
+    @attr   _search_other       search() method of a regular expression finding a character that is neither a
+                                word character nor a space
+    @attr   _nb_buckets         number of buckets of the hashing option (None : words are kept as strings)
+    @attr   _ngram_range        minimal and maximal number of words of a feature
+    @attr   _binary             boolean that gives the information if each feature is given once for each tweet
+    """
+    __slots__ = ["_findall", "_search_other", "_nb_buckets", "_ngram_range", "_binary"]
+
+    def __init__(self, nb_buckets=None, ngram_range=(1, 1), binary=False):
+        """
+        Initializes a new tokenizer.
+        @param  nb_buckets  number of buckets of the hashing option (None : no hashing)
+        @param  ngram_range minimal and maximal number of words of a feature, e.g. (1, 2) : words and bigrams
+        @param  binary      boolean that gives the information if repeated features of a tweet are given once
+        """
+        if not 1 <= ngram_range[0] <= ngram_range[1]:
+            raise ValueError(f'Invalid n-gram range : {ngram_range}')
+        self._findall = re.compile(r'\w+').findall
+        self._search_other = re.compile(r'[^\w\s]').search
+        self._nb_buckets = nb_buckets
+        self._ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self._binary = bool(binary)
+
+    def get_nb_buckets(self):
+        """
+        Returns the number of buckets of the hashing option (None : no hashing).
+        """
+        return self._nb_buckets
+
+    def get_ngram_range(self):
+        """
+        Returns the minimal and maximal number of words of a feature.
+        """
+        return self._ngram_range
+
+    def is_binary(self):
+        """
+        Returns True if repeated features of a tweet are given once.
+        """
+        return self._binary
+
+    def split(self, tweets):
+        """
+        Gives the list of words of each tweet of a batch (empty list for empty tweets).
+        When the batch only has word characters and spaces (e.g. tweets already cleaned of their punctuation), the
+        words given by the regular expression are the ones of str.split(), which is about twice as fast.
+        @param  tweets      array of tweets
+        """
+        texts = [tweet if isinstance(tweet, str) else '' for tweet in tweets]
+        text = '\n'.join(texts)
+        if text.isascii():
+            only_words = not text.encode('ascii').translate(None, ASCII_WORDS_AND_SPACES)
+        else:
+            only_words = self._search_other(text) is None
+        if only_words:
+            return [text.split() for text in texts]
+        findall = self._findall
+        return [findall(text) for text in texts]
+
+    def tokenize(self, tweets):
+        """
+        Gives the list of features (words, then n-grams as strings) of each tweet of a batch.
+        With the binary option, repeated features of a tweet are given once (in order of first occurrence).
+        @param  tweets      array of tweets
+        """
+        tokens = self.split(tweets)
+        min_n, max_n = self._ngram_range
+        if self._ngram_range == (1, 1):
+            features = tokens
+        elif min_n == 1 and max_n == 2:
+            features = [words + list(map(' '.join, zip(words, words[1:]))) for words in tokens]
+        else:
+            features = [words[:] if min_n == 1 else [] for words in tokens]
+            for n in range(max(min_n, 2), max_n + 1):
+                for words, grams in zip(tokens, features):
+                    grams += map(' '.join, zip(*[words[i:] for i in range(n)]))
+        if self._binary:
+            return [list(dict.fromkeys(words)) for words in features]
+        return features
+
+    def flatten(self, tokens):
+        """
+        Gives every word of a batch in a single list, and the number of words of each tweet.
+        @param  tokens      list of words of each tweet, given by tokenize()
+        """
+        lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        return list(chain.from_iterable(tokens)), lengths
+
+    def hash_words(self, words):
+        """
+        Maps each word to its bucket with the hashing option.
+        @param  words       list of words
+        @return array of bucket ids
+        """
+        return (self.hash64(words) % np.uint64(self._nb_buckets)).astype(np.int64)
+
+    def hash_features(self, tweets):
+        """
+        Maps every feature (word or n-gram) of a batch of tweets to its bucket with the hashing option.
+        With the binary option, each bucket is given once for each tweet.
+        @param  tweets      array of tweets
+        @return array of bucket ids, and array with the index of the tweet of each feature
+        """
+        words, lengths = self.flatten(self.split(tweets))
+        hashes = self.hash64(words)
+        rows = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        min_n, max_n = self._ngram_range
+        features, feature_rows = ([hashes], [rows]) if min_n == 1 else ([], [])
+        grams = hashes
+        for n in range(2, max_n + 1):
+            # grams[i] : hash of the n words starting at word i, kept if these words belong to the same tweet
+            grams = (grams[:-1] * FNV_PRIME) ^ hashes[n - 1:]
+            if n >= min_n:
+                kept = rows[:len(grams)] == rows[n - 1:]
+                features.append(grams[kept])
+                feature_rows.append(rows[:len(grams)][kept])
+        ids = (np.concatenate(features) % np.uint64(self._nb_buckets)).astype(np.int64)
+        rows = np.concatenate(feature_rows)
+        if self._binary:
+            keys = np.unique(rows * self._nb_buckets + ids)
+            ids, rows = keys % self._nb_buckets, keys // self._nb_buckets
+        return ids, rows
+
+    def hash64(self, words):
+        """
+        Gives the 64-bit FNV-1a hash of each word.
+        @param  words       list of words
+        @return array of uint64 hashes
+        """
+        # every word is encoded in a single buffer, words being separated by a null byte
+        buffer = np.frombuffer(('\x00'.join(words) + '\x00').encode('utf-8'), dtype=np.uint8)
+        ends = np.flatnonzero(buffer == 0)[:len(words)]
+        starts = np.concatenate(([0], ends[:-1] + 1)) if len(words) else ends
+        lengths = ends - starts
+
+        # words sorted by decreasing length : at position j, words longer than j are the first ones
+        # (NumPy sorts 16-bit integers with a radix sort, about 6 times faster than a merge sort)
+        order = np.argsort(-lengths.astype(np.int16) if lengths.max(initial=0) < 2 ** 15 else -lengths, kind='stable')
+        starts = starts[order]
+        longer = np.searchsorted(-lengths[order], -np.arange(lengths.max(initial=0)), side='left')
+        hashes = np.full(len(words), FNV_OFFSET, dtype=np.uint64)
+        for j, nb_longer in enumerate(longer):
+            active = hashes[:nb_longer]
+            active ^= buffer[starts[:nb_longer] + j]
+            active *= FNV_PRIME
+
+        unsorted = np.empty(len(words), dtype=np.uint64)
+        unsorted[order] = hashes
+        return unsorted
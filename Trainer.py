@@ -0,0 +1,413 @@
+from collections import Counter
+from multiprocessing import Pool
+from itertools import chain, compress, repeat
+
+import numpy as np
+
+from Constants import *
+from Instrumentation import instrumentation
+from Model import Model
+from Tokenizer import Tokenizer
+from Vocabulary import Vocabulary
+
+"""
+TRAINER CLASS :
+Counts the words of the training tweets of every class in a single pass.
+Each word gets one integer id in a vocabulary shared by all classes, and the counts of each
+class are kept in a NumPy matrix (cf. Model class) :
+    counts[label, id] = CARD(WORD) in the tweets of this class
+
+Counts can be updated incrementally : new labelled tweets are added with train(), retracted tweets
+are removed with forget(), and a saved model can be updated with Trainer.from_model().
+The model obtained is the same as the one of a full training with the remaining tweets.
+
+Training can also run on several processes (map-reduce) : the tweets are split into contiguous shards,
+each process counts the words of one shard, and the partial counts are merged in order. Since ids are
+given in order of first occurrence, the model is exactly the one of a serial training.
+
+The size of the vocabulary can be bounded : prune() keeps the best words (by frequency or by log-odds),
+and the vocabulary is then fixed : words that do not belong to it are not counted anymore.
+A trainer can also start with a fixed vocabulary (e.g. the candidates given by a CountMinSketch),
+so that the whole vocabulary of the tweets is never held in memory.
+
+With a hashing tokenizer (cf. Tokenizer class), there is no vocabulary : the id of a word is its bucket,
+and the counts matrix has a fixed number of columns.
+With n-grams (cf. Tokenizer class), each n-gram is counted like a word : it gets an id in the vocabulary
+(or a bucket), and rare n-grams can be pruned apart from the words.
+With a binary tokenizer, each word is counted once for each tweet (Bernoulli event model, cf. Scorer class).
+"""
+
+
+class Trainer:
+    """
+    @attr   _vocabulary         dict() giving the id of each word (None with a hashing tokenizer)
+    @attr   _counts             matrix with CARD(WORD) of each word for each class
+    @attr   _spl_nbs            number of training samples of each class
+    @attr   _size               maximal number of words of the vocabulary (None : new words are added)
+    @attr   _tokenizer          tokenizer shared with the scoring (cf. Tokenizer class)
+    """
+    __slots__ = ["_vocabulary", "_counts", "_spl_nbs", "_size", "_tokenizer"]
+
+    def __init__(self, nb_classes=2, vocabulary=None, tokenizer=None):
+        """
+        Initializes a new trainer with an empty vocabulary.
+        @param  nb_classes  number of classes, labels going from 0 to nb_classes - 1
+        @param  vocabulary  iterable of words of a fixed vocabulary (None : every word is added to the vocabulary)
+        @param  tokenizer   tokenizer of the tweets (None : words are kept as strings, without hashing)
+        """
+        self._tokenizer = Tokenizer() if tokenizer is None else tokenizer
+        nb_buckets = self._tokenizer.get_nb_buckets()
+        if nb_buckets is not None and vocabulary is not None:
+            raise ValueError("A hashing tokenizer cannot be used with a fixed vocabulary")
+        if nb_buckets is None:
+            words = () if vocabulary is None else vocabulary
+            self._vocabulary = {word: i for i, word in enumerate(dict.fromkeys(words))}
+        else:
+            self._vocabulary = None
+        self._size = None if vocabulary is None else len(self._vocabulary)
+        width = len(self._vocabulary) if nb_buckets is None else nb_buckets
+        self._counts = np.zeros((nb_classes, width), dtype=np.int64)
+        self._spl_nbs = np.zeros(nb_classes, dtype=np.int64)
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Initializes a trainer with the counts of a trained model, to update it with new tweets.
+        The vocabulary of a pruned model stays fixed.
+        @param  model       trained model (cf. Model class)
+        """
+        trainer = cls(len(model.get_spl_nbs()), tokenizer=model.get_tokenizer())
+        if trainer._vocabulary is not None:
+            trainer._vocabulary = model.get_vocabulary().to_dict()
+        trainer._counts = np.array(model.get_counts(), dtype=np.int64)
+        trainer._spl_nbs = np.array(model.get_spl_nbs(), dtype=np.int64)
+        trainer._size = model.get_size()
+        return trainer
+
+    def train(self, tweets, labels, indices=None, batch_size=BATCH_SIZE):
+        """
+        Adds the words of labelled tweets to the counts. Can be called several times.
+        @param  tweets      array of tweets
+        @param  labels      array with the class of each tweet
+        @param  indices     indices of the tweets to add (None : every tweet), e.g. a training set of Data
+        @param  batch_size  number of tweets counted at once
+        """
+        labels = np.asarray(labels, dtype=np.int64)
+        with instrumentation.stage("train", tweets=len(tweets) if indices is None else len(indices)):
+            if indices is None:
+                self._spl_nbs += np.bincount(labels, minlength=len(self._spl_nbs))
+                for start in range(0, len(tweets), batch_size):
+                    self._count(tweets[start:start + batch_size], labels[start:start + batch_size])
+            else:
+                self._spl_nbs += np.bincount(labels[indices], minlength=len(self._spl_nbs))
+                for start in range(0, len(indices), batch_size):
+                    batch = indices[start:start + batch_size]
+                    self._count(tweets[batch], labels[batch])
+
+    def train_chunks(self, chunks):
+        """
+        Adds the words of every chunk of labelled tweets to the counts (cf. Reader.read_chunks).
+        @param  chunks      iterable of (tweets, labels)
+        """
+        for tweets, labels in chunks:
+            self.train(tweets, labels)
+
+    def train_parallel(self, tweets, labels, indices=None, processes=PROCESSES, shards=None):
+        """
+        Adds the words of labelled tweets to the counts, counting them on several processes
+        (the tokens counted by the other processes are not given to the instrumentation).
+        @param  tweets      array of tweets
+        @param  labels      array with the class of each tweet
+        @param  indices     indices of the tweets to add (None : every tweet), e.g. a training set of Data
+        @param  processes   number of processes
+        @param  shards      number of parts into what we divide the tweets (default : one for each process)
+        """
+        shards = processes if shards is None else shards
+        indices = np.arange(len(tweets)) if indices is None else indices
+        bounds = np.linspace(0, len(indices), shards + 1).astype(np.int64)
+        vocabulary = None if self._size is None else list(self._vocabulary)
+        tasks = [(tweets[indices[start:stop]], np.asarray(labels)[indices[start:stop]], len(self._spl_nbs),
+                  self._tokenizer, vocabulary)
+                 for start, stop in zip(bounds, bounds[1:])]
+        with instrumentation.stage("train", tweets=len(indices)), Pool(processes) as pool:
+            for trainer in pool.starmap(_train_shard, tasks):
+                self.merge(trainer)
+        self._measure_vocabulary()
+
+    def merge(self, other):
+        """
+        Adds the counts of another trainer (e.g. trained with another part of the tweets).
+        Merging the trainers of consecutive parts in order gives the same vocabulary as a serial training.
+        With a fixed vocabulary, the other words are ignored.
+        @param  other       trainer with the same number of classes
+        """
+        if self._vocabulary is None or other._vocabulary is None:
+            if self._counts.shape != other._counts.shape:
+                raise ValueError("Trainers with different tokenizers cannot be merged")
+            self._counts = self._counts + other._counts
+            self._spl_nbs = self._spl_nbs + other._spl_nbs
+            return
+        vocabulary = self._vocabulary
+        if self._size is None:
+            setdefault = vocabulary.setdefault
+            for word in other._vocabulary:
+                setdefault(word, len(vocabulary))
+        ids = np.fromiter(map(vocabulary.get, other._vocabulary, repeat(-1)), dtype=np.int64,
+                          count=len(other._vocabulary))
+        columns = np.fromiter(other._vocabulary.values(), dtype=np.int64, count=len(other._vocabulary))
+        known = ids >= 0
+
+        counts = np.zeros((len(self._spl_nbs), len(vocabulary)), dtype=np.int64)
+        counts[:, :self._counts.shape[1]] = self._counts
+        counts[:, ids[known]] += other._counts[:, columns[known]]
+        self._counts = counts
+        self._spl_nbs = self._spl_nbs + other._spl_nbs
+
+    def forget(self, tweets, labels, batch_size=BATCH_SIZE):
+        """
+        Removes the words of labelled tweets that were given to train() (e.g. retracted samples).
+        Words that do not appear anymore are removed from the vocabulary (unless it is fixed).
+        @param  tweets      array of tweets
+        @param  labels      array with the class of each tweet
+        @param  batch_size  number of tweets counted at once
+        """
+        labels = np.asarray(labels, dtype=np.int64)
+        spl_nbs = self._spl_nbs - np.bincount(labels, minlength=len(self._spl_nbs))
+        counts = self._counts.copy()
+        for start in range(0, len(tweets), batch_size):
+            if self._vocabulary is None:
+                ids, rows = self._tokenizer.hash_features(tweets[start:start + batch_size])
+                np.subtract.at(counts, (labels[start:start + batch_size][rows], ids), 1)
+                continue
+            tokens = self._tokenizer.tokenize(tweets[start:start + batch_size])
+            for label, counter in enumerate(self._count_classes(tokens, labels[start:start + batch_size])):
+                ids = self._ids(counter, add=False)
+                cards = np.fromiter(counter.values(), dtype=np.int64, count=len(counter))
+                if self._size is not None:
+                    # words that do not belong to a fixed vocabulary were not counted
+                    cards, ids = cards[ids >= 0], ids[ids >= 0]
+                elif (ids < 0).any():
+                    raise ValueError("Forgotten tweets contain words that were not given to the training")
+                np.subtract.at(counts[label], ids, cards)
+        if (counts < 0).any() or (spl_nbs < 0).any():
+            raise ValueError("Forgotten tweets were not given to the training")
+        self._set_counts(counts, spl_nbs)
+
+    def remove(self, other):
+        """
+        Removes the counts of another trainer that were merged into this one (e.g. one fold of the training set).
+        Words that do not appear anymore are removed from the vocabulary (unless it is fixed).
+        @param  other       trainer with the same number of classes
+        """
+        if self._vocabulary is None or other._vocabulary is None:
+            if self._counts.shape != other._counts.shape:
+                raise ValueError("Trainers with different tokenizers cannot be removed")
+            counts = self._counts - other._counts
+        else:
+            ids = np.fromiter(map(self._vocabulary.get, other._vocabulary, repeat(-1)), dtype=np.int64,
+                              count=len(other._vocabulary))
+            columns = np.fromiter(other._vocabulary.values(), dtype=np.int64, count=len(other._vocabulary))
+            if self._size is not None:
+                columns, ids = columns[ids >= 0], ids[ids >= 0]
+            elif (ids < 0).any():
+                raise ValueError("Removed counts contain words that are not in the vocabulary")
+            counts = self._counts.copy()
+            counts[:, ids] -= other._counts[:, columns]
+        spl_nbs = self._spl_nbs - other._spl_nbs
+        if (counts < 0).any() or (spl_nbs < 0).any():
+            raise ValueError("Removed counts were not merged into this trainer")
+        self._set_counts(counts, spl_nbs)
+
+    def prune(self, max_words=None, min_count=1, statistic='frequency', ngram_min_count=None):
+        """
+        Keeps the best words of the vocabulary, which is then fixed : words that do not belong to it
+        are not counted anymore. Kept words keep their order in the vocabulary, and ties are broken by
+        alphabetical order, so that the kept words do not depend on the order of the tweets.
+        @param  max_words   maximal number of words of the vocabulary (None : no maximum)
+        @param  min_count   minimal number of occurrences of a kept word (in all classes)
+        @param  statistic   'frequency' : the most frequent words are kept,
+                            'log_odds' : the words with the largest difference between the smoothed
+                            log P(word | class) of two classes are kept
+        @param  ngram_min_count minimal number of occurrences of a kept n-gram (None : min_count)
+        """
+        if self._vocabulary is None:
+            raise ValueError("Hashed vocabularies cannot be pruned : their size is the number of buckets")
+        with instrumentation.stage("prune"):
+            kept = np.zeros(self._counts.shape[1], dtype=bool)
+            kept[self.select_words(list(self._vocabulary), self._counts, max_words, min_count, statistic,
+                                   ngram_min_count)] = True
+            self._vocabulary = {word: i for i, word in enumerate(compress(self._vocabulary, kept))}
+            self._counts = self._counts[:, kept]
+            self._size = len(self._vocabulary) if max_words is None else max_words
+        self._measure_vocabulary()
+
+    @staticmethod
+    def select_words(words, counts, max_words=None, min_count=1, statistic='frequency', ngram_min_count=None):
+        """
+        Gives the best words of a vocabulary (cf. prune), ties being broken by alphabetical order.
+        @param  words       list of the words sorted by id
+        @param  counts      matrix with CARD(WORD) of each word (columns) for each class (rows)
+        @param  max_words, min_count, statistic, ngram_min_count    cf. prune
+        @return sorted array of the ids of the kept words
+        """
+        totals = counts.sum(axis=0)
+        if statistic == 'frequency':
+            scores = totals
+        elif statistic == 'log_odds':
+            log_probabilities = np.log(counts + 1) - np.log(counts.sum(axis=1) + counts.shape[1])[:, None]
+            scores = log_probabilities.max(axis=0) - log_probabilities.min(axis=0)
+        else:
+            raise ValueError(f'Unknown pruning statistic : {statistic}')
+
+        frequent = totals >= min_count
+        if ngram_min_count is not None:
+            # n-grams are the only features with a space (cf. Tokenizer class)
+            ngrams = np.fromiter((' ' in word for word in words), dtype=bool, count=len(totals))
+            frequent[ngrams] = totals[ngrams] >= ngram_min_count
+        candidates = np.flatnonzero(frequent)
+        if max_words is not None and max_words < len(candidates):
+            order = np.lexsort((np.array([words[i] for i in candidates]), -scores[candidates]))
+            candidates = np.sort(candidates[order[:max_words]])
+        return candidates
+
+    def copy(self):
+        """
+        Returns an independent copy of this trainer.
+        """
+        trainer = Trainer(len(self._spl_nbs), tokenizer=self._tokenizer)
+        if self._vocabulary is not None:
+            trainer._vocabulary = dict(self._vocabulary)
+        trainer._counts = self._counts.copy()
+        trainer._spl_nbs = self._spl_nbs.copy()
+        trainer._size = self._size
+        return trainer
+
+    def get_words(self):
+        """
+        Returns the list of the words of the vocabulary, sorted by id (None with a hashing tokenizer).
+        """
+        return None if self._vocabulary is None else list(self._vocabulary)
+
+    def get_counts(self):
+        """
+        Returns the matrix with CARD(WORD) of each word (columns) for each class (rows).
+        """
+        return self._counts
+
+    def get_spl_nbs(self):
+        """
+        Returns the number of training samples of each class.
+        """
+        return self._spl_nbs
+
+    def _set_counts(self, counts, spl_nbs):
+        """
+        Replaces the counts after some tweets were removed, and removes the words that do not appear anymore
+        (buckets and fixed vocabularies are kept).
+        @param  counts      matrix with CARD(WORD) of each word of the vocabulary for each class
+        @param  spl_nbs     number of training samples of each class
+        """
+        self._spl_nbs = spl_nbs
+        used = counts.any(axis=0)
+        if self._vocabulary is None or self._size is not None or used.all():
+            self._counts = counts
+        else:
+            self._vocabulary = {word: i for i, word in enumerate(compress(self._vocabulary, used))}
+            self._counts = counts[:, used]
+
+    def _ids(self, words, add=True):
+        """
+        Gives the id of each word in the vocabulary.
+        @param  words       iterable of distinct words
+        @param  add         boolean that gives the information if new words were added to the vocabulary
+                            (otherwise, the id of unknown words is -1)
+        """
+        vocabulary = self._vocabulary
+        if add:
+            return np.fromiter(map(vocabulary.__getitem__, words), dtype=np.int64, count=len(words))
+        return np.fromiter(map(vocabulary.get, words, repeat(-1)), dtype=np.int64, count=len(words))
+
+    def _count_classes(self, tokens, labels):
+        """
+        Counts the words of each class.
+        @param  tokens      list of words of each tweet
+        @param  labels      array with the class of each tweet
+        @return list of Counter() WORD -> CARD(WORD), one for each class
+        """
+        return [Counter(chain.from_iterable(compress(tokens, labels == label))) for label in range(len(self._spl_nbs))]
+
+    def _count(self, tweets, labels):
+        """
+        Adds the words of a batch of labelled tweets to the counts.
+        @param  tweets      array of tweets
+        @param  labels      array with the class of each tweet
+        """
+        if self._vocabulary is None:
+            # with hashing, the bucket of every word and n-gram of the batch is given at once (several features
+            # can share a bucket)
+            ids, rows = self._tokenizer.hash_features(tweets)
+            np.add.at(self._counts, (labels[rows], ids), 1)
+            if instrumentation.is_enabled():
+                instrumentation.add("train", tokens=len(ids))
+                self._measure_vocabulary()
+            return
+        tokens = self._tokenizer.tokenize(tweets)
+
+        # new words are appended to the vocabulary in order of first occurrence, then words of each class are counted
+        counts = self._counts
+        add = self._size is None
+        if add:
+            vocabulary = self._vocabulary
+            setdefault = vocabulary.setdefault
+            for word in dict.fromkeys(chain.from_iterable(tokens)):
+                setdefault(word, len(vocabulary))
+            counts = np.zeros((len(self._spl_nbs), len(vocabulary)), dtype=np.int64)
+            counts[:, :self._counts.shape[1]] = self._counts
+        for label, counter in enumerate(self._count_classes(tokens, labels)):
+            ids = self._ids(counter, add)
+            cards = np.fromiter(counter.values(), dtype=np.int64, count=len(counter))
+            if self._size is not None:
+                # words that do not belong to a fixed vocabulary are not counted
+                cards, ids = cards[ids >= 0], ids[ids >= 0]
+            counts[label, ids] += cards
+        self._counts = counts
+        if instrumentation.is_enabled():
+            instrumentation.add("train", tokens=sum(map(len, tokens)))
+            self._measure_vocabulary()
+
+    def _measure_vocabulary(self):
+        """
+        Gives the number of words of the vocabulary (or of used buckets) to the instrumentation, after each batch,
+        so that its series shows the growth of the vocabulary.
+        """
+        if instrumentation.is_enabled():
+            if self._vocabulary is None:
+                instrumentation.gauge("vocabulary_words", int(np.count_nonzero(self._counts.any(axis=0))))
+            else:
+                instrumentation.gauge("vocabulary_words", len(self._vocabulary))
+
+    def get_model(self, alpha, priors=None):
+        """
+        Returns the model trained with every tweet given so far. With a binary tokenizer, the counts are numbers of
+        tweets containing each word : the model uses the Bernoulli event model (multinomial otherwise).
+        @param  alpha       additive smoothing of the probabilities (1 : Laplace Smoothing, 0 : no smoothing)
+        @param  priors      P(class) of each class (None : proportion of the training samples of each class)
+        """
+        vocabulary = None if self._vocabulary is None else Vocabulary.from_words(list(self._vocabulary))
+        event_model = 'bernoulli' if self._tokenizer.is_binary() else 'multinomial'
+        return Model(vocabulary, self._counts.copy(), self._spl_nbs.copy(), alpha, self._size,
+                     self._tokenizer.get_nb_buckets(), self._tokenizer.get_ngram_range(), event_model, priors)
+
+
+def _train_shard(tweets, labels, nb_classes, tokenizer, vocabulary):
+    """
+    Counts the words of one shard of the training set (run by each process of Trainer.train_parallel).
+    @param  tweets      array of tweets of the shard
+    @param  labels      array with the class of each tweet
+    @param  nb_classes  number of classes
+    @param  tokenizer   tokenizer of the tweets
+    @param  vocabulary  list of words of a fixed vocabulary (None : every word is counted)
+    """
+    trainer = Trainer(nb_classes, vocabulary, tokenizer)
+    trainer.train(tweets, labels)
+    return trainer
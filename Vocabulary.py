@@ -0,0 +1,170 @@
+import numpy as np
+
+from Tokenizer import Tokenizer
+
+"""
+VOCABULARY CLASS :
+Compact read-only vocabulary of a trained model, giving the id of a batch of words without any dict() :
+ ________________________________________________________________________
+|   ARRAY   |   CONTENT                                                   |
+|___________|_____________________________________________________________|
+|  hashes   |  64-bit FNV-1a hash of each word, indexed by id (uint64)    |
+|  table    |  open addressing hash table (linear probing) : id of the    |
+|           |  word stored in each slot, -1 for empty slots (int32)       |
+|  words    |  utf-8 words separated by new lines, sorted by id (uint8)   |
+|___________|_____________________________________________________________|
+
+The slot of a word is hash(word) modulo the size of the table (or the next slot if it is taken).
+A batch of words is looked up with NumPy : the hashes of the batch are computed at once (cf. Tokenizer.hash64),
+then every word probes its slot, and the words that are not found yet probe the next slot, until their hash
+is found or an empty slot is reached.
+
+Words are only compared through their 64-bit hash : two words of the vocabulary never share a hash (checked
+when the table is built), and an unknown word gets the id of a word with the same hash with a probability
+lower than 1e-13. Arrays are flat buffers stored in the model file (cf. Model class) : a loaded vocabulary
+is memory-mapped, shared by every process that loads the same model, and the words are only read when needed.
+The table takes about 16 bytes for each word, against about 100 bytes for a dict() of str.
+"""
+
+LOAD_FACTOR = 0.5
+
+
+class Vocabulary:
+    """
+    @attr   _hashes             64-bit hash of each word, indexed by id
+    @attr   _table              id of the word stored in each slot of the hash table (-1 : empty slot)
+    @attr   _words              buffer of the words, separated by new lines and sorted by id
+    """
+    __slots__ = ["_hashes", "_table", "_words"]
+
+    def __init__(self, hashes, table, words):
+        """
+        Initializes a vocabulary from its arrays (e.g. memory-mapped from a model file).
+        @param  hashes      64-bit hash of each word, indexed by id
+        @param  table       id of the word stored in each slot of the hash table (-1 : empty slot)
+        @param  words       buffer of the words (uint8), separated by new lines and sorted by id
+        """
+        self._hashes = hashes
+        self._table = table
+        self._words = words
+
+    @classmethod
+    def from_words(cls, words):
+        """
+        Builds the vocabulary of a list of words.
+        @param  words       list of distinct words, sorted by id (or buffer of words separated by new lines)
+        """
+        if isinstance(words, list):
+            buffer = np.frombuffer('\n'.join(words).encode('utf-8'), dtype=np.uint8)
+        else:
+            buffer = np.asarray(words, dtype=np.uint8)
+            words = _split(buffer)
+        hashes = Tokenizer().hash64(words)
+        if len(np.unique(hashes)) < len(hashes):
+            raise ValueError("Two words of the vocabulary have the same 64-bit hash")
+        return cls(hashes, _build_table(hashes), buffer)
+
+    @classmethod
+    def from_dict(cls, vocabulary):
+        """
+        Builds the vocabulary of a dict() WORD -> ID, ids going from 0 to len(vocabulary) - 1.
+        @param  vocabulary  dict() giving the id of each word
+        """
+        words = [None] * len(vocabulary)
+        for word, i in vocabulary.items():
+            words[i] = word
+        return cls.from_words(words)
+
+    def lookup(self, words, default=-1):
+        """
+        Gives the id of each word of a batch.
+        @param  words       list of words
+        @param  default     id of the words that do not belong to the vocabulary
+        @return array of ids
+        """
+        hashes = Tokenizer().hash64(words)
+        table = self._table
+        size = np.uint64(len(table))
+        ids = np.full(len(words), default, dtype=np.int64)
+        slots = (hashes % size).astype(np.int64)
+        active = np.arange(len(words))
+        while len(active):
+            found = table[slots]
+            empty = found < 0
+            hit = ~empty
+            hit[hit] = self._hashes[found[hit]] == hashes[active[hit]]
+            ids[active[hit]] = found[hit]
+            probing = ~(empty | hit)
+            active = active[probing]
+            slots = (slots[probing] + 1) % len(table)
+        return ids
+
+    def get_words(self):
+        """
+        Returns the list of the words, sorted by id.
+        """
+        return _split(self._words)
+
+    def to_dict(self):
+        """
+        Returns the vocabulary as an object dict() WORD -> ID
+        """
+        return {word: i for i, word in enumerate(self.get_words())}
+
+    def get_hashes(self):
+        """
+        Returns the 64-bit hash of each word, indexed by id.
+        """
+        return self._hashes
+
+    def get_table(self):
+        """
+        Returns the id of the word stored in each slot of the hash table (-1 : empty slot).
+        """
+        return self._table
+
+    def get_buffer(self):
+        """
+        Returns the buffer of the words, separated by new lines and sorted by id.
+        """
+        return self._words
+
+    def get_nbytes(self):
+        """
+        Returns the size of the arrays in bytes.
+        """
+        return self._hashes.nbytes + self._table.nbytes + self._words.nbytes
+
+    def __len__(self):
+        return len(self._hashes)
+
+
+def _split(buffer):
+    """
+    Gives the list of words of a buffer of words separated by new lines.
+    @param  buffer      buffer (uint8) of utf-8 words
+    """
+    words = bytes(buffer).decode('utf-8')
+    return words.split('\n') if words else []
+
+
+def _build_table(hashes):
+    """
+    Places the id of each word in the hash table : at each round, every word that is not placed yet tries its
+    next slot, and the smallest id of the words trying an empty slot takes it.
+    @param  hashes      64-bit hash of each word, indexed by id
+    @return id of the word stored in each slot (-1 : empty slot)
+    """
+    size = int(len(hashes) / LOAD_FACTOR) + 1
+    table = np.full(size, -1, dtype=np.int32)
+    pending = np.arange(len(hashes), dtype=np.int64)
+    slots = (hashes % np.uint64(size)).astype(np.int64)
+    while len(pending):
+        free = table[slots] < 0
+        taken, first = np.unique(slots[free], return_index=True)
+        table[taken] = pending[free][first]
+        placed = np.zeros(len(pending), dtype=bool)
+        placed[np.flatnonzero(free)[first]] = True
+        pending = pending[~placed]
+        slots = (slots[~placed] + 1) % size
+    return table
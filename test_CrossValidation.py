@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from Constants import *
+from Benchmark import Benchmark
+from CrossValidation import CrossValidation, count_folds, _evaluate_fold
+from Data import Data
+from Tokenizer import Tokenizer
+from Trainer import Trainer
+
+"""
+CROSSVALIDATION TESTS :
+Checks that the counts of each fold (the whole dataset minus the fold) and the results of the cross-validation
+are the ones of k separate trainings on the sets of Data.cv_indices.
+Usage : python -m pytest test_CrossValidation.py
+"""
+
+
+def _word_counts(trainer):
+    """
+    Gives a dict() WORD -> counts of each class, which does not depend on the ids of the words.
+    """
+    return dict(zip(trainer.get_words(), map(tuple, trainer.get_counts().T.tolist())))
+
+
+class CrossValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        tweets, labels = Benchmark(3003, 1500, seed=6).generate()
+        data = np.empty((len(tweets) + 1, 2), dtype=object)
+        data[0] = ["tweetText", "sentimentLabel"]
+        data[1:, 0] = tweets
+        data[1:, 1] = labels
+        self.data = data
+        self.k = 5
+
+    def separate_trainers(self, tokenizer=None):
+        """
+        Trains the model of each fold from scratch, on the training set given by Data.cv_indices.
+        """
+        dataset = Data(self.data, seed=7)
+        for set_number in range(1, self.k + 1):
+            train_indices, test_index = dataset.cv_indices(set_number, self.k)
+            trainer = Trainer(dataset.get_nb_classes(), tokenizer=tokenizer)
+            for train_index in train_indices:
+                trainer.train(dataset.get_tweets(), dataset.get_labels(), train_index)
+            yield trainer, test_index
+
+    def test_count_folds(self):
+        for tokenizer in (None, Tokenizer(2 ** 10)):
+            fold_totals = count_folds(Data(self.data, seed=7), self.k, tokenizer)
+            for (fold, fold_total), (trainer, test_index) in zip(fold_totals, self.separate_trainers(tokenizer)):
+                self.assertEqual(sorted(fold.tolist()), sorted(test_index.tolist()))
+                if tokenizer is None:
+                    self.assertEqual(_word_counts(fold_total), _word_counts(trainer))
+                else:
+                    self.assertEqual(fold_total.get_counts().tolist(), trainer.get_counts().tolist())
+                self.assertEqual(fold_total.get_spl_nbs().tolist(), trainer.get_spl_nbs().tolist())
+
+    def test_run(self):
+        cross_validation = CrossValidation(Data(self.data, seed=7), self.k, 1, processes=2)
+        metrics, conf_matrices = cross_validation.run()
+        data = Data(self.data, seed=7).get_data()
+        for set_number, (trainer, test_index) in enumerate(self.separate_trainers()):
+            expected_metrics, expected_conf_matrix, nb_undetermined = _evaluate_fold(trainer.get_model(1),
+                                                                                     data[test_index])
+            np.testing.assert_allclose(metrics[set_number], expected_metrics)
+            self.assertEqual(np.asarray(conf_matrices[set_number]).tolist(),
+                             np.asarray(expected_conf_matrix).tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
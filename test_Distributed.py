@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from Constants import *
+from Benchmark import Benchmark
+from Distributed import DistributedTrainer
+from Tokenizer import Tokenizer
+from Trainer import Trainer
+
+"""
+DISTRIBUTEDTRAINER TESTS :
+Checks that a distributed training gives the counts of a serial training, also in a work folder reused by
+another run.
+Usage : python -m pytest test_Distributed.py
+"""
+
+
+def _word_counts(model):
+    """
+    Gives a dict() WORD -> counts of each class, which does not depend on the ids of the words.
+    """
+    return dict(zip(model.get_vocabulary().get_words(), map(tuple, model.get_counts().T.tolist())))
+
+
+class DistributedTrainerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.tweets, self.labels = Benchmark(6000, 3000, seed=4).generate()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, name, tweets, labels):
+        filename = os.path.join(self.folder, name)
+        pd.DataFrame({"tweetId": np.arange(len(tweets)), "tweetText": tweets, "tweetDate": "",
+                      "sentimentLabel": labels}).to_csv(filename, sep=';', index=False)
+        return filename
+
+    def check(self, model, tweets, labels, max_words=None):
+        trainer = Trainer(2)
+        trainer.train(tweets, labels)
+        if max_words is not None:
+            trainer.prune(max_words)
+        expected = trainer.get_model(1)
+        self.assertEqual(_word_counts(model), _word_counts(expected))
+        self.assertEqual(model.get_spl_nbs().tolist(), expected.get_spl_nbs().tolist())
+
+    def test_serial_training(self):
+        filenames = [self.write(f'part{i}.csv', self.tweets[i::3], self.labels[i::3]) for i in range(3)]
+        for max_words in (None, 500):
+            work_dir = tempfile.mkdtemp(dir=self.folder)
+            trainer = DistributedTrainer(filenames, work_dir, 2, chunk_size=700, spill_words=800,
+                                         max_words=max_words)
+            for worker in range(2):
+                trainer.count(worker)
+            for shard in range(2):
+                trainer.reduce(shard)
+            self.check(trainer.merge(1), np.concatenate([self.tweets[i::3] for i in range(3)]),
+                       np.concatenate([self.labels[i::3] for i in range(3)]), max_words)
+
+    def test_reduce_after_merge(self):
+        work_dir = tempfile.mkdtemp(dir=self.folder)
+        trainer = DistributedTrainer([self.write('all.csv', self.tweets, self.labels)], work_dir, 2, chunk_size=1000)
+        for worker in range(2):
+            trainer.count(worker)
+        for shard in range(2):
+            trainer.reduce(shard)
+        trainer.merge(1)
+        for shard in range(2):
+            trainer.reduce(shard)  # spill files were removed by the merge : the shards are kept
+        self.check(trainer.merge(1), self.tweets, self.labels)
+
+    def test_reused_work_dir(self):
+        work_dir = tempfile.mkdtemp(dir=self.folder)
+        trainer = DistributedTrainer([self.write('all.csv', self.tweets, self.labels)], work_dir, 2, chunk_size=1000)
+        trainer.run(1, processes=1)
+
+        tweets, labels = self.tweets[:2000], self.labels[:2000]
+        trainer = DistributedTrainer([self.write('small.csv', tweets, labels)], work_dir, 2, chunk_size=1000)
+        for worker in range(2):
+            trainer.count(worker)
+        trainer.reduce(0)
+        with self.assertRaises(ValueError):
+            trainer.merge(1)  # shard 1 holds the counts of the previous run
+        trainer.reduce(1)
+        self.check(trainer.merge(1), tweets, labels)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from Constants import *
+from Benchmark import Benchmark
+from Model import Model, VERSION
+from Tokenizer import Tokenizer
+from Trainer import Trainer
+
+"""
+MODEL TESTS :
+Checks that a saved model is loaded with the same counts and settings, and scores like the model that was saved
+(with a tokenizer of n-grams, a hashing tokenizer and the Bernoulli event model).
+Usage : python -m pytest test_Model.py
+"""
+
+
+class SaveLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, "model.nbm")
+        self.tweets, self.labels = Benchmark(4000, 2000, seed=3).generate()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def round_trip(self, tokenizer, alpha=1, priors=None):
+        trainer = Trainer(2, tokenizer=tokenizer)
+        trainer.train(self.tweets, self.labels)
+        model = trainer.get_model(alpha, priors)
+        model.save(self.filename)
+        for mmap in (True, False):
+            loaded = Model.load(self.filename, mmap)
+            self.assertEqual(loaded.to_string(), model.to_string())
+            self.assertEqual(loaded.get_counts().tolist(), model.get_counts().tolist())
+            self.assertEqual(loaded.get_spl_nbs().tolist(), model.get_spl_nbs().tolist())
+            self.assertEqual(loaded.get_tokenizer().get_ngram_range(), tokenizer.get_ngram_range())
+            self.assertEqual(loaded.get_tokenizer().get_nb_buckets(), tokenizer.get_nb_buckets())
+            if model.get_vocabulary() is not None:
+                self.assertEqual(list(loaded.get_vocabulary().get_words()), list(model.get_vocabulary().get_words()))
+            yield model, loaded
+
+    def check_scores(self, model, loaded):
+        labels, log_odds = model.get_scorer().predict(self.tweets[:1000], return_log_odds=True)
+        loaded_labels, loaded_log_odds = loaded.get_scorer().predict(self.tweets[:1000], return_log_odds=True)
+        self.assertEqual(loaded_labels.tolist(), labels.tolist())
+        np.testing.assert_array_equal(loaded_log_odds, log_odds)
+
+    def test_words(self):
+        for model, loaded in self.round_trip(Tokenizer()):
+            self.check_scores(model, loaded)
+
+    def test_ngrams_and_priors(self):
+        for model, loaded in self.round_trip(Tokenizer(ngram_range=(1, 2)), 0.5, [0.3, 0.7]):
+            self.assertEqual(loaded.get_priors(), [0.3, 0.7])
+            self.check_scores(model, loaded)
+
+    def test_hashing(self):
+        for model, loaded in self.round_trip(Tokenizer(2 ** 12)):
+            self.check_scores(model, loaded)
+
+    def test_bernoulli(self):
+        for model, loaded in self.round_trip(Tokenizer(binary=True)):
+            self.assertEqual(loaded.get_event_model(), 'bernoulli')
+            self.check_scores(model, loaded)
+        for model, loaded in self.round_trip(Tokenizer(binary=True), alpha=0):
+            self.assertEqual(loaded.get_alpha(), 0)
+
+    def test_other_version(self):
+        Trainer(2).get_model(1).save(self.filename)
+        with open(self.filename, 'rb') as file:
+            content = file.read()
+        version = f'"version": {VERSION}'.encode('utf-8')
+        self.assertEqual(content.count(version), 1)
+        with open(self.filename, 'wb') as file:
+            file.write(content.replace(version, f'"version": {VERSION + 1}'.encode('utf-8')))
+        with self.assertRaises(ValueError):
+            Model.load(self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
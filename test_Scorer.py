@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from Constants import *
+from Scorer import Scorer
+from Trainer import Trainer
+
+"""
+SCORER TESTS :
+Checks the scores of classes without training samples, which must never be predicted.
+Usage : python -m pytest test_Scorer.py
+"""
+
+
+class EmptyClassTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tweets = np.array(["good great", "great good", "bad awful", "awful bad", "so so", "so meh"],
+                               dtype=object)
+        self.labels = np.array([0, 0, 1, 1, 3, 3])  # no tweet of class 2
+
+    def check(self, scorer):
+        scores = scorer.scores(self.tweets)
+        self.assertFalse(np.isnan(scores).any())
+        self.assertTrue(np.isneginf(scores[:, 2]).all())
+        predictions = scorer.predict(self.tweets)
+        self.assertNotIn(2, predictions.tolist())
+        self.assertEqual(predictions.tolist(), self.labels.tolist())
+
+    def test_multinomial(self):
+        trainer = Trainer(4)
+        trainer.train(self.tweets, self.labels)
+        for alpha in (0, 1):
+            self.check(trainer.get_model(alpha).get_scorer())
+
+    def test_bernoulli(self):
+        scorer = Scorer({"good": 0, "bad": 1}, [[2, 0], [0, 1], [0, 0]], [2, 1, 0], 1, event_model='bernoulli')
+        scores = scorer.scores(np.array(["good", "bad"], dtype=object))
+        self.assertTrue(np.isneginf(scores[:, 2]).all())
+        self.assertEqual(scorer.decide(scores).tolist(), [0, 1])
+
+    def test_given_priors(self):
+        scorer = Scorer({"good": 0, "bad": 1}, [[2, 0], [0, 1], [0, 0]], [2, 1, 0], 1, priors=[0.4, 0.3, 0.3])
+        scores = scorer.scores(np.array(["good", "bad", "unknown"], dtype=object))
+        self.assertFalse(np.isnan(scores).any())
+        self.assertNotIn(2, scorer.decide(scores).tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from Constants import *
+from Benchmark import Benchmark
+from Tokenizer import Tokenizer
+from Trainer import Trainer
+
+"""
+TRAINER TESTS :
+Checks that incremental updates (merge, remove, forget) and the parallel training give the counts of a training
+from scratch, with and without a hashing tokenizer.
+Usage : python -m pytest test_Trainer.py
+"""
+
+
+def _word_counts(trainer):
+    """
+    Gives a dict() WORD -> counts of each class, which does not depend on the ids of the words.
+    """
+    return dict(zip(trainer.get_words(), map(tuple, trainer.get_counts().T.tolist())))
+
+
+class IncrementalTrainingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tweets, self.labels = Benchmark(6000, 3000, seed=5).generate()
+        self.kept = np.arange(len(self.tweets)) % 4 != 0
+
+    def train(self, tweets, labels, tokenizer=None):
+        trainer = Trainer(2, tokenizer=tokenizer)
+        trainer.train(tweets, labels)
+        return trainer
+
+    def assertSameCounts(self, trainer, expected):
+        if expected.get_words() is None:
+            self.assertEqual(trainer.get_counts().tolist(), expected.get_counts().tolist())
+        else:
+            self.assertEqual(_word_counts(trainer), _word_counts(expected))
+        self.assertEqual(trainer.get_spl_nbs().tolist(), expected.get_spl_nbs().tolist())
+
+    def test_merge(self):
+        for tokenizer in (None, Tokenizer(2 ** 10)):
+            trainer = Trainer(2, tokenizer=tokenizer)
+            for start in range(0, len(self.tweets), 2500):
+                trainer.merge(self.train(self.tweets[start:start + 2500], self.labels[start:start + 2500], tokenizer))
+            expected = self.train(self.tweets, self.labels, tokenizer)
+            self.assertSameCounts(trainer, expected)
+            if tokenizer is None:  # consecutive parts merged in order give the ids of a serial training
+                self.assertEqual(list(trainer.get_words()), list(expected.get_words()))
+
+    def test_forget(self):
+        for tokenizer in (None, Tokenizer(2 ** 10)):
+            trainer = self.train(self.tweets, self.labels, tokenizer)
+            trainer.forget(self.tweets[~self.kept], self.labels[~self.kept])
+            self.assertSameCounts(trainer, self.train(self.tweets[self.kept], self.labels[self.kept], tokenizer))
+
+    def test_remove(self):
+        for tokenizer in (None, Tokenizer(2 ** 10)):
+            trainer = self.train(self.tweets, self.labels, tokenizer)
+            trainer.remove(self.train(self.tweets[~self.kept], self.labels[~self.kept], tokenizer))
+            self.assertSameCounts(trainer, self.train(self.tweets[self.kept], self.labels[self.kept], tokenizer))
+
+    def test_forget_untrained_tweets(self):
+        trainer = self.train(self.tweets[:100], self.labels[:100])
+        with self.assertRaises(ValueError):
+            trainer.forget(self.tweets[100:200], self.labels[100:200])
+
+    def test_train_parallel(self):
+        indices = np.flatnonzero(self.kept)
+        for tokenizer in (None, Tokenizer(2 ** 10)):
+            trainer = Trainer(2, tokenizer=tokenizer)
+            trainer.train_parallel(self.tweets, self.labels, indices, processes=2, shards=3)
+            expected = Trainer(2, tokenizer=tokenizer)
+            expected.train(self.tweets, self.labels, indices)
+            self.assertSameCounts(trainer, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()